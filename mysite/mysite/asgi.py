@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+# Serves the async versions of the busiest views; see ASGI in settings.py.
+os.environ.setdefault('DJANGO_ASGI', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up. Serves the live update stream itself, so
+# thousands of idle streams cost no threads; see space_app/events.py.
+from space_app.events import EventStreamApplication
+
+application = EventStreamApplication(django_application)
@@ -0,0 +1,10 @@
+"""mysite.urls, serving space_app's async views; the URLconf of asgi.py."""
+from django.urls import include, path
+
+from space_app import urls as space_app_urls
+from . import urls
+
+urlpatterns = [
+    path('', include('space_app.async_urls')) if getattr(pattern, 'urlconf_name', None) is space_app_urls else pattern
+    for pattern in urls.urlpatterns
+]
@@ -42,6 +42,9 @@ USE_X_FORWARDED_HOST = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 CSRF_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_SAMESITE = 'Lax'
+# Sessions are read from the cache and written to the database after the
+# response (with WriteBehindSessionMiddleware), see space_app/sessions.py.
+SESSION_ENGINE = 'space_app.sessions'
 
 # Application definition
 
@@ -57,21 +60,34 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Times each request for Server-Timing and /metrics/; see space_app/metrics.py.
+    'space_app.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'space_app.middleware.StaticAssetMiddleware',
+    'space_app.routers.ReplicaRoutingMiddleware',
+    # SessionMiddleware, deferring session writes until the response is sent.
+    'space_app.sessions.WriteBehindSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'impersonate.middleware.ImpersonateMiddleware',
+    # django-impersonate's middleware, with the impersonated user read from the cache.
+    'space_app.middleware.CachedImpersonateMiddleware',
+    # Profiles requests superusers ask for with ?profile=1; see space_app/profiling.py.
+    'space_app.profiling.ProfilingMiddleware',
 ]
 
-ROOT_URLCONF = 'mysite.urls'
+# Set by asgi.py. Under ASGI, mysite.asgi_urls routes the busiest pages to the
+# async views in space_app/async_views.py.
+ASGI = os.environ.get('DJANGO_ASGI') == '1'
+
+ROOT_URLCONF = 'mysite.asgi_urls' if ASGI else 'mysite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders for space_app.metrics.
+        'BACKEND': 'space_app.metrics.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -91,13 +107,108 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# WAL lets readers carry on while a write is in progress, and
+# synchronous=NORMAL is safe with WAL (a power cut can lose the last commits but
+# not corrupt the file). 64 MB page cache, 256 MB mmap. journal_mode=WAL is
+# stored in the database file, so these only run where DJANGO_SQLITE_TUNED=1 is
+# set, i.e. on the deployed database rather than the db.sqlite3 in the repo;
+# `manage.py benchmark_database` compares them with the stock settings.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA cache_size=-64000;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA temp_store=MEMORY;'
+)
+SQLITE_TUNED = os.environ.get('DJANGO_SQLITE_TUNED') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # The stock sqlite3 backend plus Django 5.1's transaction_mode and
+        # init_command options; see space_app/sqlite_backend/base.py.
+        'ENGINE': 'space_app.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests instead of reconnecting (and
+        # re-running init_command) every time. Not under ASGI, where each request
+        # runs its queries in a thread of its own, so a kept connection would
+        # only stay open until that thread is collected.
+        'CONN_MAX_AGE': 0 if ASGI else 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds a writer waits for the lock before "database is locked".
+            'timeout': 20,
+            # Take the write lock when a transaction starts, so concurrent
+            # writers wait for each other instead of failing.
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': SQLITE_PRAGMAS if SQLITE_TUNED else '',
+        },
+        # A file-backed test database gives every thread its own connection, which
+        # the concurrency tests need; in-memory SQLite would share one cache.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# Read replica for the read-only staff pages and listings, see space_app/routers.py.
+# Locally it is a second SQLite file refreshed from the primary by
+# `manage.py sync_replica`; it is only used once that file exists.
+REPLICA_LAG_SECONDS = 30
+if (BASE_DIR / 'db_replica.sqlite3').exists():
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'OPTIONS': {
+            **DATABASES['default']['OPTIONS'],
+            'init_command': DATABASES['default']['OPTIONS']['init_command'] + 'PRAGMA query_only=1;',
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+DATABASE_ROUTERS = ['space_app.routers.PrimaryReplicaRouter']
+
+
+# Sessions, logged-in users, page and fragment caches all live here. LocMemCache
+# is per process: run more than one worker process against a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache), or a process could keep
+# serving a session or user that another one has changed.
+CACHES = {
+    'default': {
+        # LocMemCache, counting hits and misses for space_app.metrics.
+        'BACKEND': 'space_app.metrics.LocMemCache',
+        'OPTIONS': {
+            # The default of 300 entries would keep evicting sessions.
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
+# Carries live updates (space_app/events.py) between processes. The default
+# only reaches streams in the publishing process; with more than one ASGI
+# worker use 'space_app.events.DatabaseBackend'.
+EVENTS_BACKEND = 'space_app.events.LocalBackend'
+
+# Queries at least this slow are written to SLOW_QUERY_LOG with their plan and
+# caller, see space_app/slow_queries.py; `manage.py slow_queries` summarises it.
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.jsonl'
+
+# Points the slow query log elsewhere while the tests run.
+TEST_RUNNER = 'space_app.test_runner.TestRunner'
+
+# Lets a Prometheus scraper read /metrics/ with "Authorization: Bearer <token>";
+# admins can always read it.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Request profiles (space_app/profiling.py) are written here and downloaded
+# through the admin. PROFILE_SAMPLE_EVERY = N also profiles one in N requests
+# from anyone; 0 profiles only those superusers ask for.
+PROFILES_ROOT = BASE_DIR / 'profiles'
+PROFILE_SAMPLE_EVERY = 0
+PROFILES_KEPT = 200
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -139,12 +250,28 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Outside development, collectstatic writes content-hashed files plus WebP and
+# gzip/brotli variants, which StaticAssetMiddleware serves with far-future caching.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'space_app.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'space_app.User'
+# ModelBackend, with the logged-in user loaded from the cache.
+AUTHENTICATION_BACKENDS = ['space_app.backends.CachedModelBackend']
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -1,5 +1,13 @@
+import os
+
 from django.contrib import admin
-from .models import User, Team, Project, Contact, JoinRequest
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import User, Team, Project, Contact, JoinRequest, Task, RequestProfile
+from .profiling import can_view_profiles
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -23,7 +31,7 @@ class UserAdmin(admin.ModelAdmin):
 
 @admin.register(Team)
 class TeamAdmin(admin.ModelAdmin):
-    list_display = ('name', 'challenge', 'looking_for_members', 'leader')
+    list_display = ('name', 'challenge', 'looking_for_members', 'leader', 'member_count', 'mentor_count')
     list_filter = ('looking_for_members', 'challenge')
     search_fields = ('name', 'challenge', 'leader__email')
     ordering = ('name',)
@@ -72,3 +80,63 @@ class JoinRequestAdmin(admin.ModelAdmin):
     list_filter = ('status', 'team')
     search_fields = ('user__email', 'team__name')
     ordering = ('-created_at',)
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error',)
+    ordering = ('-created_at',)
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'path', 'view', 'status_code', 'duration_ms', 'peak_memory_kb', 'trigger', 'user', 'downloads')
+    list_filter = ('trigger', 'view')
+    search_fields = ('path', 'user__email')
+    ordering = ('-created_at',)
+    readonly_fields = ('report',)
+    fields = ('path', 'view', 'user', 'trigger', 'status_code', 'duration_ms', 'peak_memory_kb', 'created_at', 'downloads', 'report')
+
+    def has_view_permission(self, request, obj=None):
+        return can_view_profiles(request.user)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return can_view_profiles(request.user)
+
+    def get_urls(self):
+        return [
+            path('<int:profile_id>/download/<str:kind>/', self.admin_site.admin_view(self.download),
+                 name='space_app_requestprofile_download'),
+            *super().get_urls(),
+        ]
+
+    def download(self, request, profile_id, kind):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        field_file = {'stats': profile.stats_file, 'report': profile.report_file}.get(kind)
+        if field_file is None:
+            raise Http404
+        return FileResponse(field_file.open('rb'), as_attachment=True, filename=os.path.basename(field_file.name))
+
+    @admin.display(description='Files')
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">.prof</a> | <a href="{}">report</a>',
+            reverse('admin:space_app_requestprofile_download', args=[obj.pk, 'stats']),
+            reverse('admin:space_app_requestprofile_download', args=[obj.pk, 'report']),
+        )
+
+    @admin.display(description='Report')
+    def report(self, obj):
+        try:
+            with obj.report_file.open('rb') as report:
+                return format_html('<pre>{}</pre>', report.read().decode(errors='replace'))
+        except OSError:
+            return 'The report file is missing.'
@@ -1,4 +1,148 @@
+import hashlib
+
+from django.db.models import Count, Max
 from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from ..models import Challenge, Project, Team
+from ..pagination import keyset_paginate
+from ..query_budget import query_budget
+from ..routers import read_replica
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
 
 def test_api(request):
-    return JsonResponse({"message": "Hello from the API!"})
\ No newline at end of file
+    return JsonResponse({"message": "Hello from the API!"})
+
+
+def team_queryset(request):
+    teams = Team.objects.all()
+    if request.GET.get('open') == '1':
+        teams = teams.filter(looking_for_members=True, member_count__lt=Team.MAX_MEMBERS)
+    return teams
+
+
+def challenge_queryset(request):
+    challenges = Challenge.objects.all()
+    if request.GET.get('category'):
+        challenges = challenges.filter(category=request.GET['category'])
+    return challenges
+
+
+def project_queryset(request):
+    projects = Project.objects.all()
+    if request.GET.get('team'):
+        projects = projects.filter(team_id=request.GET['team'])
+    return projects
+
+
+# field name -> (columns it needs, value from the row)
+TEAM_FIELDS = {
+    'id': ((), lambda team: team.id),
+    'name': (('name',), lambda team: team.name),
+    'challenge': (('challenge',), lambda team: team.challenge_id),
+    'leader': (('leader',), lambda team: team.leader_id),
+    'looking_for_members': (('looking_for_members',), lambda team: team.looking_for_members),
+    'member_count': (('member_count',), lambda team: team.member_count),
+    'mentor_count': (('mentor_count',), lambda team: team.mentor_count),
+    'open_seats': (('member_count',), lambda team: max(Team.MAX_MEMBERS - team.member_count, 0)),
+    'updated_at': (('updated_at',), lambda team: team.updated_at.isoformat()),
+}
+
+CHALLENGE_FIELDS = {
+    'id': ((), lambda challenge: challenge.id),
+    'title': (('title',), lambda challenge: challenge.title),
+    'category': (('category',), lambda challenge: challenge.category),
+    'difficulty': (('difficulty',), lambda challenge: challenge.difficulty),
+    'image': (('image',), lambda challenge: challenge.image),
+    'description': (('description',), lambda challenge: challenge.description),
+    'updated_at': (('updated_at',), lambda challenge: challenge.updated_at.isoformat()),
+}
+
+PROJECT_FIELDS = {
+    'id': ((), lambda project: project.id),
+    'team': (('team',), lambda project: project.team_id),
+    'name': (('name',), lambda project: project.name),
+    'description': (('description',), lambda project: project.description),
+    'video_url': (('video_url',), lambda project: project.video_url or ''),
+    'submission_status': (('submission_status',), lambda project: project.submission_status),
+    'updated_at': (('updated_at',), lambda project: project.updated_at.isoformat()),
+}
+
+# resource name -> (queryset factory taking the request, fields, whether it needs a logged-in user)
+RESOURCES = {
+    'teams': (team_queryset, TEAM_FIELDS, False),
+    'challenges': (challenge_queryset, CHALLENGE_FIELDS, False),
+    'projects': (project_queryset, PROJECT_FIELDS, True),
+}
+
+
+def api_error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+@query_budget(4)
+@read_replica
+def api_list(request, resource):
+    """One page of ``resource`` as JSON.
+
+    Query parameters: ``fields`` (comma separated, default all), ``limit`` (up
+    to API_MAX_PAGE_SIZE) and ``cursor`` (the ``next`` link of the previous
+    page), plus the resource's filters. The ETag comes from the newest
+    updated_at and the row count of the whole filtered listing, so any change,
+    deletions included, changes it, and a client repeating the request with
+    If-None-Match gets a 304 after a single aggregate query. Last-Modified is
+    the newest updated_at; it cannot show deletions, so pollers should prefer
+    the ETag.
+    """
+    get_queryset, available, needs_login = RESOURCES[resource]
+    if needs_login and not request.user.is_authenticated:
+        return api_error('Authentication required', 401)
+
+    fields = [name for name in request.GET.get('fields', '').split(',') if name] or list(available)
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        return api_error(f'Unknown field(s): {", ".join(unknown)}. Available: {", ".join(available)}', 400)
+    try:
+        limit = min(int(request.GET.get('limit', API_PAGE_SIZE)), API_MAX_PAGE_SIZE)
+    except ValueError:
+        return api_error('limit must be a number', 400)
+    if limit < 1:
+        return api_error('limit must be at least 1', 400)
+
+    try:
+        queryset = get_queryset(request)
+    except ValueError:
+        return api_error('Invalid filter value', 400)
+    stamp = queryset.aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+    last_modified = stamp['last_modified'].timestamp() if stamp['last_modified'] else None
+    etag = '"%s"' % hashlib.md5(
+        f'{request.get_full_path()}|{stamp["last_modified"]}|{stamp["count"]}'.encode()
+    ).hexdigest()
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        columns = {column for name in fields for column in available[name][0]}
+        page = keyset_paginate(queryset.only(*columns), request.GET.get('cursor'), per_page=limit)
+        next_url = None
+        if page.has_next:
+            params = request.GET.copy()
+            params['cursor'] = page.next_cursor
+            next_url = f"{reverse('api_' + resource)}?{params.urlencode()}"
+        response = JsonResponse({
+            'results': [{name: available[name][1](row) for name in fields} for row in page],
+            'next': next_url,
+        })
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Clients may keep the response but must revalidate it, which is the cheap 304.
+    patch_cache_control(response, no_cache=True, **({'private': True} if needs_login else {'public': True}))
+    if needs_login:
+        patch_vary_headers(response, ['Cookie'])
+    return response
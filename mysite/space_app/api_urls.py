@@ -3,4 +3,7 @@ from .api import views
 
 urlpatterns = [
     path('test/', views.test_api, name='test_api'),
-]
\ No newline at end of file
+    path('teams/', views.api_list, {'resource': 'teams'}, name='api_teams'),
+    path('challenges/', views.api_list, {'resource': 'challenges'}, name='api_challenges'),
+    path('projects/', views.api_list, {'resource': 'projects'}, name='api_projects'),
+]
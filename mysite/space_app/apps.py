@@ -6,3 +6,6 @@ class SpaceAppConfig(AppConfig):
 
     def ready(self):
         import space_app.signals
+        # Both instrument database connections as they open.
+        import space_app.metrics
+        import space_app.slow_queries
@@ -0,0 +1,17 @@
+"""space_app.urls with the async views from async_views.py in place of their sync versions."""
+from django.urls import path
+
+from . import async_views, urls
+
+ASYNC_VIEWS = {
+    'profile': async_views.profile_view,
+    'challenges': async_views.challenges,
+    'teams': async_views.teams,
+    'team_detail': async_views.team_detail,
+    'join_team': async_views.join_team,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name) if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in urls.urlpatterns
+]
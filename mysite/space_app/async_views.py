@@ -0,0 +1,99 @@
+"""
+Async versions of the busiest views, served when the site runs under ASGI
+(mysite/asgi.py routes to them through mysite.asgi_urls). Queries use the async
+ORM; rendering, the cache helpers and transactions have no async form in Django
+5.0, so they run in a thread through sync_to_async. The sync versions in
+views.py stay what WSGI serves: under WSGI each async view would pay for an
+event loop per request.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db import IntegrityError
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from .caching import cache_public_page, get_cached_challenges
+from .decorators import aload_user, login_required
+from .models import JoinRequest, Project, Team
+from .query_budget import query_budget
+from .routers import read_replica
+from .views import create_join_request, search_teams, team_detail_queryset, teams_context, viewer_team_ids, viewer_team_rows
+
+# Templates run context processors and {% cache %} lookups, which may query.
+arender = sync_to_async(render)
+
+
+@query_budget(3)
+@login_required
+async def profile_view(request):
+    team = await request.user.teams.select_related('challenge', 'project').afirst()
+    project = None
+    if team:
+        try:
+            project = team.project
+        except Project.DoesNotExist:
+            project = None
+    return await arender(request, 'space_app/profile.html', {'project': project, 'team': team})
+
+
+@query_budget(1)
+@cache_public_page('challenges')
+async def challenges(request):
+    challenges = await sync_to_async(get_cached_challenges)()
+    return await arender(request, 'space_app/challenges.html', {'challenges': challenges})
+
+
+@query_budget(4)
+@read_replica
+async def teams(request):
+    teams = [team async for team in search_teams(request.GET.get('q'))]
+    user = await aload_user(request)
+    member_ids, pending_ids = set(), set()
+    if user.is_authenticated:
+        member_ids, pending_ids = viewer_team_ids([row async for row in viewer_team_rows(user)])
+    context = await sync_to_async(teams_context)(teams, user, member_ids, pending_ids)
+    return await arender(request, 'space_app/teams.html', context)
+
+
+@query_budget(5)
+async def team_detail(request, team_id):
+    team = await aget_object_or_404(team_detail_queryset(), pk=team_id)
+    has_pending_request = False
+    user = await aload_user(request)
+    if user.is_authenticated:
+        has_pending_request = await JoinRequest.objects.filter(user=user, team=team, status='pending').aexists()
+    return await arender(request, 'space_app/team_detail.html', {'team': team, 'has_pending_request': has_pending_request})
+
+
+@query_budget(7)
+@login_required
+async def join_team(request, team_id):
+    team = await aget_object_or_404(Team, pk=team_id)
+    user = request.user
+
+    if user.is_admin or user.is_Mentor:
+        if await team.mentors.filter(pk=user.pk).aexists():
+            messages.info(request, 'You are already a mentor for this team.')
+        else:
+            await team.mentors.aadd(user)
+            messages.success(request, 'You have been added as a mentor to this team.')
+        return redirect('teams')
+
+    if await user.teams.aexists():
+        messages.error(request, 'You must leave your current team before joining a new one.')
+        return redirect('teams')
+
+    if team.member_count >= Team.MAX_MEMBERS:
+        messages.error(request, 'This team is full and cannot accept new members.')
+        return redirect('teams')
+
+    if team.looking_for_members:
+        try:
+            await sync_to_async(create_join_request)(user, team)
+        except IntegrityError:
+            # joinrequest_one_pending_per_team allows one pending request per (user, team).
+            messages.error(request, 'You have already sent a request to join this team.')
+        else:
+            messages.success(request, 'Your request to join the team has been sent.')
+    else:
+        messages.error(request, 'This team is not looking for members.')
+    return redirect('teams')
@@ -0,0 +1,16 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .caching import get_cached_user
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that loads the logged-in user through the cache.
+
+    AuthenticationMiddleware calls get_user() on every request; with the user
+    cached, and the session in the cache too (see sessions.py), an authenticated
+    request needs no query to find out who is making it.
+    """
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -0,0 +1,61 @@
+from collections import namedtuple
+
+BATCH_SIZE = 500
+
+# created and unchanged are lists of keys; updated maps each key to {field: (old, new)}.
+UpsertResult = namedtuple('UpsertResult', ['created', 'updated', 'unchanged'])
+
+
+def bulk_upsert(model, rows, key, fields=None, batch_size=BATCH_SIZE, dry_run=False):
+    """Insert or update ``rows`` (dicts of field values) in ``model``, matched on ``key``.
+
+    ``key`` must be a unique field. Existing rows are read once per batch to work
+    out what changed, and only new or changed rows are written, through a single
+    ``bulk_create(update_conflicts=True)`` per batch. Bypasses save() and model
+    signals, but rewritten rows still get their ``auto_now`` fields set.
+    """
+    rows = list(rows)
+    if fields is None:
+        fields = sorted({field for row in rows for field in row} - {key})
+
+    existing = {}
+    keys = [row[key] for row in rows]
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        for values in model.objects.filter(**{f'{key}__in': batch}).values(key, *fields):
+            existing[values[key]] = values
+
+    created, updated, unchanged = [], {}, []
+    to_write = []
+    for row in rows:
+        current = existing.get(row[key])
+        if current is None:
+            created.append(row[key])
+            to_write.append(row)
+            continue
+        changes = {
+            field: (current[field], row[field])
+            for field in fields
+            if field in row and current[field] != row[field]
+        }
+        if changes:
+            updated[row[key]] = changes
+            to_write.append(row)
+        else:
+            unchanged.append(row[key])
+
+    if to_write and not dry_run:
+        objs = [model(**row) for row in to_write]
+        if fields:
+            auto_now = [f.name for f in model._meta.concrete_fields if getattr(f, 'auto_now', False)]
+            model.objects.bulk_create(
+                objs,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=[key],
+                update_fields=[*fields, *(name for name in auto_now if name not in fields)],
+            )
+        else:
+            model.objects.bulk_create(objs, batch_size=batch_size, ignore_conflicts=True)
+
+    return UpsertResult(created, updated, unchanged)
@@ -0,0 +1,169 @@
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .data_files import DATA_DIR
+from .models import Challenge, User
+
+CHALLENGES_CACHE_KEY = 'space_app:challenges'
+
+PAGE_CACHE_PREFIX = 'space_app:page:'
+PAGE_VERSION_PREFIX = 'space_app:page_version:'
+PAGE_STATS_PREFIX = 'space_app:page_stats:'
+TEAM_VERSION_PREFIX = 'space_app:team_version:'
+USER_CACHE_PREFIX = 'space_app:user:'
+# Backstop for cached users; signals.py drops the entry whenever the User is saved.
+USER_CACHE_TIMEOUT = 3600
+# Entries also expire, so template changes show up within this many seconds of a deploy.
+PAGE_CACHE_TIMEOUT = 3600
+
+# page name -> data files it renders, filled in by cache_public_page
+cached_pages = {}
+
+
+def get_cached_challenges():
+    """Return every Challenge ordered by id, from the cache or a single query.
+
+    The entry has no expiry; signals.invalidate_challenges drops it whenever a
+    Challenge row is saved or deleted. It is always filled from the primary: a
+    lagging replica would put the pre-save rows back in the cache indefinitely.
+    """
+    return cache.get_or_set(
+        CHALLENGES_CACHE_KEY,
+        lambda: list(Challenge.objects.using(DEFAULT_DB_ALIAS).order_by('id')),
+        None,
+    )
+
+
+def invalidate_challenges():
+    cache.delete(CHALLENGES_CACHE_KEY)
+    bump_page_version('challenges')
+
+
+def get_cached_user(user_id):
+    """Return the User with this pk from the cache or a single query, or None.
+
+    Used for the logged-in and the impersonated user on every request. Like the
+    challenges, it is always filled from the primary.
+    """
+    key = USER_CACHE_PREFIX + str(user_id)
+    user = cache.get(key)
+    if user is None:
+        try:
+            user = User.objects.using(DEFAULT_DB_ALIAS).get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        cache.set(key, user, USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_cached_user(user_id):
+    key = USER_CACHE_PREFIX + str(user_id)
+    cache.delete(key)
+    # Again once the save commits, in case a request cached the old row in between.
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def page_version(page):
+    # A timestamp rather than a counter, so an evicted version can never be
+    # recreated with a value that matches entries cached before the eviction.
+    return cache.get_or_set(PAGE_VERSION_PREFIX + page, time.time_ns, None)
+
+
+def bump_page_version(page):
+    """Make every cached copy of ``page`` stale."""
+    cache.set(PAGE_VERSION_PREFIX + page, time.time_ns(), None)
+
+
+def team_versions(team_ids):
+    """Return {team id: version} for the cached team cards, creating missing versions.
+
+    signals.py bumps a team's version whenever the team, its members or mentors,
+    or its join requests change.
+    """
+    keys = {TEAM_VERSION_PREFIX + str(team_id): team_id for team_id in team_ids}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    missing = {key: time.time_ns() for key, team_id in keys.items() if team_id not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update((keys[key], version) for key, version in missing.items())
+    return versions
+
+
+def bump_team_versions(team_ids):
+    cache.delete_many([TEAM_VERSION_PREFIX + str(team_id) for team_id in team_ids])
+
+
+def page_cache_key(page, request):
+    # A changed data file changes its mtime, which works as a version bump.
+    mtimes = '.'.join(str((DATA_DIR / name).stat().st_mtime_ns) for name in cached_pages[page])
+    return f'{PAGE_CACHE_PREFIX}{page}:{page_version(page)}:{mtimes}:{request.get_full_path()}'
+
+
+def count_page_request(page, outcome):
+    key = f'{PAGE_STATS_PREFIX}{page}:{outcome}'
+    cache.add(key, 0, None)
+    cache.incr(key)
+
+
+def get_page_cache_stats():
+    """Return {page: {'hit': n, 'miss': n}} for every page using cache_public_page."""
+    keys = [f'{PAGE_STATS_PREFIX}{page}:{outcome}' for page in cached_pages for outcome in ('hit', 'miss')]
+    counts = cache.get_many(keys)
+    return {
+        page: {outcome: counts.get(f'{PAGE_STATS_PREFIX}{page}:{outcome}', 0) for outcome in ('hit', 'miss')}
+        for page in cached_pages
+    }
+
+
+def cache_public_page(page, data_files=()):
+    """Serve anonymous GET requests for a view from the cache.
+
+    Responses are cached per page and full path under the page's version, which
+    bump_page_version() changes (signals.py does so when Challenges change), and
+    the mtimes of the ``data_files`` the page renders. Logged-in users always get
+    a fresh render, since the navigation differs per user. Each lookup is counted
+    as a hit or miss; see get_page_cache_stats().
+    """
+    cached_pages[page] = tuple(data_files)
+
+    def lookup(request):
+        key = page_cache_key(page, request)
+        response = cache.get(key)
+        count_page_request(page, 'miss' if response is None else 'hit')
+        if response is not None:
+            response['X-Page-Cache'] = 'hit'
+        return key, response
+
+    def store(key, response):
+        # Never cache a response that sets cookies (e.g. a new CSRF token).
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            cache.set(key, response, PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or (await request.auser()).is_authenticated:
+                    return await view_func(request, *args, **kwargs)
+                key, response = await sync_to_async(lookup)(request)
+                if response is None:
+                    response = await sync_to_async(store)(key, await view_func(request, *args, **kwargs))
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+            key, response = lookup(request)
+            if response is None:
+                response = store(key, view_func(request, *args, **kwargs))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,58 @@
+import json
+import threading
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_data_file(name, transform=None):
+    """Return the parsed JSON file ``name`` from the data directory.
+
+    The result, after ``transform`` if one is given, is kept for the life of the
+    process and rebuilt only when the file's mtime changes, so a request costs a
+    stat() rather than a read and parse. Callers must treat it as read-only.
+    """
+    path = DATA_DIR / name
+    mtime = path.stat().st_mtime_ns
+    key = (name, transform)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if transform is not None:
+            data = transform(data)
+        _cache[key] = (mtime, data)
+        return data
+
+
+def parse_description(description):
+    sections = []
+    current_section = None
+    for line in description.splitlines():
+        line = line.strip()
+        if line.startswith('■'):
+            if current_section:
+                sections.append(current_section)
+            current_section = {'title': line.strip('■ '), 'content': []}
+        elif line.startswith(('-', '*')):
+            if current_section:
+                current_section['content'].append({'type': 'list', 'text': line.strip('-* ')})
+        elif '(Display inside a styled card/box for emphasis)' in line:
+            if current_section:
+                current_section['is_card'] = True
+        elif line:
+            if current_section:
+                current_section['content'].append({'type': 'paragraph', 'text': line})
+    if current_section:
+        sections.append(current_section)
+    return sections
+
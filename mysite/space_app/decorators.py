@@ -0,0 +1,32 @@
+"""
+django.contrib.auth.decorators.login_required, plus the async view support that
+Django 5.1 adds to it. Once the project is on 5.1 the views can import it from
+Django again.
+"""
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth import decorators
+from django.contrib.auth.views import redirect_to_login
+
+
+async def aload_user(request):
+    """Return request.user, loaded in a thread so async code can then use it without querying.
+
+    request.user rather than request.auser(): the user may be the one
+    CachedImpersonateMiddleware swapped in.
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def login_required(view_func):
+    if not iscoroutinefunction(view_func):
+        return decorators.login_required(view_func)
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if (await aload_user(request)).is_authenticated:
+            return await view_func(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path())
+    return wrapper
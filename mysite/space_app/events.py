@@ -0,0 +1,335 @@
+"""
+Live updates for join requests and team membership, sent as server-sent events.
+
+signals.py calls publish() and the message goes out once the transaction
+commits. Each process has one broker, which hands a message to every open
+stream subscribed to one of its channels: ``user:<pk>`` for the user's own
+join requests and memberships, and for the join requests of the teams they
+lead; ``team:<pk>`` for the membership changes of the teams they lead, belong
+to or mentor. A stream works its channels out again after every membership
+event it passes on, so joining or leaving a team takes effect without
+reconnecting. The backend carries messages between processes. LocalBackend, the
+default, only reaches the process that published, which is right for a single
+ASGI worker. With several workers, set EVENTS_BACKEND to
+'space_app.events.DatabaseBackend'.
+
+The stream is served by EventStreamApplication, which asgi.py puts in front of
+Django. Django's handler would keep a thread per open connection for the sync
+parts of its middleware; here an idle stream is a coroutine, a queue and a
+timer. Under WSGI, views.events answers 204, which tells EventSource not to
+reconnect, and the pages update on reload as before.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, close_old_connections, transaction
+from django.db.models import Max
+from django.http import parse_cookie
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Event, Team
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = getattr(settings, 'EVENTS_BACKEND', 'space_app.events.LocalBackend')
+# Sent as a comment on idle streams, so proxies and load balancers keep them open.
+HEARTBEAT_SECONDS = 25
+# How long EventSource waits before reconnecting after the stream ends.
+RETRY_MILLISECONDS = 5000
+# Messages a stream may fall behind by; past that it is closed and the client reconnects.
+QUEUE_SIZE = 64
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def team_channel(team_id):
+    return f'team:{team_id}'
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+def publish(channels, event, **data):
+    """Send ``event`` with ``data`` to the streams subscribed to any of ``channels``.
+
+    Nothing is sent until the current transaction commits, so a client that
+    reloads on the event sees the change, and a rolled back change sends nothing.
+    """
+    message = format_event(event, data)
+    channels = list(channels)
+    transaction.on_commit(lambda: broker.publish(channels, message))
+
+
+def publish_join_request(join_request_id, team_id, leader_id, user_id, status):
+    """Tell the team's leader and the applicant that a join request was made, accepted, rejected or canceled.
+
+    Not the rest of the team: a pending request is between those two.
+    """
+    publish(
+        [user_channel(user_id)] + ([user_channel(leader_id)] if leader_id is not None else []),
+        'join_request', id=join_request_id, team=team_id, user=user_id, status=status,
+    )
+
+
+def subscriber_channels(user):
+    """Return the channels a logged-in user's stream listens on."""
+    through = (Team.members.through, Team.mentors.through)
+    team_ids = Team.objects.filter(leader=user).values_list('pk', flat=True).union(
+        *(model.objects.filter(user=user).values_list('team_id', flat=True) for model in through)
+    )
+    return [user_channel(user.pk), *(team_channel(team_id) for team_id in team_ids)]
+
+
+class Subscription:
+    __slots__ = ('channels', 'loop', 'queue')
+
+    def __init__(self, channels, loop):
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def put(self, message):
+        # Runs on the subscriber's event loop. None ends the stream.
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = None
+        self.queue.put_nowait(message)
+
+
+class Broker:
+    """Fans messages out to this process's open streams.
+
+    subscribe() and unsubscribe() run on the event loop; deliver() may be called
+    from any thread, such as a sync view's or the DatabaseBackend poller's.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)  # channel -> subscriptions
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = import_string(EVENTS_BACKEND)(self)
+        return self._backend
+
+    def publish(self, channels, message):
+        self.backend.publish(channels, message)
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, asyncio.get_running_loop())
+        with self.lock:
+            for channel in channels:
+                self.subscriptions[channel].add(subscription)
+        self.backend.start()
+        return subscription
+
+    def resubscribe(self, subscription, channels):
+        """Move ``subscription`` over to ``channels``, keeping the messages it has queued."""
+        with self.lock:
+            self.remove(subscription)
+            subscription.channels = channels
+            for channel in channels:
+                self.subscriptions[channel].add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.remove(subscription)
+
+    def remove(self, subscription):
+        for channel in subscription.channels:
+            subscribers = self.subscriptions.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[channel]
+
+    def deliver(self, channels, message):
+        with self.lock:
+            # A set, so a stream on several of the channels gets the message once.
+            subscribers = set().union(*(self.subscriptions.get(channel, ()) for channel in channels))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                pass  # its event loop has closed; unsubscribe() is on its way
+
+    async def stream(self, channels, refresh_channels=None):
+        """Yield the response body for a stream on ``channels`` until it is closed.
+
+        After each membership event, ``refresh_channels()`` (a coroutine
+        function) is awaited for the channels to listen on from then; None
+        closes the stream.
+        """
+        subscription = self.subscribe(channels)
+        try:
+            yield f'retry: {RETRY_MILLISECONDS}\n\n'.encode()
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    message = b': heartbeat\n\n'
+                if message is None:
+                    return
+                yield message
+                if refresh_channels is not None and message.startswith(b'event: membership\n'):
+                    channels = await refresh_channels()
+                    if channels is None:
+                        return
+                    self.resubscribe(subscription, channels)
+        finally:
+            self.unsubscribe(subscription)
+
+
+class LocalBackend:
+    """Delivers messages to the streams of the process that published them."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, channels, message):
+        self.broker.deliver(channels, message)
+
+    def start(self):
+        pass
+
+
+class DatabaseBackend(LocalBackend):
+    """Carries messages between processes through the Event table.
+
+    publish() adds a row; a thread in every process serving streams polls for
+    new rows and delivers them. That is one query per process every
+    POLL_SECONDS, however many streams are open, and messages arrive up to
+    POLL_SECONDS late. Rows older than RETENTION are deleted as it goes.
+    """
+    POLL_SECONDS = getattr(settings, 'EVENTS_POLL_SECONDS', 1)
+    RETENTION = timedelta(minutes=5)
+
+    def __init__(self, broker):
+        super().__init__(broker)
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def events(self):
+        return Event.objects.using(DEFAULT_DB_ALIAS)
+
+    def publish(self, channels, message):
+        self.events.create(channels=channels, message=message.decode())
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.poll, name='space_app.events', daemon=True)
+                self.thread.start()
+
+    def poll(self):
+        last_id = None
+        next_cleanup = 0
+        while True:
+            try:
+                last_id = self.deliver_new_events(last_id)
+                if time.monotonic() > next_cleanup:
+                    self.events.filter(created_at__lt=timezone.now() - self.RETENTION).delete()
+                    next_cleanup = time.monotonic() + self.RETENTION.total_seconds()
+            except DatabaseError:
+                logger.exception('Polling for events failed')
+            finally:
+                close_old_connections()
+            time.sleep(self.POLL_SECONDS)
+
+    def deliver_new_events(self, last_id):
+        """Deliver the events after ``last_id`` and return the last one's id; None starts from now."""
+        if last_id is None:
+            return self.events.aggregate(last_id=Max('pk'))['last_id'] or 0
+        for pk, channels, message in self.events.filter(pk__gt=last_id).order_by('pk').values_list(
+            'pk', 'channels', 'message',
+        ):
+            self.broker.deliver(channels, message.encode())
+            last_id = pk
+        return last_id
+
+
+broker = Broker()
+
+
+class EventStreamApplication:
+    """ASGI application that serves the stream at reverse('events') and passes the rest to Django.
+
+    Only logged-in users get a stream; the user comes from the session cookie
+    the same way AuthenticationMiddleware loads it. Impersonation is not
+    applied: a stream carries the real user's updates.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.path = reverse('events')
+        self.session_engine = import_module(settings.SESSION_ENGINE)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get('path', '').removeprefix(scope.get('root_path', ''))
+        if scope['type'] != 'http' or path != self.path or scope['method'] != 'GET':
+            return await self.application(scope, receive, send)
+
+        cookies = parse_cookie(b', '.join(value for name, value in scope['headers'] if name == b'cookie').decode('latin1'))
+        session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+        # Not thread_sensitive: that would start a thread for this connection and keep it.
+        channels_for = sync_to_async(self.channels_for, thread_sensitive=False)
+        channels = await channels_for(session_key)
+        if channels is None:
+            await send({'type': 'http.response.start', 'status': 401, 'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b'Log in to receive live updates.'})
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),  # nginx would otherwise hold messages back
+            ],
+        })
+        streaming = asyncio.create_task(self.send_stream(send, channels, lambda: channels_for(session_key)))
+        disconnect = asyncio.create_task(self.wait_for_disconnect(receive))
+        done, pending = await asyncio.wait((streaming, disconnect), return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if streaming in done:
+            streaming.result()
+
+    def channels_for(self, session_key):
+        try:
+            session = self.session_engine.SessionStore(session_key)
+            user = auth.get_user(SimpleNamespace(session=session))
+            return subscriber_channels(user) if user.is_authenticated else None
+        finally:
+            close_old_connections()
+
+    async def send_stream(self, send, channels, refresh_channels):
+        async for chunk in broker.stream(channels, refresh_channels):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    @staticmethod
+    async def wait_for_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
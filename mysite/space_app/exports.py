@@ -0,0 +1,134 @@
+import csv
+import json
+
+from .filters import filter_users
+from .models import User, Team, Project
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+# Spreadsheets run a cell starting with one of these as a formula.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def user_role(user):
+    for flag, role in (('is_admin', 'admin'), ('is_GPE', 'gpe'), ('is_Mentor', 'mentor'),
+                       ('is_Registration', 'registration'), ('is_moderator', 'moderator')):
+        if getattr(user, flag):
+            return role
+    return 'user'
+
+
+def user_queryset(filters):
+    users = User.objects.prefetch_related('skills', 'teams')
+    return filter_users(users, filters.get('q'), filters.get('role'), filters.get('in_team'))
+
+
+def user_row(user):
+    return {
+        'id': user.id,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'gender': user.gender,
+        'age': user.age,
+        'university': user.university,
+        'study_field': user.study_field,
+        'role': user_role(user),
+        'skills': [skill.name for skill in user.skills.all()],
+        'other_skills': user.other_skills,
+        'teams': [team.name for team in user.teams.all()],
+    }
+
+
+def team_queryset(filters):
+    return Team.objects.select_related('challenge', 'leader').prefetch_related('members', 'mentors')
+
+
+def team_row(team):
+    return {
+        'id': team.id,
+        'name': team.name,
+        'challenge': team.challenge.title if team.challenge else '',
+        'leader': team.leader.email if team.leader else '',
+        'looking_for_members': team.looking_for_members,
+        'member_count': team.member_count,
+        'members': [member.email for member in team.members.all()],
+        'mentors': [mentor.email for mentor in team.mentors.all()],
+    }
+
+
+def project_queryset(filters):
+    return Project.objects.select_related('team')
+
+
+def project_row(project):
+    return {
+        'id': project.id,
+        'name': project.name,
+        'team': project.team.name,
+        'submission_status': project.submission_status,
+        'video_url': project.video_url or '',
+        'has_project_file': bool(project.project_file),
+        'has_powerpoint': bool(project.powerpoint_file),
+        'has_resources': bool(project.resources_used),
+    }
+
+
+# dataset name -> (queryset factory taking the q/role/in_team filters, row builder, columns)
+DATASETS = {
+    'users': (user_queryset, user_row, [
+        'id', 'email', 'first_name', 'last_name', 'gender', 'age', 'university', 'study_field', 'role',
+        'skills', 'other_skills', 'teams',
+    ]),
+    'teams': (team_queryset, team_row, [
+        'id', 'name', 'challenge', 'leader', 'looking_for_members', 'member_count', 'members', 'mentors',
+    ]),
+    'projects': (project_queryset, project_row, [
+        'id', 'name', 'team', 'submission_status', 'video_url', 'has_project_file', 'has_powerpoint',
+        'has_resources',
+    ]),
+}
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    """``value`` as a CSV cell, with a ' in front of text a spreadsheet would run as a formula."""
+    if isinstance(value, list):
+        value = '; '.join(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_rows(dataset, filters):
+    get_queryset, build_row, _ = DATASETS[dataset]
+    # iterator() with chunk_size keeps memory flat and still runs the prefetches per chunk.
+    for obj in get_queryset(filters).order_by('pk').iterator(chunk_size=CHUNK_SIZE):
+        yield build_row(obj)
+
+
+def iter_export(dataset, fmt, filters):
+    """Yield the export of ``dataset`` as CSV or JSONL text, one line at a time.
+
+    List values are joined with "; " in CSV and kept as arrays in JSONL. CSV
+    text that would start a formula is prefixed with ', see csv_cell().
+    """
+    rows = iter_rows(dataset, filters)
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(row) + '\n'
+        return
+
+    writer = csv.DictWriter(Echo(), fieldnames=DATASETS[dataset][2])
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow({key: csv_cell(value) for key, value in row.items()})
@@ -0,0 +1,32 @@
+from .search import search_users
+
+
+def filter_users(users, query=None, role_filter=None, in_team_filter=None):
+    """Apply the admin dashboard's ``q``/``role``/``in_team`` filters to a User queryset.
+
+    With ``q`` the users come best match first; callers that page by id reorder them.
+    """
+    if query:
+        users = search_users(users, query)
+
+    if role_filter:
+        if role_filter == 'admin':
+            users = users.filter(is_admin=True)
+        elif role_filter == 'gpe':
+            users = users.filter(is_GPE=True)
+        elif role_filter == 'mentor':
+            users = users.filter(is_Mentor=True)
+        elif role_filter == 'registration':
+            users = users.filter(is_Registration=True)
+        elif role_filter == 'moderator':
+            users = users.filter(is_moderator=True)
+        elif role_filter == 'user':
+            users = users.filter(is_admin=False, is_GPE=False, is_Mentor=False, is_Registration=False, is_moderator=False)
+
+    if in_team_filter:
+        if in_team_filter == 'yes':
+            users = users.filter(teams__isnull=False).distinct()
+        elif in_team_filter == 'no':
+            users = users.filter(teams__isnull=True).distinct()
+
+    return users
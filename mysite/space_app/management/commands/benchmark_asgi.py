@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+from django.test import Client
+from space_app.models import User
+
+HOST = '127.0.0.1'
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays GET requests against the WSGI and the ASGI application, each in a fresh process, and reports '
+        'requests per second, p50/p99 latency and peak memory. The same number of clients is kept busy in both '
+        'cases; the WSGI application is served by --threads worker threads, like a threaded WSGI server.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/teams/', '/challenges/'], help='Paths to request, in turn')
+        parser.add_argument('--server', choices=('wsgi', 'asgi', 'both'), default='both')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per server')
+        parser.add_argument('--concurrency', type=int, default=32, help='Clients sending requests at the same time')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--user', help='Email of the user to send the requests as (default: anonymous)')
+        parser.add_argument(
+            '--query-latency', type=float, default=0,
+            help='Milliseconds added to every query, to stand in for a database server across the network',
+        )
+        parser.add_argument('--in-process', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if not options['in_process']:
+            for server in ('wsgi', 'asgi') if options['server'] == 'both' else (options['server'],):
+                # A process each: settings.ASGI has to be set before Django starts,
+                # and the peak memory is then that server's alone.
+                command = [sys.executable, sys.argv[0], 'benchmark_asgi', *options['paths'], '--server', server, '--in-process']
+                for option in ('requests', 'concurrency', 'threads', 'user', 'query_latency'):
+                    if options[option] is not None:
+                        command += [f'--{option.replace("_", "-")}', str(options[option])]
+                env = {**os.environ, 'DJANGO_ASGI': '1' if server == 'asgi' else '0'}
+                if subprocess.run(command, env=env).returncode:
+                    raise CommandError(f'The {server} run failed')
+            return
+        if options['server'] not in ('wsgi', 'asgi') or settings.ASGI != (options['server'] == 'asgi'):
+            raise CommandError('--in-process needs --server wsgi, or --server asgi with DJANGO_ASGI=1')
+
+        if options['query_latency']:
+            def delay(execute, sql, params, many, context):
+                time.sleep(options['query_latency'] / 1000)
+                return execute(sql, params, many, context)
+
+            def add_delay(sender, connection, **kwargs):
+                connection.execute_wrappers.append(delay)
+
+            connection_created.connect(add_delay, weak=False)
+
+        cookie = ''
+        if options['user']:
+            try:
+                user = User.objects.get(email=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'No user with email {options["user"]}')
+            client = Client()
+            client.force_login(user)
+            cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        if options['server'] == 'wsgi':
+            application = get_wsgi_application()
+            pool = ThreadPoolExecutor(max_workers=options['threads'])
+
+            async def request(path):
+                return await asyncio.get_running_loop().run_in_executor(pool, self.call_wsgi, application, path, cookie)
+        else:
+            application = get_asgi_application()
+
+            async def request(path):
+                return await self.call_asgi(application, path, cookie)
+
+        for path in options['paths']:  # warm up caches and connections
+            status = asyncio.run(request(path))
+            if status != 200:
+                raise CommandError(f'{path} returned {status}')
+
+        latencies, elapsed = asyncio.run(self.run_clients(request, options))
+        latencies.sort()
+        detail = f'{options["threads"]} threads' if options['server'] == 'wsgi' else 'event loop'
+        self.stdout.write(
+            f'{options["server"]} ({detail}, {options["concurrency"]} clients)  {len(latencies) / elapsed:8.1f} req/s  '
+            f'p50 {latencies[len(latencies) // 2] * 1000:6.1f} ms  '
+            f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.1f} ms  '
+            f'peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB'
+        )
+
+    async def run_clients(self, request, options):
+        paths = options['paths']
+        remaining = iter(range(options['requests']))
+        latencies = []
+
+        async def client():
+            for index in remaining:
+                started = time.perf_counter()
+                status = await request(paths[index % len(paths)])
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    raise CommandError(f'{paths[index % len(paths)]} returned {status}')
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        return latencies, time.perf_counter() - started
+
+    @staticmethod
+    def call_wsgi(application, path, cookie):
+        path, _, query_string = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query_string, 'HTTP_HOST': HOST, 'HTTP_COOKIE': cookie,
+        }
+        setup_testing_defaults(environ)
+        status = []
+        result = application(environ, lambda status_line, headers, exc_info=None: status.append(status_line))
+        try:
+            for _ in result:
+                pass
+        finally:
+            result.close()  # what the server does once the body is sent; fires request_finished
+        return int(status[0].split()[0])
+
+    @staticmethod
+    async def call_asgi(application, path, cookie):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': b'', 'root_path': '', 'client': (HOST, 50000), 'server': (HOST, 80),
+            'headers': [(b'host', HOST.encode()), (b'cookie', cookie.encode())],
+        }
+        sent = asyncio.Event()
+        received = []
+        status = []
+
+        async def receive():
+            if not received:
+                received.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Django listens for a disconnect while the view runs; the client
+            # only goes away once it has the whole response.
+            await sent.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                sent.set()
+
+        await application(scope, receive, send)
+        return status[0]
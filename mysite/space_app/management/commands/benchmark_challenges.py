@@ -0,0 +1,36 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+from space_app.caching import get_cached_challenges
+from space_app.data_files import DATA_DIR, parse_description
+from space_app.models import Challenge
+
+def load_from_file():
+    with open(DATA_DIR / 'challenges.json', 'r') as f:
+        challenges_data = json.load(f)
+    for challenge in challenges_data:
+        challenge['parsed_description'] = parse_description(challenge['description'])
+    return challenges_data
+
+def load_from_table():
+    return list(Challenge.objects.order_by('id'))
+
+class Command(BaseCommand):
+    help = 'Times loading the challenges page data from the JSON file, the Challenge table and the cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Calls timed per variant')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        get_cached_challenges()  # warm the cache
+
+        variants = (
+            ('file (read + parse)', load_from_file),
+            ('Challenge table', load_from_table),
+            ('cached queryset', get_cached_challenges),
+        )
+        for label, func in variants:
+            best = min(timeit.repeat(func, number=iterations, repeat=3)) / iterations
+            self.stdout.write(f'{label:<24} {best * 1e6:10.1f} us/call')
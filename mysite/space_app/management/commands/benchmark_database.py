@@ -0,0 +1,121 @@
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from space_app.models import Contact, Team, User
+
+class Command(BaseCommand):
+    help = (
+        'Runs a mixed read/write workload from several threads, first with the stock SQLite settings and then '
+        'with the tuned ones (settings.SQLITE_PRAGMAS), and reports throughput and "database is locked" errors '
+        'for each. It runs on a scratch copy of the database, which is deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Number of concurrent worker threads')
+        parser.add_argument('--seconds', type=float, default=5, help='How long each profile runs')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Share of operations that write')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for the read/write mix')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('benchmark_database compares SQLite settings; the default database is ' + connection.vendor)
+
+        configured = connection.settings_dict.copy()
+        profiles = (
+            # What the project ran with before: rollback journal, deferred
+            # transactions and the sqlite3 module's 5 second timeout.
+            ('stock', {'timeout': 5, 'init_command': 'PRAGMA journal_mode=DELETE'}),
+            ('tuned', {**configured['OPTIONS'], 'init_command': settings.SQLITE_PRAGMAS}),
+        )
+        scratch_dir = Path(tempfile.mkdtemp())
+        base = scratch_dir / 'base.sqlite3'
+        connection.close()
+        try:
+            # Migrated, in case the database is behind the code.
+            self.copy_database(configured['NAME'], base)
+            connection.settings_dict.update(NAME=base, OPTIONS=profiles[0][1])
+            call_command('migrate', verbosity=0, interactive=False)
+            connection.close()
+            for label, db_options in profiles:
+                # A fresh copy per profile, so both start from the same data. Every
+                # thread's connection reads the shared settings dict when it connects.
+                scratch = scratch_dir / f'{label}.sqlite3'
+                self.copy_database(base, scratch)
+                connection.settings_dict.update(NAME=scratch, OPTIONS=db_options)
+                connection.ensure_connection()  # sets the copy's journal mode before the workers start
+                self.run_profile(label, options)
+                connection.close()
+        finally:
+            connection.close()
+            connection.settings_dict.update(NAME=configured['NAME'], OPTIONS=configured['OPTIONS'])
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def copy_database(self, source, target):
+        with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+            src.backup(dst)
+
+    def run_profile(self, label, options):
+        results = {'reads': 0, 'writes': 0, 'locked': 0}
+        latencies = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+        seed = options['seed']
+
+        def read():
+            list(Team.objects.with_members().select_related('challenge')[:50])
+            User.objects.filter(is_Mentor=True).count()
+
+        def write():
+            # Read then write in one transaction, like the join and registration views.
+            with transaction.atomic():
+                Team.objects.filter(member_count__lt=Team.MAX_MEMBERS).exists()
+                Contact.objects.create(name='Benchmark', email='benchmark@example.invalid', message=label)
+
+        def worker(index):
+            rng = random.Random(None if seed is None else seed + index)
+            counts = {'reads': 0, 'writes': 0, 'locked': 0}
+            timings = []
+            try:
+                while time.perf_counter() < deadline:
+                    is_write = rng.random() < options['write_ratio']
+                    started = time.perf_counter()
+                    try:
+                        write() if is_write else read()
+                    except OperationalError:
+                        counts['locked'] += 1
+                        continue
+                    timings.append(time.perf_counter() - started)
+                    counts['writes' if is_write else 'reads'] += 1
+            finally:
+                connection.close()
+            with lock:
+                for key, value in counts.items():
+                    results[key] += value
+                latencies.extend(timings)
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        done = results['reads'] + results['writes']
+        attempted = done + results['locked']
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        self.stdout.write(
+            f'{label:<11} {done / elapsed:8.1f} ops/s  ({results["reads"]} reads, {results["writes"]} writes)  '
+            f'{results["locked"]} locked ({results["locked"] / attempted if attempted else 0:.1%})  p99 {p99:.1f} ms'
+        )
@@ -0,0 +1,344 @@
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Exists, OuterRef
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from space_app import urls
+from space_app.models import Contact, JoinRequest, Project, Skill, Team, User
+
+from .benchmark_asgi import Command as BenchmarkAsgi
+
+# Who sends each URL's requests, and with what arguments. An argument starting
+# with ? is the query string. '<team>', '<project>'
+# and '<user>' are a random seeded one per request; '<own_team>' and
+# '<own_project>' are the sending leader's, '<open_team>' a team the sending
+# outsider may join. Each client has a leader and an outsider of its own and
+# shares the admin; it sends a case's URLs in order, so join_team is always
+# followed by the cancel_join_request that undoes it.
+CASES = [
+    (None, [('landing_page', [])]),
+    (None, [('register', [])]),
+    (None, [('login', [])]),
+    (None, [('contact', [])]),
+    (None, [('contact_success', [])]),
+    (None, [('about_us', [])]),
+    (None, [('privacy_policy', [])]),
+    (None, [('rules', [])]),
+    (None, [('challenges', [])]),
+    ('leader', [('dashboard_redirect', [])]),
+    ('leader', [('profile', [])]),
+    ('leader', [('edit_profile', [])]),
+    ('leader', [('teams', [])]),
+    ('leader', [('team_detail', ['<team>'])]),
+    ('leader', [('project_detail', ['<project>'])]),
+    ('leader', [('edit_team', ['<own_team>'])]),
+    ('leader', [('create_project', ['<own_team>'])]),
+    ('leader', [('edit_project', ['<own_project>'])]),
+    ('leader', [('manage_join_requests', ['<own_team>'])]),
+    ('leader', [('invite_member', ['<own_team>'])]),
+    ('leader', [('events', [])]),
+    ('outsider', [('create_team', [])]),
+    ('outsider', [('join_team', ['<open_team>']), ('cancel_join_request', ['<open_team>'])]),
+    ('admin', [('admin_dashboard', [])]),
+    ('admin', [('admin_dashboard_partial', ['users'])]),
+    ('admin', [('admin_dashboard_partial', ['teams'])]),
+    ('admin', [('admin_dashboard_partial', ['projects'])]),
+    ('admin', [('admin_dashboard_partial', ['contacts'])]),
+    ('admin', [('participant_dashboard', [])]),
+    ('admin', [('search_participants', ['?q=ahm+eng'])]),
+    ('admin', [('export_data', ['users', 'csv'])]),
+    ('admin', [('export_data', ['teams', 'jsonl'])]),
+    ('admin', [('export_data', ['projects', 'csv'])]),
+    ('admin', [('edit_user', ['<user>'])]),
+    ('admin', [('user_detail', ['<user>'])]),
+    ('admin', [('page_cache_stats', [])]),
+    ('admin', [('metrics', [])]),
+]
+
+# URLs that change data on GET in a way the run could not undo.
+SKIPPED = {
+    'logout': 'ends the client session',
+    'delete_user': 'deletes seeded data',
+    'delete_team': 'deletes seeded data',
+    'delete_project': 'deletes seeded data',
+    'leave_team': 'changes seeded memberships',
+    'handle_join_request': 'uses up the pending join requests',
+}
+
+
+# Changes in p95 smaller than this are noise, whatever the percentage.
+NOISE_MS = 5
+
+
+def case_label(name, args):
+    """'export_data/users/csv': the URL name and its literal arguments."""
+    return '/'.join([name, *(str(arg) for arg in args if not str(arg).startswith(('<', '?')))])
+
+
+def percentile(latencies, fraction):
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+# Queries of the request the thread is sending, including those run while a
+# streaming response is consumed.
+_sending = threading.local()
+
+
+def count_query(execute, sql, params, many, context):
+    if getattr(_sending, 'queries', None) is not None:
+        _sending.queries += 1
+    return execute(sql, params, many, context)
+
+
+def add_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends every space_app URL to the WSGI application from concurrent logged-in clients, and writes each '
+        'URL\'s p50/p95/p99 latency, throughput and SQL queries per request to a JSON report. Run it against data '
+        'from seed_scale; with --compare it checks the run against an earlier report. URLs that change data on GET '
+        'beyond repair are listed in the report as skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per URL')
+        parser.add_argument('--concurrency', type=int, default=8, help='Clients sending requests at the same time')
+        parser.add_argument('--only', nargs='+', metavar='URL_NAME', help='Only these URL names')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for the clients and arguments')
+        parser.add_argument(
+            '--output', default=str(settings.BASE_DIR / 'benchmark_report.json'), help='Where to write the JSON report',
+        )
+        parser.add_argument('--compare', metavar='REPORT', help='An earlier report to compare this run against')
+        parser.add_argument(
+            '--tolerance', type=float, default=25,
+            help='Percent a URL\'s p95 may grow over the --compare report before it counts as a regression',
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true', help='Exit with an error if --compare finds a regression',
+        )
+
+    def handle(self, *args, **options):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        covered = {name for _, steps in CASES for name, _ in steps} | set(SKIPPED)
+        if names - covered:
+            raise CommandError(f'No benchmark case for {", ".join(sorted(names - covered))}; add them to CASES or SKIPPED')
+        if options['only']:
+            unknown = set(options['only']) - names
+            if unknown:
+                raise CommandError(f'Unknown URL names: {", ".join(sorted(unknown))}')
+        cases = [
+            (role, steps) for role, steps in CASES
+            if not options['only'] or any(name in options['only'] for name, _ in steps)
+        ]
+
+        connection_created.connect(add_query_counter, weak=False)
+        for existing in connections.all(initialized_only=True):
+            add_query_counter(None, existing)
+
+        rng = random.Random(options['seed'])
+        seeded = self.seeded_objects(rng, options['concurrency'])
+        application = get_wsgi_application()
+        report = {
+            'created_at': timezone.now().isoformat(timespec='seconds'),
+            'git_commit': self.git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'rows': {model.__name__: model.objects.count() for model in (User, Skill, Team, JoinRequest, Project, Contact)},
+            'requests_per_url': options['requests'],
+            'concurrency': options['concurrency'],
+            'urls': {},
+            'skipped': {name: reason for name, reason in SKIPPED.items() if not options['only'] or name in options['only']},
+        }
+        for role, steps in cases:
+            results = self.run_case(application, seeded, role, steps, options, rng)
+            for label, result in results.items():
+                self.write_result(label, result)
+            report['urls'].update(results)
+
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}.'))
+        if options['compare']:
+            self.compare(report, options)
+
+    def seeded_objects(self, rng, clients):
+        """Pick the objects and log in the users the clients send their requests with."""
+        admin = User.objects.filter(is_admin=True, is_staff=True, is_active=True).order_by('pk').first()
+        leaders = list(
+            Team.objects.filter(leader__is_staff=False, project__isnull=False)
+            .values_list('leader_id', 'pk', 'project__pk')[:clients]
+        )
+        outsiders = list(
+            User.objects.filter(is_staff=False, is_active=True, teams__isnull=True)
+            .exclude(Exists(JoinRequest.objects.filter(user=OuterRef('pk'), status='pending')))
+            .values_list('pk', flat=True)[:clients]
+        )
+        open_teams = list(Team.objects.filter(looking_for_members=True, member_count__lt=Team.MAX_MEMBERS).values_list('pk', flat=True)[:1000])
+        if admin is None or len(leaders) < clients or len(outsiders) < clients or not open_teams:
+            raise CommandError(
+                f'Needs an admin, {clients} team leaders with a project and {clients} users in no team with no '
+                f'pending request; run seed_scale first, or lower --concurrency'
+            )
+
+        sessions = {}
+
+        def session_cookie(user_id):
+            if user_id not in sessions:
+                client = Client()
+                client.force_login(User.objects.get(pk=user_id))
+                sessions[user_id] = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+            return sessions[user_id]
+
+        return SimpleNamespace(
+            team_ids=list(Team.objects.values_list('pk', flat=True)[:1000]),
+            project_ids=list(Project.objects.values_list('pk', flat=True)[:1000]),
+            user_ids=list(User.objects.filter(is_staff=False).values_list('pk', flat=True)[:1000]),
+            clients=[
+                {
+                    None: '',
+                    'admin': session_cookie(admin.pk),
+                    'leader': session_cookie(leader_id),
+                    'outsider': session_cookie(outsider_id),
+                    'own_team': team_id,
+                    'own_project': project_id,
+                    'open_team': rng.choice(open_teams),
+                }
+                for (leader_id, team_id, project_id), outsider_id in zip(leaders, outsiders)
+            ],
+        )
+
+    def run_case(self, application, seeded, role, steps, options, rng):
+        def resolve_path(client, name, args):
+            values = {
+                '<team>': lambda: rng.choice(seeded.team_ids),
+                '<project>': lambda: rng.choice(seeded.project_ids),
+                '<user>': lambda: rng.choice(seeded.user_ids),
+                '<own_team>': lambda: client['own_team'],
+                '<own_project>': lambda: client['own_project'],
+                '<open_team>': lambda: client['open_team'],
+            }
+            query_string = ''.join(arg for arg in args if arg.startswith('?'))
+            args = [values[arg]() if arg in values else arg for arg in args if not arg.startswith('?')]
+            return reverse(name, args=args) + query_string
+
+        def send(client, name, args):
+            path = resolve_path(client, name, args)
+            _sending.queries = 0
+            started = time.perf_counter()
+            try:
+                status = BenchmarkAsgi.call_wsgi(application, path, client[role])
+                return time.perf_counter() - started, status, _sending.queries
+            finally:
+                _sending.queries = None
+
+        for client in seeded.clients:  # warm up caches, sessions and connections
+            for name, args in steps:
+                send(client, name, args)
+
+        remaining = iter(range(options['requests']))
+        latencies = {case_label(name, args): [] for name, args in steps}
+        statuses = {label: Counter() for label in latencies}
+        queries = Counter()
+        lock = threading.Lock()
+
+        def run_client(client):
+            try:
+                for _ in remaining:
+                    for name, args in steps:
+                        duration, status, query_count = send(client, name, args)
+                        label = case_label(name, args)
+                        with lock:
+                            latencies[label].append(duration)
+                            statuses[label][status] += 1
+                            queries[label] += query_count
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for future in [pool.submit(run_client, client) for client in seeded.clients]:
+                future.result()
+        elapsed = time.perf_counter() - started
+
+        results = {}
+        for name, args in steps:
+            label = case_label(name, args)
+            durations = sorted(latencies[label])
+            results[label] = {
+                'path': resolve_path(seeded.clients[0], name, args),
+                'role': role or 'anonymous',
+                'requests': len(durations),
+                'statuses': {str(status): count for status, count in sorted(statuses[label].items())},
+                'throughput_rps': round(len(durations) / elapsed, 1),
+                'mean_ms': round(sum(durations) / len(durations) * 1000, 2),
+                'p50_ms': round(percentile(durations, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(durations, 0.99) * 1000, 2),
+                'queries_per_request': round(queries[label] / len(durations), 2),
+            }
+        return results
+
+    def write_result(self, label, result):
+        errors = sum(count for status, count in result['statuses'].items() if status.startswith('5'))
+        line = (
+            f'{label:36} {result["role"]:9} {result["throughput_rps"]:8.1f} req/s  p50 {result["p50_ms"]:7.1f}  '
+            f'p95 {result["p95_ms"]:7.1f}  p99 {result["p99_ms"]:7.1f} ms  {result["queries_per_request"]} queries'
+        )
+        self.stdout.write(self.style.ERROR(f'{line}  {errors} errors') if errors else line)
+
+    def compare(self, report, options):
+        try:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {options["compare"]}: {exc}')
+        self.stdout.write(f'Compared with {options["compare"]} ({baseline.get("git_commit") or "unknown commit"}):')
+        regressions = []
+        for label, result in report['urls'].items():
+            before = baseline.get('urls', {}).get(label)
+            if before is None:
+                self.stdout.write(f'  {label}: new')
+                continue
+            change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            # Means, so a query that only some requests run (a cache miss) does not count.
+            more_queries = result['queries_per_request'] - before['queries_per_request'] >= 0.5
+            line = (
+                f'  {label:36} p95 {before["p95_ms"]:7.1f} -> {result["p95_ms"]:7.1f} ms ({change:+.0f}%)  '
+                f'queries {before["queries_per_request"]} -> {result["queries_per_request"]}'
+            )
+            slower = change > options['tolerance'] and result['p95_ms'] - before['p95_ms'] > NOISE_MS
+            if slower or more_queries:
+                regressions.append(label)
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} URL(s) regressed: {", ".join(regressions)}')
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
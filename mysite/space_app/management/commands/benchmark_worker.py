@@ -0,0 +1,40 @@
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from space_app.models import Task
+from space_app.tasks import task
+
+@task
+def benchmark_noop(index, latency=0):
+    # latency stands in for the network round trip of a real task such as sending mail
+    if latency:
+        time.sleep(latency)
+
+class Command(BaseCommand):
+    help = (
+        'Measures how many no-op tasks per second run_worker drains at different thread counts. '
+        'The worker only claims the benchmark\'s own tasks, so other queued tasks are left alone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=2000, help='Tasks enqueued per run')
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8], help='Thread counts to try')
+        parser.add_argument('--latency-ms', type=float, default=0, help='Simulated I/O time per task')
+
+    def handle(self, *args, **options):
+        for threads in options['threads']:
+            Task.objects.bulk_create(
+                [
+                    Task(name='benchmark_noop', payload={'index': index, 'latency': options['latency_ms'] / 1000})
+                    for index in range(options['tasks'])
+                ],
+                batch_size=500,
+            )
+            started = time.perf_counter()
+            call_command('run_worker', threads=threads, once=True, names=['benchmark_noop'], stdout=StringIO())
+            elapsed = time.perf_counter() - started
+            done = Task.objects.filter(name='benchmark_noop', status='done').count()
+            Task.objects.filter(name='benchmark_noop').delete()
+            self.stdout.write(f'{threads:>3} thread(s): {done} tasks in {elapsed:.2f}s, {done / elapsed:.0f} tasks/s')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from space_app.exports import DATASETS, FORMATS, iter_export
+
+class Command(BaseCommand):
+    help = 'Streams users, teams or projects as CSV or JSONL, with the same filters as the admin dashboard.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', dest='fmt', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write to (defaults to stdout)')
+        parser.add_argument('-q', '--query', help='Only users whose name or email contains this text')
+        parser.add_argument('--role', help='Only users with this role (admin, gpe, mentor, registration, moderator, user)')
+        parser.add_argument('--in-team', choices=['yes', 'no'], help='Only users who are / are not in a team')
+
+    def handle(self, *args, **options):
+        filters = {'q': options['query'], 'role': options['role'], 'in_team': options['in_team']}
+        lines = iter_export(options['dataset'], options['fmt'], filters)
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
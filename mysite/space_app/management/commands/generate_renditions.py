@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from PIL import Image, UnidentifiedImageError
+from space_app.models import User, Team
+from space_app.renditions import RENDITIONS, generate_renditions
+
+class Command(BaseCommand):
+    help = 'Generates the resized WebP renditions of every existing avatar and team photo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that already exist')
+
+    def handle(self, *args, **options):
+        sources = (
+            (User.objects.exclude(avatar='').exclude(avatar__isnull=True).only('avatar'), 'avatar'),
+            (Team.objects.exclude(team_photo='').exclude(team_photo__isnull=True).only('team_photo'), 'team_photo'),
+        )
+        done = failed = 0
+        for queryset, field in sources:
+            for instance in queryset.iterator():
+                field_file = getattr(instance, field)
+                try:
+                    generate_renditions(field_file, force=options['force'])
+                    done += 1
+                except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'Skipped "{field_file.name}": {e}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {", ".join(RENDITIONS)} renditions for {done} image(s), {failed} skipped.'
+        ))
@@ -1,26 +1,45 @@
-
 import json
-from django.core.management.base import BaseCommand
-from mysite.space_app.models import Challenge
+from django.core.management.base import BaseCommand, CommandError
+from space_app.bulk import bulk_upsert
+from space_app.caching import invalidate_challenges
+from space_app.data_files import DATA_DIR, parse_description
+from space_app.models import Challenge
 
 class Command(BaseCommand):
-    help = 'Import challenges from a JSON file'
+    help = 'Import challenges from a JSON file, matching existing challenges by title'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(DATA_DIR / 'challenges.json'), help='JSON file to import')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without writing them')
 
     def handle(self, *args, **options):
-        with open('mysite/space_app/data/challenges.json', 'r') as f:
-            challenges = json.load(f)
-            for challenge_data in challenges:
-                challenge, created = Challenge.objects.update_or_create(
-                    id=challenge_data['id'],
-                    defaults={
-                        'title': challenge_data['title'],
-                        'category': challenge_data['category'],
-                        'description': challenge_data['description'],
-                        'difficulty': challenge_data['difficulty'],
-                        'image': challenge_data['image'],
-                    }
-                )
-                if created:
-                    self.stdout.write(self.style.SUCCESS(f'Successfully created challenge "{challenge.title}"'))
-                else:
-                    self.stdout.write(self.style.SUCCESS(f'Successfully updated challenge "{challenge.title}"'))
+        try:
+            with open(options['path'], 'r') as f:
+                challenges = json.load(f)
+        except OSError as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+
+        rows = [
+            {
+                'title': challenge_data['title'],
+                'category': challenge_data['category'],
+                'description': challenge_data['description'],
+                'difficulty': challenge_data['difficulty'],
+                'image': challenge_data['image'],
+                'parsed_description': parse_description(challenge_data['description']),
+            }
+            for challenge_data in challenges
+        ]
+        result = bulk_upsert(Challenge, rows, key='title', dry_run=options['dry_run'])
+        if not options['dry_run']:
+            invalidate_challenges()
+
+        for title in result.created:
+            self.stdout.write(self.style.SUCCESS(f'+ "{title}"'))
+        for title, changes in result.updated.items():
+            self.stdout.write(self.style.WARNING(f'~ "{title}": {", ".join(sorted(changes))}'))
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(rows)} challenge(s): {len(result.created)} created, '
+            f'{len(result.updated)} updated, {len(result.unchanged)} unchanged'
+        ))
@@ -0,0 +1,76 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from space_app.filters import filter_users
+from space_app.models import User, Team, JoinRequest
+
+# SQLite reports a full table scan as "SCAN <table>"; an index scan says "USING ... INDEX".
+FULL_SCAN_RE = re.compile(r'^SCAN (\w+)(?!.*\bINDEX\b)')
+
+
+def hot_queries():
+    """The lookups the busiest pages run, as (label, callable evaluating them)."""
+    user_id, team_id = 1, 1
+    queries = [
+        ('pending requests of a user', lambda: list(JoinRequest.objects.filter(user_id=user_id, status='pending'))),
+        ('pending requests to a team', lambda: list(
+            JoinRequest.objects.filter(team_id=team_id, status='pending').order_by('created_at')
+        )),
+        ('pending request for (user, team)', lambda: JoinRequest.objects.filter(
+            user_id=user_id, team_id=team_id, status='pending'
+        ).exists()),
+        ('teams with members', lambda: list(Team.objects.with_members())),
+        ('teams looking for members with open seats', lambda: list(
+            Team.objects.filter(looking_for_members=True, member_count__lt=Team.MAX_MEMBERS)
+        )),
+        ('teams of a user', lambda: list(User(pk=user_id).teams.values_list('id', flat=True))),
+    ]
+    for role in ('admin', 'gpe', 'mentor', 'registration', 'moderator', 'user'):
+        queries.append((f'{role} users, first page', lambda role=role: list(
+            filter_users(User.objects.all(), role_filter=role).order_by('pk')[:51]
+        )))
+    return queries
+
+
+class Command(BaseCommand):
+    help = 'Replays the hot queries, or SQL from a file, through EXPLAIN QUERY PLAN and reports full table scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sql-file', help='Explain these statements instead, one per line')
+        parser.add_argument('--verbose', action='store_true', help='Print every plan, not only those with scans')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('index_advisor reads SQLite query plans; the default database is ' + connection.vendor)
+
+        if options['sql_file']:
+            with open(options['sql_file']) as f:
+                statements = [(f'line {number}', line.strip()) for number, line in enumerate(f, 1) if line.strip()]
+        else:
+            statements = []
+            for label, run in hot_queries():
+                with CaptureQueriesContext(connection) as captured:
+                    run()
+                statements.extend((label, query['sql']) for query in captured.captured_queries)
+
+        flagged = 0
+        with connection.cursor() as cursor:
+            for label, sql in statements:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[3] for row in cursor.fetchall()]
+                scans = [match[1] for match in map(FULL_SCAN_RE.match, plan) if match]
+                if scans:
+                    flagged += 1
+                    self.stdout.write(self.style.WARNING(f'{label}: full scan of {", ".join(scans)}'))
+                elif options['verbose']:
+                    self.stdout.write(f'{label}: ok')
+                if scans or options['verbose']:
+                    self.stdout.write(f'  {sql}')
+                    for step in plan:
+                        self.stdout.write(f'    {step}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Explained {len(statements)} statement(s), {flagged} with a full table scan.'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from space_app.caching import bump_team_versions
+from space_app.models import Team
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored member and mentor counts of every team and reports any drift.'
+
+    def handle(self, *args, **options):
+        drifted = Team.objects.annotate(
+            actual_members=Count('members', distinct=True),
+            actual_mentors=Count('mentors', distinct=True),
+        ).values_list('id', 'name', 'member_count', 'actual_members', 'mentor_count', 'actual_mentors')
+
+        mismatches = [row for row in drifted if row[2] != row[3] or row[4] != row[5]]
+        for _, name, member_count, actual_members, mentor_count, actual_mentors in mismatches:
+            self.stdout.write(self.style.WARNING(
+                f'"{name}": members {member_count} -> {actual_members}, mentors {mentor_count} -> {actual_mentors}'
+            ))
+
+        # Only the drifted teams, so the others keep their updated_at (and API ETags).
+        drifted_ids = [row[0] for row in mismatches]
+        Team.objects.filter(pk__in=drifted_ids).refresh_counts()
+        bump_team_versions(drifted_ids)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {len(drifted)} team(s), {len(mismatches)} had drifted.'))
@@ -0,0 +1,56 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from space_app.tasks import claim_next_task, run_task
+
+class Command(BaseCommand):
+    help = 'Runs queued background tasks (e.g. contact form emails) with a pool of worker threads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Number of worker threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when no task is due')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due instead of polling')
+        parser.add_argument('--task', dest='names', nargs='+', help='Only run tasks with these names')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        counts = {'done': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def work(close_connection):
+            try:
+                while not stop.is_set():
+                    task = claim_next_task(options['names'])
+                    if task is None:
+                        if options['once']:
+                            return
+                        stop.wait(options['poll_interval'])
+                        continue
+                    outcome = 'done' if run_task(task) else 'failed'
+                    with lock:
+                        counts[outcome] += 1
+            finally:
+                if close_connection:
+                    connection.close()
+
+        if options['threads'] <= 1:
+            try:
+                work(close_connection=False)
+            except KeyboardInterrupt:
+                pass
+        else:
+            threads = [threading.Thread(target=work, args=(True,), daemon=True) for _ in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            try:
+                while any(thread.is_alive() for thread in threads):
+                    for thread in threads:
+                        thread.join(timeout=0.5)
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping, waiting for running tasks to finish...')
+                stop.set()
+                for thread in threads:
+                    thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {counts["done"]} task(s), {counts["failed"]} failed attempt(s).'))
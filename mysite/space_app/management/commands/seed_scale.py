@@ -0,0 +1,159 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from space_app.bulk import BATCH_SIZE
+from space_app.models import Challenge, Contact, JoinRequest, Project, Skill, Team, User
+
+# Every synthetic user and contact has an email at this domain, which --clear deletes by.
+DOMAIN = 'scale.invalid'
+
+FIRST_NAMES = [
+    'Ahmed', 'Mona', 'Omar', 'Salma', 'Youssef', 'Nour', 'Karim', 'Laila', 'Hassan', 'Farida',
+    'Mostafa', 'Hana', 'Ali', 'Mariam', 'Tarek', 'Yasmin', 'Khaled', 'Dina', 'Amr', 'Reem',
+]
+LAST_NAMES = [
+    'Hassan', 'Ibrahim', 'Mahmoud', 'Ali', 'Mostafa', 'Saleh', 'Fahmy', 'Kamel', 'Nabil', 'Farouk',
+    'Gamal', 'Sabry', 'Adel', 'Fathy', 'Ragab', 'Zaki', 'Soliman', 'Shawky', 'Lotfy', 'Eid',
+]
+UNIVERSITIES = ['Port Said University', 'Cairo University', 'Ain Shams University', 'Alexandria University', 'Mansoura University']
+STUDY_FIELDS = ['Engineering', 'Computer Science', 'Physics', 'Medicine', 'Commerce', 'Design']
+SKILLS = [
+    'Python', 'Machine Learning', 'Data Analysis', 'Data Visualization', 'Web Development', 'Mobile Development',
+    'UI/UX Design', 'Graphic Design', 'Electronics', 'Embedded Systems', 'Robotics', 'Mechanical Design',
+    'Remote Sensing', 'GIS', 'Astrophysics', 'Cloud Computing', 'Project Management', 'Public Speaking',
+    'Research', 'Video Editing',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        f'Fills the database with synthetic users (with skills), teams with members and mentors, join requests, '
+        f'projects and contacts, sized by --users, for load testing with benchmark_urls. Rows are written with '
+        f'bulk_create, so model signals do not run: restart running servers afterwards, as their caches will not '
+        f'know about the new rows. Synthetic users and contacts have @{DOMAIN} emails; --clear removes them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Participants to create')
+        parser.add_argument('--teams', type=int, help='Teams to create (default: one per 8 participants)')
+        parser.add_argument('--mentors', type=int, help='Mentors to create (default: one per 50 participants)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for a repeatable data set')
+        parser.add_argument('--clear', action='store_true', help='Delete earlier synthetic data first')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.clear()
+        elif User.objects.filter(email__endswith=f'@{DOMAIN}').exists():
+            raise CommandError(f'The database already has @{DOMAIN} users; pass --clear to replace them.')
+
+        rng = random.Random(options['seed'])
+        user_count = options['users']
+        team_count = options['teams'] if options['teams'] is not None else user_count // 8
+        mentor_count = options['mentors'] if options['mentors'] is not None else max(user_count // 50, 1)
+        if team_count > user_count:
+            raise CommandError('Every team needs a leader: --teams cannot exceed --users')
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            counts = self.seed(rng, user_count, team_count, mentor_count)
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{count} {name}' for name, count in counts.items()) + f' created in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    def clear(self):
+        # Led teams, join requests and memberships go with the users.
+        deleted, _ = User.objects.filter(email__endswith=f'@{DOMAIN}').delete()
+        deleted += Contact.objects.filter(email__endswith=f'@{DOMAIN}').delete()[0]
+        self.stdout.write(f'Deleted {deleted} rows of earlier synthetic data.')
+
+    def make_user(self, rng, index, password, **roles):
+        kind = 'mentor' if roles.get('is_Mentor') else 'admin' if roles.get('is_admin') else 'user'
+        return User(
+            email=f'{kind}{index}@{DOMAIN}',
+            password=password,
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            # 14 digits starting with 9, and a +99 country code, so they never clash with real ones.
+            national_id=f'{9 * 10 ** 13 + len(kind) * 10 ** 9 + index}',
+            phone_number=f'+99{len(kind)}{index:010d}',
+            gender=rng.choice(('male', 'female')),
+            age=rng.randint(18, 35),
+            university=rng.choice(UNIVERSITIES),
+            study_field=rng.choice(STUDY_FIELDS),
+            is_staff=bool(roles),
+            **roles,
+        )
+
+    def seed(self, rng, user_count, team_count, mentor_count):
+        password = make_password(None)  # unusable; benchmark_urls logs in without one
+        admin = self.make_user(rng, 0, password, is_admin=True, is_superuser=True)
+        users = User.objects.bulk_create(
+            [admin]
+            + [self.make_user(rng, index, password, is_Mentor=True) for index in range(mentor_count)]
+            + [self.make_user(rng, index, password) for index in range(user_count)],
+            batch_size=BATCH_SIZE,
+        )
+        mentors, participants = users[1:1 + mentor_count], users[1 + mentor_count:]
+
+        Skill.objects.bulk_create([Skill(name=name) for name in SKILLS], ignore_conflicts=True)
+        skill_ids = list(Skill.objects.filter(name__in=SKILLS).values_list('pk', flat=True))
+        User.skills.through.objects.bulk_create([
+            User.skills.through(user_id=user.pk, skill_id=skill_id)
+            for user in participants + mentors
+            for skill_id in rng.sample(skill_ids, rng.randint(1, 4))
+        ], batch_size=BATCH_SIZE)
+
+        # Leaders first, then the rest of the members from a shuffled pool; what
+        # is left of the pool has no team and sends the pending join requests.
+        rng.shuffle(participants)
+        leaders, pool = participants[:team_count], participants[team_count:]
+        challenge_ids = list(Challenge.objects.values_list('pk', flat=True)) or [None]
+        teams = Team.objects.bulk_create([
+            Team(name=f'Team {index + 1}', leader=leader, challenge_id=rng.choice(challenge_ids))
+            for index, leader in enumerate(leaders)
+        ], batch_size=BATCH_SIZE)
+
+        memberships, accepted = [], []
+        for team in teams:
+            members = [team.leader] + [pool.pop() for _ in range(min(rng.randint(1, Team.MAX_MEMBERS - 1), len(pool)))]
+            memberships += [Team.members.through(team_id=team.pk, user_id=member.pk) for member in members]
+            accepted += [JoinRequest(user=member, team=team, status='accepted') for member in members[1:]]
+            team.looking_for_members = len(members) < Team.MAX_MEMBERS and rng.random() < 0.8
+        Team.objects.bulk_update(teams, ['looking_for_members'], batch_size=BATCH_SIZE)
+        Team.members.through.objects.bulk_create(memberships, batch_size=BATCH_SIZE)
+        Team.mentors.through.objects.bulk_create([
+            Team.mentors.through(team_id=team.pk, user_id=mentor.pk)
+            for team in teams
+            for mentor in rng.sample(mentors, min(rng.randint(0, 2), len(mentors)))
+        ], batch_size=BATCH_SIZE)
+        Team.objects.filter(pk__in=[team.pk for team in teams]).refresh_counts()
+
+        open_teams = [team for team in teams if team.looking_for_members]
+        join_requests = list(accepted)
+        for user in pool:
+            for team in rng.sample(open_teams, min(rng.randint(0, 3), len(open_teams))):
+                join_requests.append(JoinRequest(user=user, team=team, status=rng.choice(('pending', 'pending', 'rejected'))))
+        JoinRequest.objects.bulk_create(join_requests, batch_size=BATCH_SIZE)
+
+        projects = Project.objects.bulk_create([
+            Project(
+                team=team,
+                name=f'{team.name} project',
+                description=f'What {team.name} is building for the challenge.',
+                submission_status=rng.choice(('incomplete', 'complete')),
+            )
+            for team in teams if rng.random() < 0.6
+        ], batch_size=BATCH_SIZE)
+
+        contacts = Contact.objects.bulk_create([
+            Contact(name=f'{user.first_name} {user.last_name}', email=user.email, message='When does judging start?')
+            for user in rng.sample(participants, user_count // 20)
+        ], batch_size=BATCH_SIZE)
+
+        return {
+            'users': len(users), 'teams': len(teams), 'memberships': len(memberships),
+            'join requests': len(join_requests), 'projects': len(projects), 'contacts': len(contacts),
+        }
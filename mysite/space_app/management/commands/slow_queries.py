@@ -0,0 +1,60 @@
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+from space_app.slow_queries import SLOW_QUERY_LOG, read_log
+
+SORT_KEYS = {
+    'total': lambda group: group['total_ms'],
+    'count': lambda group: len(group['entries']),
+    'max': lambda group: group['slowest']['duration_ms'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarises the slow query log by fingerprint: how often each query was slow, its total, mean and '
+        'worst time, the views and code it came from, and the plan of its slowest run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help=f'Log file to read (default: {SLOW_QUERY_LOG})')
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total', help='Order of the report')
+        parser.add_argument('--limit', type=int, default=20, help='Fingerprints to show')
+        parser.add_argument('--view', help='Only queries run by this URL name')
+        parser.add_argument('--clear', action='store_true', help='Empty the log after reporting')
+
+    def handle(self, *args, **options):
+        path = options['log'] or SLOW_QUERY_LOG
+        groups = defaultdict(lambda: {'entries': [], 'total_ms': 0.0, 'slowest': None})
+        for entry in read_log(path):
+            if options['view'] and entry.get('view') != options['view']:
+                continue
+            group = groups[entry['fingerprint']]
+            group['entries'].append(entry)
+            group['total_ms'] += entry['duration_ms']
+            if group['slowest'] is None or entry['duration_ms'] > group['slowest']['duration_ms']:
+                group['slowest'] = entry
+
+        if not groups:
+            self.stdout.write(f'No slow queries logged in {path}.')
+        ranked = sorted(groups.items(), key=lambda item: SORT_KEYS[options['sort']](item[1]), reverse=True)
+        for fingerprint, group in ranked[:options['limit']]:
+            entries, slowest = group['entries'], group['slowest']
+            self.stdout.write(self.style.WARNING(
+                f'{fingerprint}  {len(entries)} x  total {group["total_ms"]:.1f} ms  '
+                f'mean {group["total_ms"] / len(entries):.1f} ms  max {slowest["duration_ms"]:.1f} ms'
+            ))
+            self.stdout.write(f'  {slowest["sql"]}')
+            self.stdout.write(f'  params: {slowest["params"]}')
+            for label, key in (('views', 'view'), ('from', 'source'), ('templates', 'template')):
+                counts = Counter(entry[key] for entry in entries if entry.get(key))
+                if counts:
+                    self.stdout.write(f'  {label}: ' + ', '.join(f'{value} ({count})' for value, count in counts.most_common(3)))
+            for step in slowest['plan']:
+                self.stdout.write(f'    {step}')
+        if len(ranked) > options['limit']:
+            self.stdout.write(f'... and {len(ranked) - options["limit"]} more fingerprint(s).')
+
+        if options['clear']:
+            open(path, 'w').close()
+            self.stdout.write(self.style.SUCCESS(f'Cleared {path}.'))
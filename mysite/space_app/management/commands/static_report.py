@@ -0,0 +1,102 @@
+import os
+import tempfile
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+PLAIN_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+PIPELINE_STORAGE = 'space_app.storage.CompressedManifestStaticFilesStorage'
+
+
+class AssetCollector(HTMLParser):
+    """Collects the static URLs a browser would fetch for a page.
+
+    For a <picture> only the widest WebP candidate is counted (the worst case for
+    a browser that supports WebP), not the fallback <img>.
+    """
+
+    def __init__(self, static_url):
+        super().__init__()
+        self.static_url = static_url
+        self.urls = []
+        self.picture_source = None
+
+    def add(self, url):
+        if url and url.startswith(self.static_url) and url not in self.urls:
+            self.urls.append(url)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'picture':
+            self.picture_source = ''
+        elif tag == 'source' and self.picture_source == '' and attrs.get('type') == 'image/webp':
+            candidates = [candidate.split() for candidate in attrs.get('srcset', '').split(',') if candidate.strip()]
+            self.picture_source = max(candidates, key=lambda c: int(c[1].rstrip('w')))[0]
+            self.add(self.picture_source)
+        elif tag == 'img' and not self.picture_source:
+            self.add(attrs.get('src'))
+        elif tag == 'link' and attrs.get('rel') in ('stylesheet', 'icon'):
+            self.add(attrs.get('href'))
+        elif tag == 'script':
+            self.add(attrs.get('src'))
+
+    def handle_endtag(self, tag):
+        if tag == 'picture':
+            self.picture_source = None
+
+
+class Command(BaseCommand):
+    help = 'Compares the static bytes a page downloads with plain static files and with the collectstatic pipeline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='Page to measure (default: the landing page)')
+
+    def page_assets(self, path):
+        client = Client()
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'{path} returned {response.status_code}')
+        collector = AssetCollector(settings.STATIC_URL)
+        collector.feed(response.content.decode())
+        return [url[len(settings.STATIC_URL):] for url in collector.urls]
+
+    def handle(self, *args, **options):
+        path = options['path']
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                               STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': PLAIN_STORAGE}}):
+            before = {name: os.path.getsize(finders.find(name)) for name in self.page_assets(path)}
+
+        with tempfile.TemporaryDirectory() as static_root:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'], STATIC_ROOT=static_root,
+                                   STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': PIPELINE_STORAGE}}):
+                self.stdout.write('Running collectstatic into a temporary directory...')
+                call_command('collectstatic', interactive=False, verbosity=0)
+                after = {}
+                for name in self.page_assets(path):
+                    file_path = os.path.join(static_root, name)
+                    # What a browser sending "Accept-Encoding: br, gzip" receives.
+                    for suffix in ('.br', '.gz', ''):
+                        if os.path.exists(file_path + suffix):
+                            after[name + suffix] = os.path.getsize(file_path + suffix)
+                            break
+
+        self.stdout.write(f'\nFirst visit to {path}, before (plain static files):')
+        for name, size in before.items():
+            self.stdout.write(f'  {size:>10,} B  {name}')
+        self.stdout.write(f'\nFirst visit to {path}, after (hashed, WebP, precompressed):')
+        for name, size in after.items():
+            self.stdout.write(f'  {size:>10,} B  {name}')
+
+        total_before, total_after = sum(before.values()), sum(after.values())
+        saved = 1 - total_after / total_before if total_before else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'\nTotal: {total_before:,} B -> {total_after:,} B ({saved:.0%} less)'
+        ))
+        self.stdout.write(
+            f'Repeat visit: {len(before)} revalidation requests before, '
+            f'0 after (hashed assets are cached as immutable for a year).'
+        )
@@ -0,0 +1,93 @@
+import queue
+import random
+import threading
+import time
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count, F
+from space_app.models import Team, User
+
+class Command(BaseCommand):
+    help = 'Fires concurrent joins at synthetic teams, reports joins per second and checks no team went over capacity.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=10, help='Number of synthetic teams to create')
+        parser.add_argument('--users', type=int, default=200, help='Number of synthetic users trying to join')
+        parser.add_argument('--threads', type=int, default=16, help='Number of concurrent worker threads')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for the team each user picks')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic teams and users afterwards')
+
+    def handle(self, *args, **options):
+        tag = f'stress-{uuid.uuid4().hex[:8]}'
+        rng = random.Random(options['seed'])
+        users = User.objects.bulk_create([
+            User(
+                email=f'{tag}-{index}@example.invalid',
+                first_name='Stress',
+                last_name=str(index),
+                national_id=f'{rng.randrange(10 ** 14):014d}',
+                phone_number=f'{tag}-{index}',
+                gender='male',
+                age=20,
+                university='N/A',
+                study_field='N/A',
+            )
+            for index in range(options['users'])
+        ])
+        teams = Team.objects.bulk_create([
+            Team(name=f'{tag}-{index}') for index in range(options['teams'])
+        ])
+
+        attempts = queue.Queue()
+        for user in users:
+            attempts.put((user, rng.choice(teams).pk))
+        results = {'accepted': 0, 'full': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        user, team_id = attempts.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        Team.objects.only('id').get(pk=team_id).add_member(user)
+                        outcome = 'accepted'
+                    except ValidationError:
+                        outcome = 'full'
+                    except OperationalError:
+                        outcome = 'errors'
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        stressed = Team.objects.filter(name__startswith=tag).annotate(actual=Count('members'))
+        overflow_count = stressed.filter(actual__gt=Team.MAX_MEMBERS).count()
+        drift_count = stressed.exclude(member_count=F('actual')).count()
+
+        self.stdout.write(
+            f'{options["users"]} join attempts on {options["teams"]} teams with {options["threads"]} threads in {elapsed:.2f}s: '
+            f'{results["accepted"]} accepted ({results["accepted"] / elapsed:.1f} joins/s), '
+            f'{results["full"]} rejected as full, {results["errors"]} database errors'
+        )
+
+        if not options['keep']:
+            Team.objects.filter(name__startswith=tag).delete()
+            User.objects.filter(email__startswith=f'{tag}-').delete()
+
+        if overflow_count or drift_count:
+            raise CommandError(f'{overflow_count} team(s) exceeded capacity, {drift_count} team(s) have a wrong member_count')
+        self.stdout.write(self.style.SUCCESS(f'No team exceeded {Team.MAX_MEMBERS} members.'))
@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from space_app.routers import REPLICA_DB_ALIAS
+
+class Command(BaseCommand):
+    help = (
+        'Copies the primary SQLite database into the replica file with the online backup API. '
+        'Run it once before starting the server to enable the replica, then every few seconds '
+        '(or with --interval) to keep it within REPLICA_LAG_SECONDS of the primary.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', help='Replica file (default: the replica database, or db_replica.sqlite3)')
+        parser.add_argument('--interval', type=float, help='Keep copying every this many seconds')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('sync_replica copies SQLite files; use the database server\'s replication instead')
+        target = options['target'] or settings.DATABASES.get(REPLICA_DB_ALIAS, {}).get('NAME')
+        target = target or settings.BASE_DIR / 'db_replica.sqlite3'
+
+        while True:
+            started = time.perf_counter()
+            self.copy(primary['NAME'], target)
+            self.stdout.write(f'Copied {primary["NAME"]} to {target} in {(time.perf_counter() - started) * 1000:.0f} ms')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, source, target):
+        # backup() copies a consistent snapshot while the primary stays writable,
+        # and writes into the replica as one transaction, so open replica
+        # connections see either the old copy or the new one. The replica keeps
+        # the primary's journal mode, so it is only in WAL where the primary is.
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(target, timeout=20)
+        try:
+            journal_mode, = src.execute('PRAGMA journal_mode').fetchone()
+            dst.execute(f'PRAGMA journal_mode={journal_mode}')
+            src.backup(dst)
+        finally:
+            src.close()
+            dst.close()
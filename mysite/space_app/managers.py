@@ -1,4 +1,7 @@
 from django.contrib.auth.models import BaseUserManager
+from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
 from django.utils.translation import gettext_lazy as _
 
 class CustomUserManager(BaseUserManager):
@@ -39,4 +42,34 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('university', 'N/A')
         extra_fields.setdefault('study_field', 'N/A')
 
-        return self._create_user(email, password, **extra_fields)
\ No newline at end of file
+        return self._create_user(email, password, **extra_fields)
+
+
+def _team_link_count(through):
+    """Correlated subquery counting ``through`` rows for the outer team."""
+    return Coalesce(
+        Subquery(
+            through.objects.filter(team_id=OuterRef('pk'))
+            .order_by()
+            .values('team_id')
+            .annotate(count=Count('*'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+class TeamQuerySet(models.QuerySet):
+    def with_members(self):
+        return self.filter(member_count__gt=0)
+
+    def with_open_seats(self):
+        return self.with_members().filter(member_count__lt=self.model.MAX_MEMBERS)
+
+    def refresh_counts(self):
+        """Recompute member_count and mentor_count from the M2M tables in one UPDATE."""
+        return self.update(
+            member_count=_team_link_count(self.model.members.through),
+            mentor_count=_team_link_count(self.model.mentors.through),
+            updated_at=Now(),
+        )
@@ -0,0 +1,279 @@
+"""
+Per-request performance numbers: wall time, SQL queries, template rendering and
+cache hits and misses.
+
+PerformanceMiddleware collects them for every request that reaches a view. The
+numbers come from three hooks:
+- an execute wrapper installed on every database connection
+- the DjangoTemplates backend below, set in TEMPLATES
+- the LocMemCache below, set in CACHES
+
+Admins get the request's numbers back in a Server-Timing header, which browser
+dev tools show under Timing. Every request is also added to per-view totals
+kept in this process, which views.metrics serves in the Prometheus text format,
+labelled with the URL name. Each worker process keeps its own totals, so scrape
+every worker or sum them.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from copy import copy
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache.backends import locmem
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+from django.utils.functional import SimpleLazyObject, empty
+
+# Upper bounds of the request duration histogram, in seconds (Prometheus' defaults).
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_MISSING = object()
+
+# The numbers of the request being handled. A mutable object, so the view's
+# sync_to_async threads, which run in a copy of the context, add to it too.
+_current = ContextVar('space_app_request_timings', default=None)
+
+_lock = threading.Lock()
+_views = {}  # URL name -> ViewStats
+
+
+class RequestTimings:
+    __slots__ = ('request', 'sql_queries', 'sql_duration', 'template_duration', 'cache_hits', 'cache_misses',
+                 'rendering')
+
+    def __init__(self, request):
+        self.request = request
+        self.sql_queries = 0
+        self.sql_duration = 0.0
+        self.template_duration = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rendering = False
+
+    def server_timing(self, duration):
+        # Template time includes the queries run while rendering.
+        return (
+            f'total;dur={duration * 1000:.1f}, '
+            f'sql;dur={self.sql_duration * 1000:.1f};desc="{self.sql_queries} queries", '
+            f'template;dur={self.template_duration * 1000:.1f}, '
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"'
+        )
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'count', 'duration', 'sql_queries', 'sql_duration', 'template_duration',
+                 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)  # the last one is +Inf
+        self.count = 0
+        self.duration = 0.0
+        self.sql_queries = 0
+        self.sql_duration = 0.0
+        self.template_duration = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __copy__(self):
+        stats = ViewStats()
+        for field in self.__slots__:
+            setattr(stats, field, getattr(self, field))
+        stats.buckets = list(self.buckets)
+        return stats
+
+
+def record(view, timings, duration):
+    with _lock:
+        stats = _views.get(view)
+        if stats is None:
+            stats = _views[view] = ViewStats()
+        stats.buckets[bisect_left(DURATION_BUCKETS, duration)] += 1
+        stats.count += 1
+        stats.duration += duration
+        stats.sql_queries += timings.sql_queries
+        stats.sql_duration += timings.sql_duration
+        stats.template_duration += timings.template_duration
+        stats.cache_hits += timings.cache_hits
+        stats.cache_misses += timings.cache_misses
+
+
+def current_request():
+    """Return the request being handled, or None outside PerformanceMiddleware."""
+    timings = _current.get()
+    return timings.request if timings is not None else None
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.sql_queries += 1
+        timings.sql_duration += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Sent again whenever the same connection object reconnects.
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None or timings.rendering:
+            return super().render(context, request)
+        timings.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_duration += time.perf_counter() - started
+            timings.rendering = False
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The stock backend, timing each top-level render."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class LocMemCache(locmem.LocMemCache):
+    """The stock local-memory cache, counting hits and misses of get().
+
+    get_many() and get_or_set() go through get() here. A backend that
+    implements them natively would need them counted as well.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        timings = _current.get()
+        if timings is not None:
+            if value is _MISSING:
+                timings.cache_misses += 1
+            else:
+                timings.cache_hits += 1
+        return default if value is _MISSING else value
+
+
+class PerformanceMiddleware:
+    """Times every request that reaches a view; goes first in MIDDLEWARE so the rest is included.
+
+    For a streaming response, only the time until the view returned it is counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings(request)
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+        if request.resolver_match is not None:
+            record(view_label(request.resolver_match), timings, duration)
+            if is_admin(request):
+                response['Server-Timing'] = timings.server_timing(duration)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings(request)
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+        if request.resolver_match is not None:
+            record(view_label(request.resolver_match), timings, duration)
+            if is_admin(request):
+                response['Server-Timing'] = timings.server_timing(duration)
+        return response
+
+
+def is_admin(request):
+    """True if the user, or the staff member impersonating them, is an admin or superuser.
+
+    Not just is_staff, which every Mentor, GPE and Registration volunteer has.
+
+    Only looks at a user the request has already loaded: loading one for a view
+    that never needed it would cost a query.
+    """
+    user = getattr(request, 'impersonator', None) or getattr(request, 'user', None)
+    if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+        return False
+    return user.is_superuser or getattr(user, 'is_admin', False)
+
+
+def view_label(match):
+    return match.url_name or match.route
+
+
+def render_prometheus(page_cache_stats):
+    """Return the per-view totals and ``page_cache_stats`` (see get_page_cache_stats) in the Prometheus text format."""
+    with _lock:
+        views = sorted((view, copy(stats)) for view, stats in _views.items())
+    lines = [
+        '# HELP space_app_request_duration_seconds Time from the first middleware until the response, per view.',
+        '# TYPE space_app_request_duration_seconds histogram',
+    ]
+    for view, stats in views:
+        cumulative = 0
+        for bound, observed in zip((*DURATION_BUCKETS, '+Inf'), stats.buckets):
+            cumulative += observed
+            lines.append(f'space_app_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+        lines.append(f'space_app_request_duration_seconds_sum{{view="{view}"}} {stats.duration}')
+        lines.append(f'space_app_request_duration_seconds_count{{view="{view}"}} {stats.count}')
+
+    for name, field, help_text in [
+        ('space_app_sql_queries_total', 'sql_queries', 'SQL queries run, per view.'),
+        ('space_app_sql_duration_seconds_total', 'sql_duration', 'Time spent in SQL queries, per view.'),
+        ('space_app_template_duration_seconds_total', 'template_duration', 'Time spent rendering templates, per view.'),
+    ]:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{{view="{view}"}} {getattr(stats, field)}' for view, stats in views]
+
+    lines += ['# HELP space_app_cache_gets_total Cache lookups, per view.', '# TYPE space_app_cache_gets_total counter']
+    for view, stats in views:
+        lines.append(f'space_app_cache_gets_total{{view="{view}",result="hit"}} {stats.cache_hits}')
+        lines.append(f'space_app_cache_gets_total{{view="{view}",result="miss"}} {stats.cache_misses}')
+
+    lines += [
+        '# HELP space_app_page_cache_requests_total Lookups of cache_public_page, per page.',
+        '# TYPE space_app_page_cache_requests_total counter',
+    ]
+    for page, counts in page_cache_stats.items():
+        for result, count in counts.items():
+            lines.append(f'space_app_page_cache_requests_total{{page="{page}",result="{result}"}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,154 @@
+import mimetypes
+import os
+from datetime import datetime, timedelta, timezone
+from urllib.parse import unquote
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils._os import safe_join
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from impersonate.helpers import check_allow_for_uri, check_allow_for_user, check_allow_impersonate, check_read_only
+from impersonate.middleware import ImpersonateMiddleware
+from impersonate.settings import settings as impersonate_settings
+
+from .caching import get_cached_user
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+# Accept-Encoding token -> suffix of the precompressed file, in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticAssetMiddleware:
+    """Serves collected static files from STATIC_ROOT when DEBUG is off.
+
+    Content-hashed names from the staticfiles manifest never change, so they are
+    sent with a year-long immutable Cache-Control; anything else must be
+    revalidated. The .br or .gz copy written by collectstatic is sent instead of
+    the original when the client accepts it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG:
+            raise MiddlewareNotUsed  # urls.py serves the source files in development
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.root = settings.STATIC_ROOT
+        self.hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.static_response(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        # Only a stat() or two; the file itself is streamed by the server.
+        response = self.static_response(request)
+        return response if response is not None else await self.get_response(request)
+
+    def static_response(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            return self.serve(request, unquote(request.path[len(self.prefix):]))
+        return None
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except (SuspiciousFileOperation, ValueError):
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        if name not in self.hashed_names and not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime
+        ):
+            return HttpResponseNotModified()
+
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        accepted = {token.split(';')[0].strip() for token in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')}
+        encoding, file_path, vary = None, path, False
+        for token, suffix in ENCODINGS:
+            if os.path.isfile(path + suffix):
+                vary = True
+                if encoding is None and token in accepted:
+                    encoding, file_path = token, path + suffix
+
+        response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+        del response['Content-Disposition']
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if vary:
+            response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if name in self.hashed_names else REVALIDATE_CACHE_CONTROL
+        return response
+
+
+class CachedImpersonateMiddleware(ImpersonateMiddleware):
+    """django-impersonate's middleware, loading the impersonated user through the cache.
+
+    The same steps as ImpersonateMiddleware.process_request (django-impersonate
+    1.9), except that the User.objects.get() for the impersonated user is
+    get_cached_user(), so impersonating costs no query per request either.
+    """
+
+    @staticmethod
+    def can_impersonate(request, new_user):
+        if impersonate_settings.CUSTOM_USER_QUERYSET is not None:
+            return check_allow_for_user(request, new_user)
+        # check_allow_for_user() without its query: the default queryset is
+        # every user, and new_user was just loaded, so it is in there.
+        return check_allow_impersonate(request) and (
+            (request.user.is_superuser and impersonate_settings.ALLOW_SUPERUSER) or not new_user.is_superuser
+        )
+
+    def process_request(self, request):
+        real_user = request.user
+
+        def get_real_user():
+            real_user.is_impersonate = False
+            return real_user
+
+        request.user = SimpleLazyObject(get_real_user)
+        request.impersonator = None
+
+        if '_impersonate' in request.session and request.user.is_authenticated:
+            if impersonate_settings.MAX_DURATION:
+                if request.path == reverse('impersonate-stop'):
+                    return None
+                if '_impersonate_start' not in request.session:
+                    return None
+                started = datetime.fromtimestamp(request.session['_impersonate_start'], timezone.utc)
+                if datetime.now(timezone.utc) - started > timedelta(seconds=impersonate_settings.MAX_DURATION):
+                    return redirect('impersonate-stop')
+
+            new_user_id = request.session['_impersonate']
+            new_user_id = getattr(new_user_id, 'pk', new_user_id)  # older versions stored the User itself
+            new_user = get_cached_user(new_user_id)
+            if new_user is None:
+                return None
+
+            if check_read_only(request) and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                return HttpResponseNotAllowed(['GET', 'HEAD', 'OPTIONS'])
+
+            if self.can_impersonate(request, new_user) and check_allow_for_uri(request.path):
+                request.impersonator = request.user
+                request.user = new_user
+                request.user.is_impersonate = True
+                request.user.impersonator = request.impersonator
+
+        request.real_user = request.impersonator or request.user
+        return None
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.13 on 2026-10-17 21:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_team_counts(apps, schema_editor):
+    Team = apps.get_model('space_app', 'Team')
+
+    def link_count(through):
+        return Coalesce(
+            Subquery(
+                through.objects.filter(team_id=OuterRef('pk'))
+                .order_by()
+                .values('team_id')
+                .annotate(count=Count('*'))
+                .values('count')
+            ),
+            0,
+        )
+
+    Team.objects.update(
+        member_count=link_count(Team.members.through),
+        mentor_count=link_count(Team.mentors.through),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('space_app', '0016_user_other_skills'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='mentor_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['member_count'], name='team_member_count_idx'),
+        ),
+        migrations.RunPython(populate_team_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.13 on 2026-10-17 21:53
+
+from django.db import migrations, models
+
+
+def parse_description(description):
+    # A copy of space_app.data_files.parse_description as it was when this
+    # migration was written, so later changes to it don't change the migration.
+    sections = []
+    current_section = None
+    for line in description.splitlines():
+        line = line.strip()
+        if line.startswith('■'):
+            if current_section:
+                sections.append(current_section)
+            current_section = {'title': line.strip('■ '), 'content': []}
+        elif line.startswith(('-', '*')):
+            if current_section:
+                current_section['content'].append({'type': 'list', 'text': line.strip('-* ')})
+        elif '(Display inside a styled card/box for emphasis)' in line:
+            if current_section:
+                current_section['is_card'] = True
+        elif line:
+            if current_section:
+                current_section['content'].append({'type': 'paragraph', 'text': line})
+    if current_section:
+        sections.append(current_section)
+    return sections
+
+def populate_parsed_descriptions(apps, schema_editor):
+    Challenge = apps.get_model('space_app', 'Challenge')
+    challenges = list(Challenge.objects.all())
+    for challenge in challenges:
+        challenge.parsed_description = parse_description(challenge.description)
+    Challenge.objects.bulk_update(challenges, ['parsed_description'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('space_app', '0017_team_member_count_team_mentor_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='parsed_description',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(populate_parsed_descriptions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.13 on 2026-10-17 21:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('space_app', '0018_challenge_parsed_description'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='challenge',
+            name='title',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
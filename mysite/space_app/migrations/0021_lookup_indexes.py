@@ -0,0 +1,63 @@
+# Generated by Django 5.0.13 on 2026-10-17 22:05
+
+from django.db import migrations, models
+
+
+def drop_duplicate_pending_requests(apps, schema_editor):
+    # Keep the oldest pending request per (user, team) so the new constraint can be added.
+    JoinRequest = apps.get_model('space_app', 'JoinRequest')
+    seen = set()
+    duplicates = []
+    for pk, user_id, team_id in JoinRequest.objects.filter(status='pending').order_by('pk').values_list('pk', 'user_id', 'team_id'):
+        if (user_id, team_id) in seen:
+            duplicates.append(pk)
+        seen.add((user_id, team_id))
+    JoinRequest.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('space_app', '0020_task'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='joinrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['team', 'created_at'], name='joinrequest_pending_team_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(condition=models.Q(('looking_for_members', True)), fields=['member_count'], name='team_open_member_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_admin', True)), fields=['id'], name='user_admin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_GPE', True)), fields=['id'], name='user_gpe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_Mentor', True)), fields=['id'], name='user_mentor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_Registration', True)), fields=['id'], name='user_registration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_moderator', True)), fields=['id'], name='user_moderator_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_GPE', False), ('is_Mentor', False), ('is_Registration', False), ('is_admin', False), ('is_moderator', False)), fields=['id'], name='user_participant_idx'),
+        ),
+        migrations.RunPython(drop_duplicate_pending_requests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='joinrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('user', 'team'), name='joinrequest_one_pending_per_team'),
+        ),
+    ]
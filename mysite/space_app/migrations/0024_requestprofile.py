@@ -0,0 +1,32 @@
+# Generated by Django 5.0.13 on 2026-10-17 22:56
+
+import django.db.models.deletion
+import space_app.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('space_app', '0023_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500)),
+                ('view', models.CharField(blank=True, max_length=200)),
+                ('trigger', models.CharField(choices=[('requested', 'Requested by staff'), ('sampled', 'Sampled')], max_length=20)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('peak_memory_kb', models.PositiveIntegerField()),
+                ('stats_file', models.FileField(storage=space_app.storage.profile_storage, upload_to='%Y/%m/%d')),
+                ('report_file', models.FileField(storage=space_app.storage.profile_storage, upload_to='%Y/%m/%d')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.0.13 on 2026-10-17 23:09
+
+import django.db.models.deletion
+import space_app.search
+from django.conf import settings
+from django.db import migrations, models
+
+# Skill names then other_skills, for the user whose id is {user_id}.
+SKILLS_SQL = """trim(coalesce((
+    SELECT group_concat(skill.name, ' ') FROM space_app_skill skill
+    JOIN space_app_user_skills link ON link.skill_id = skill.id WHERE link.user_id = {user_id}
+), '') || ' ' || coalesce((SELECT other_skills FROM space_app_user WHERE id = {user_id}), ''))"""
+
+CREATE_SEARCH_INDEX = [
+    """CREATE VIRTUAL TABLE space_app_user_search USING fts5(
+        name, email, university, study_field, skills,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    # The weights of bm25(), which the rank column is ordered by, per column.
+    "INSERT INTO space_app_user_search(space_app_user_search, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0, 2.0, 3.0)')",
+    f"""INSERT INTO space_app_user_search(rowid, name, email, university, study_field, skills)
+        SELECT id, first_name || ' ' || last_name, email, university, study_field, {SKILLS_SQL.format(user_id='space_app_user.id')}
+        FROM space_app_user""",
+    """CREATE TRIGGER space_app_user_search_insert AFTER INSERT ON space_app_user BEGIN
+        INSERT INTO space_app_user_search(rowid, name, email, university, study_field, skills)
+        VALUES (NEW.id, NEW.first_name || ' ' || NEW.last_name, NEW.email, NEW.university, NEW.study_field,
+                coalesce(NEW.other_skills, ''));
+    END""",
+    # save() writes every column, so compare them: most saves change none of these.
+    f"""CREATE TRIGGER space_app_user_search_update AFTER UPDATE ON space_app_user
+    WHEN OLD.first_name IS NOT NEW.first_name OR OLD.last_name IS NOT NEW.last_name OR OLD.email IS NOT NEW.email
+        OR OLD.university IS NOT NEW.university OR OLD.study_field IS NOT NEW.study_field
+        OR OLD.other_skills IS NOT NEW.other_skills
+    BEGIN
+        UPDATE space_app_user_search SET name = NEW.first_name || ' ' || NEW.last_name, email = NEW.email,
+            university = NEW.university, study_field = NEW.study_field, skills = {SKILLS_SQL.format(user_id='NEW.id')}
+        WHERE rowid = NEW.id;
+    END""",
+    """CREATE TRIGGER space_app_user_search_delete AFTER DELETE ON space_app_user BEGIN
+        DELETE FROM space_app_user_search WHERE rowid = OLD.id;
+    END""",
+    f"""CREATE TRIGGER space_app_user_search_skill_added AFTER INSERT ON space_app_user_skills BEGIN
+        UPDATE space_app_user_search SET skills = {SKILLS_SQL.format(user_id='NEW.user_id')} WHERE rowid = NEW.user_id;
+    END""",
+    f"""CREATE TRIGGER space_app_user_search_skill_removed AFTER DELETE ON space_app_user_skills BEGIN
+        UPDATE space_app_user_search SET skills = {SKILLS_SQL.format(user_id='OLD.user_id')} WHERE rowid = OLD.user_id;
+    END""",
+    f"""CREATE TRIGGER space_app_user_search_skill_renamed AFTER UPDATE OF name ON space_app_skill
+    WHEN OLD.name IS NOT NEW.name BEGIN
+        UPDATE space_app_user_search SET skills = {SKILLS_SQL.format(user_id='space_app_user_search.rowid')}
+        WHERE rowid IN (SELECT user_id FROM space_app_user_skills WHERE skill_id = NEW.id);
+    END""",
+]
+
+DROP_SEARCH_INDEX = [
+    *(f'DROP TRIGGER IF EXISTS space_app_user_search_{name}'
+      for name in ('insert', 'update', 'delete', 'skill_added', 'skill_removed', 'skill_renamed')),
+    'DROP TABLE IF EXISTS space_app_user_search',
+]
+
+
+def create_search_index(apps, schema_editor):
+    # search.py falls back to icontains on other databases.
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('space_app', '0024_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearch',
+            fields=[
+                ('user', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('name', models.TextField()),
+                ('email', models.TextField()),
+                ('university', models.TextField()),
+                ('study_field', models.TextField()),
+                ('skills', models.TextField()),
+                ('document', space_app.search.SearchDocumentField(db_column='space_app_user_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'space_app_user_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
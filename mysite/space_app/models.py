@@ -1,20 +1,33 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinLengthValidator
 from django.core.exceptions import ValidationError
-from .managers import CustomUserManager
+from .data_files import parse_description
+from .managers import CustomUserManager, TeamQuerySet
+from .search import SearchDocumentField
+from .storage import profile_storage
 
 class Challenge(models.Model):
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=255, unique=True)
     category = models.CharField(max_length=255)
     description = models.TextField()
     difficulty = models.CharField(max_length=50)
     image = models.URLField(max_length=200, blank=True)
+    # parse_description() output, stored so the challenges page never parses per request.
+    parsed_description = models.JSONField(default=list, blank=True, editable=False)
+    # Drives the API's ETag and Last-Modified headers, like the other models' updated_at.
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.parsed_description = parse_description(self.description)
+        super().save(*args, **kwargs)
+
 class Skill(models.Model):
     name = models.CharField(max_length=255, unique=True)
 
@@ -67,6 +80,22 @@ class User(AbstractUser):
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        # The admin dashboard lists users by role in id order (keyset pagination),
+        # so each role gets a partial index over id holding only that role's rows.
+        indexes = [
+            models.Index(fields=['id'], condition=Q(is_admin=True), name='user_admin_idx'),
+            models.Index(fields=['id'], condition=Q(is_GPE=True), name='user_gpe_idx'),
+            models.Index(fields=['id'], condition=Q(is_Mentor=True), name='user_mentor_idx'),
+            models.Index(fields=['id'], condition=Q(is_Registration=True), name='user_registration_idx'),
+            models.Index(fields=['id'], condition=Q(is_moderator=True), name='user_moderator_idx'),
+            models.Index(
+                fields=['id'],
+                condition=Q(is_admin=False, is_GPE=False, is_Mentor=False, is_Registration=False, is_moderator=False),
+                name='user_participant_idx',
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if self.is_GPE or self.is_Mentor or self.is_Registration:
             self.is_staff = True
@@ -92,6 +121,8 @@ class User(AbstractUser):
 
 
 class Team(models.Model):
+    MAX_MEMBERS = 6
+
     name = models.CharField(max_length=255)
     challenge = models.ForeignKey(Challenge, on_delete=models.SET_NULL, null=True, blank=True)
     team_photo = models.ImageField(upload_to='team_photos/', null=True, blank=True)
@@ -99,21 +130,50 @@ class Team(models.Model):
     members = models.ManyToManyField(User, related_name='teams', blank=True)
     mentors = models.ManyToManyField(User, related_name='mentored_teams', blank=True)
     leader = models.ForeignKey(User, on_delete=models.CASCADE, related_name='led_teams', null=True)
+    # Kept in sync with the members/mentors M2M tables by signals.update_team_counts.
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+    mentor_count = models.PositiveIntegerField(default=0, editable=False)
+    # Also set by the count UPDATEs in TeamQuerySet.refresh_counts().
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TeamQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['member_count'], name='team_member_count_idx'),
+            models.Index(fields=['member_count'], condition=Q(looking_for_members=True), name='team_open_member_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
     
     @property
     def members_count(self):
-        return self.members.count()
+        return self.member_count
 
     def join_team(self, user):
         if user.is_Mentor or user.is_admin:
             self.mentors.add(user)
-        elif self.members.count() < 6:
-            self.members.add(user)
         else:
-            raise ValidationError("Team is full")
+            self.add_member(user)
+
+    def add_member(self, user):
+        """
+        Adds ``user`` to the team, raising ValidationError if it is full.
+
+        The seat is reserved with a conditional UPDATE on member_count before the
+        membership row is written, so concurrent joins can never push a team past
+        MAX_MEMBERS. On SQLite the transaction opens with BEGIN IMMEDIATE, which
+        takes the database-wide write lock, so no other writer runs until it
+        commits; that keeps the recount done by the m2m_changed signal exact.
+        """
+        with transaction.atomic():
+            reserved = Team.objects.filter(pk=self.pk, member_count__lt=self.MAX_MEMBERS).update(
+                member_count=F('member_count') + 1
+            )
+            if not reserved:
+                raise ValidationError("Team is full")
+            self.members.add(user)
 
 
 class Project(models.Model):
@@ -130,6 +190,7 @@ class Project(models.Model):
     resources_used = models.TextField(blank=True, null=True)
     other_notes = models.TextField(blank=True, null=True)
     submission_status = models.CharField(max_length=20, choices=SUBMISSION_STATUS_CHOICES, default='incomplete')
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -149,5 +210,90 @@ class JoinRequest(models.Model):
     status = models.CharField(max_length=20, choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected')], default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # The unique constraint also serves the pending lookups by user and by (user, team).
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'team'], condition=Q(status='pending'), name='joinrequest_one_pending_per_team',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['team', 'created_at'], condition=Q(status='pending'), name='joinrequest_pending_team_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.team}'
+
+class Task(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+class Event(models.Model):
+    """A live update on its way to the other worker processes; see events.DatabaseBackend."""
+    channels = models.JSONField()
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'Event {self.pk} for {", ".join(self.channels)}'
+
+
+class RequestProfile(models.Model):
+    """A cProfile and tracemalloc capture of one request; see profiling.py."""
+    TRIGGER_CHOICES = (
+        ('requested', 'Requested by staff'),
+        ('sampled', 'Sampled'),
+    )
+    path = models.CharField(max_length=500)
+    view = models.CharField(max_length=200, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    peak_memory_kb = models.PositiveIntegerField()
+    stats_file = models.FileField(storage=profile_storage, upload_to='%Y/%m/%d')
+    report_file = models.FileField(storage=profile_storage, upload_to='%Y/%m/%d')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
     def __str__(self):
-        return f'{self.user} -> {self.team}'
\ No newline at end of file
+        return f'{self.path} ({self.created_at:%Y-%m-%d %H:%M:%S})'
+
+
+class UserSearch(models.Model):
+    """A user's row in the FTS5 search index; see search.py. Kept up to date by triggers."""
+    user = models.OneToOneField(
+        User, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_entry',
+    )
+    name = models.TextField()
+    email = models.TextField()
+    university = models.TextField()
+    study_field = models.TextField()
+    skills = models.TextField()
+    document = SearchDocumentField(db_column='space_app_user_search')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'space_app_user_search'
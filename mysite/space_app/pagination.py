@@ -0,0 +1,44 @@
+PAGE_SIZE = 50
+
+
+class KeysetPage:
+    """One page of rows plus the cursor needed to fetch the next one."""
+
+    def __init__(self, object_list, next_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.next_url = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def parse_cursor(cursor):
+    """Return the cursor as a primary key, or None when it is missing or malformed."""
+    try:
+        return int(cursor)
+    except (TypeError, ValueError):
+        return None
+
+
+def keyset_paginate(queryset, cursor=None, per_page=PAGE_SIZE, descending=False):
+    """Return the page of ``queryset`` that follows ``cursor``, ordered by primary key.
+
+    Unlike OFFSET pagination, every page costs the same index range scan no matter
+    how deep the client has scrolled.
+    """
+    queryset = queryset.order_by('-pk' if descending else 'pk')
+    cursor = parse_cursor(cursor)
+    if cursor is not None:
+        queryset = queryset.filter(pk__lt=cursor) if descending else queryset.filter(pk__gt=cursor)
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = rows[per_page - 1].pk if len(rows) > per_page else None
+    return KeysetPage(rows[:per_page], next_cursor)
@@ -0,0 +1,185 @@
+"""
+Profiles of single requests, taken on live traffic.
+
+A request is profiled when a superuser asks for it with ``?profile=1`` or an
+``X-Profile: 1`` header, or when sampling picks it: one in PROFILE_SAMPLE_EVERY
+requests, from anyone (0, the default, samples none). The capture is a cProfile
+of the request and the allocations tracemalloc saw while it ran. It is stored
+as a RequestProfile, which the admin lists and offers for download: the .prof
+file for snakeviz or pstats, and a text report of the top allocations and the
+hottest functions with their callees. A profiled response carries the admin
+URL of its profile in an X-Profile header when it goes to a superuser.
+can_view_profiles() decides both who may ask and who may open them in the admin.
+
+One request per process is profiled at a time; requests asking meanwhile are
+served unprofiled. tracemalloc traces every thread, so allocations of requests
+served alongside show up too. Under ASGI the profile covers the event loop and
+the request's sync thread, where sync views and database queries run.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import RequestProfile
+
+PROFILE_SAMPLE_EVERY = getattr(settings, 'PROFILE_SAMPLE_EVERY', 0)
+# Older profiles are deleted, with their files, once there are more than this.
+PROFILES_KEPT = getattr(settings, 'PROFILES_KEPT', 200)
+# Allocations and functions listed in the report.
+REPORT_LINES = 40
+
+_lock = threading.Lock()
+
+
+def asks_for_profile(request):
+    return request.GET.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+
+
+def can_view_profiles(user):
+    # Profiles show other users' requests, so superusers only; not is_staff,
+    # which every Mentor, GPE and Registration volunteer has.
+    return user.is_superuser
+
+
+def requested_by_profiler(request):
+    # The impersonating staff member, not the user they see the site as.
+    return can_view_profiles(getattr(request, 'impersonator', None) or request.user)
+
+
+def start_tracing():
+    """Start tracemalloc unless something else already has; return whether we did."""
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+        return False
+    tracemalloc.start()
+    return True
+
+
+def stop_tracing(started):
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    peak = tracemalloc.get_traced_memory()[1]
+    if started:
+        tracemalloc.stop()
+    return snapshot, peak
+
+
+def save_profile(request, response, trigger, stats, snapshot, peak, duration):
+    match = request.resolver_match
+    view = (match.url_name or match.route) if match is not None else ''
+    user = request.user if getattr(request, 'user', None) is not None and request.user.is_authenticated else None
+
+    report = io.StringIO()
+    report.write(
+        f'{request.method} {request.get_full_path()}  view {view or "-"}  {response.status_code}\n'
+        f'{duration * 1000:.1f} ms, peak traced memory {peak / 1024:.0f} KiB, {trigger}\n\n'
+        f'Top allocations still held at the end of the request, by line:\n'
+    )
+    for statistic in snapshot.statistics('lineno')[:REPORT_LINES]:
+        report.write(f'  {statistic}\n')
+    report.write('\n')
+    stats.stream = report
+    stats.sort_stats('cumulative').print_stats(REPORT_LINES)
+    stats.print_callees(REPORT_LINES // 4)
+
+    name = f'{timezone.now():%H%M%S}-{view or "unresolved"}'
+    profile = RequestProfile(
+        path=request.get_full_path()[:500],
+        view=view,
+        user=user,
+        trigger=trigger,
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 1),
+        peak_memory_kb=peak // 1024,
+    )
+    profile.stats_file.save(f'{name}.prof', ContentFile(marshal.dumps(stats.stats)), save=False)
+    profile.report_file.save(f'{name}.txt', ContentFile(report.getvalue().encode()), save=False)
+    profile.save()
+    if trigger == 'requested' or requested_by_profiler(request):
+        response['X-Profile'] = reverse('admin:space_app_requestprofile_change', args=[profile.pk])
+
+    stale = RequestProfile.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)[PROFILES_KEPT:]
+    # One by one, so signals.py deletes their files.
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+
+
+class ProfilingMiddleware:
+    """Profiles requested or sampled requests; last in MIDDLEWARE, so request.user is final."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def trigger(self, request):
+        if asks_for_profile(request):
+            return 'requested' if requested_by_profiler(request) else None
+        if PROFILE_SAMPLE_EVERY and random.randrange(PROFILE_SAMPLE_EVERY) == 0:
+            return 'sampled'
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self.trigger(request)
+        if trigger is None or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            tracing = start_tracing()
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+                duration = time.perf_counter() - started
+                snapshot, peak = stop_tracing(tracing)
+            save_profile(request, response, trigger, pstats.Stats(profiler), snapshot, peak, duration)
+            return response
+        finally:
+            _lock.release()
+
+    async def __acall__(self, request):
+        if asks_for_profile(request):
+            trigger = 'requested' if await sync_to_async(requested_by_profiler)(request) else None
+        else:
+            trigger = self.trigger(request)
+        if trigger is None or not _lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            tracing = start_tracing()
+            # cProfile follows one thread, so one profiler for the event loop and
+            # one enabled (and later disabled) in the request's sync thread.
+            loop_profiler, thread_profiler = cProfile.Profile(), cProfile.Profile()
+            started = time.perf_counter()
+            await sync_to_async(thread_profiler.enable)()
+            loop_profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                loop_profiler.disable()
+                await sync_to_async(thread_profiler.disable)()
+                duration = time.perf_counter() - started
+                snapshot, peak = stop_tracing(tracing)
+            stats = pstats.Stats(loop_profiler)
+            stats.add(thread_profiler)
+            await sync_to_async(save_profile)(request, response, trigger, stats, snapshot, peak, duration)
+            return response
+        finally:
+            _lock.release()
@@ -0,0 +1,19 @@
+def query_budget(max_queries):
+    """Declare the maximum number of SQL queries a view may run per request.
+
+    The budget covers the whole request as seen by the test client, including the
+    session and user lookups done by middleware, and must not depend on how many
+    rows the page shows. QueryBudgetTests in tests.py replays every URL in
+    space_app/urls.py, and posts every form, against seeded data with cold
+    caches. It fails when a view goes over, or when a count changes once the
+    data grows.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def get_query_budget(view_func):
+    """Return the budget declared on ``view_func``, or None if it has none."""
+    return getattr(view_func, 'query_budget', None)
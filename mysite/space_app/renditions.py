@@ -0,0 +1,81 @@
+import logging
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# name -> square size in pixels, about twice the largest CSS size it is shown at
+RENDITIONS = {
+    'thumbnail': 128,
+    'card': 256,
+    'profile': 400,
+}
+FORMAT = 'WEBP'
+EXTENSION = 'webp'
+QUALITY = 80
+
+CACHE_PREFIX = 'space_app:rendition:'
+FAILURE_TIMEOUT = 3600
+
+
+def rendition_name(name, rendition):
+    """Storage name of ``rendition`` for the original file ``name``.
+
+    Renditions sit next to the original: avatars/photo.jpg -> avatars/photo.jpg.thumbnail.webp.
+    The original's extension stays, so photo.jpg and photo.png get their own.
+    """
+    return f'{name}.{rendition}.{EXTENSION}'
+
+
+def generate_rendition(field_file, rendition, force=False):
+    """Write ``rendition`` of an image field's file to its storage and return the storage name."""
+    storage = field_file.storage
+    target = rendition_name(field_file.name, rendition)
+    if storage.exists(target):
+        if not force:
+            return target
+        storage.delete(target)
+
+    size = RENDITIONS[rendition]
+    with storage.open(field_file.name, 'rb') as original:
+        with Image.open(original) as image:
+            image = ImageOps.exif_transpose(image)
+            image = ImageOps.fit(image.convert('RGB'), (size, size), Image.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, FORMAT, quality=QUALITY, method=6)
+
+    return storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def generate_renditions(field_file, force=False):
+    for rendition in RENDITIONS:
+        generate_rendition(field_file, rendition, force=force)
+
+
+def rendition_url(field_file, rendition):
+    """URL of ``rendition`` of ``field_file``, generating it on first use.
+
+    Whether the rendition exists is cached, so after the first request this costs
+    a cache lookup rather than a storage check. Falls back to the original file
+    when it cannot be read as an image.
+    """
+    if not field_file:
+        return ''
+    target = rendition_name(field_file.name, rendition)
+    saved = cache.get(CACHE_PREFIX + target)
+    if saved is None:
+        try:
+            saved = generate_rendition(field_file, rendition)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            logger.warning('Could not make %s rendition of %s', rendition, field_file.name, exc_info=True)
+            # Remember the failure for a while instead of retrying on every render.
+            saved = ''
+            cache.set(CACHE_PREFIX + target, saved, FAILURE_TIMEOUT)
+        else:
+            cache.set(CACHE_PREFIX + target, saved, None)
+    if not saved:
+        return field_file.url
+    return field_file.storage.url(saved)
@@ -0,0 +1,147 @@
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+# How far the replica may lag behind the primary. A user who wrote is kept on
+# the primary for this long, so they always see their own changes.
+REPLICA_LAG_SECONDS = getattr(settings, 'REPLICA_LAG_SECONDS', 30)
+STICKY_COOKIE_NAME = 'primary_until'
+
+# Per-request routing state, set up by ReplicaRoutingMiddleware. A mutable dict
+# rather than separate variables, so writes made in a copied context (an async
+# view or sync_to_async call) are still seen by the middleware.
+_request_state = ContextVar('replica_routing_state', default=None)
+
+
+def replica_enabled():
+    """True when a replica is configured and is a different database from the primary.
+
+    Under the test runner the replica is a TEST MIRROR of default, i.e. the same
+    file, and reading through a second connection would miss the test's
+    uncommitted data, so reads stay on default.
+    """
+    if REPLICA_DB_ALIAS not in connections.settings:
+        return False
+    return connections.settings[REPLICA_DB_ALIAS]['NAME'] != connections.settings[DEFAULT_DB_ALIAS]['NAME']
+
+
+def reading_from_replica():
+    """True if reads made now, in this request, go to the replica."""
+    state = _request_state.get()
+    return bool(
+        state is not None
+        and state['read_replica']
+        and not state['sticky']
+        and not state['wrote']
+        and replica_enabled()
+    )
+
+
+def read_replica(view_func):
+    """Send the view's reads to the replica, unless the user has written recently.
+
+    Only for views that never write; their data may be up to
+    REPLICA_LAG_SECONDS old. Works for sync and async views.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            state = _request_state.get()
+            if state is None:
+                return await view_func(request, *args, **kwargs)
+            state['read_replica'] = True
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                state['read_replica'] = False
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        state = _request_state.get()
+        if state is None:
+            return view_func(request, *args, **kwargs)
+        state['read_replica'] = True
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            state['read_replica'] = False
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """Writes go to default; reads too, except inside @read_replica views."""
+
+    def db_for_read(self, model, **hints):
+        return REPLICA_DB_ALIAS if reading_from_replica() else None
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary file, schema included.
+        return db != REPLICA_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Tracks writes per request and keeps a user who wrote on the primary.
+
+    After a request that wrote, the response sets a cookie holding the time until
+    which that browser's reads stay on the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.request_state(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.process_response(state, response)
+
+    async def __acall__(self, request):
+        state = self.request_state(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.process_response(state, response)
+
+    def request_state(self, request):
+        try:
+            sticky = float(request.COOKIES.get(STICKY_COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            sticky = False
+        return {'read_replica': False, 'sticky': sticky, 'wrote': False}
+
+    def process_response(self, state, response):
+        if state['wrote']:
+            response.set_cookie(
+                STICKY_COOKIE_NAME,
+                str(time.time() + REPLICA_LAG_SECONDS),
+                max_age=REPLICA_LAG_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
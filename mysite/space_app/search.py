@@ -0,0 +1,58 @@
+"""
+Full-text search over users, on an SQLite FTS5 table.
+
+space_app_user_search has a row per user, with the user's id as rowid. It
+indexes their name, email, university, study field and skills (the Skill names
+and other_skills). Triggers added in migration 0025 keep it in step with the
+user, skill and user-skill tables. Unlike signals, triggers also see rows
+written with bulk_create(), update() or raw SQL. UserSearch maps the table for
+joins; Python never writes to it.
+
+search_users() turns what was typed into prefix terms that must all match, so
+"ahm eng" finds Ahmed the engineer while it is being typed. The matches come
+best first, by bm25 with a hit in the name worth most (the weights are set in
+the migration). On other databases it falls back to the icontains filter.
+"""
+import re
+
+from django.db import connections, models
+from django.db.models import Lookup, Q
+
+TERM_RE = re.compile(r'\w+')
+# More terms than this are ignored; a search box query is a few words.
+MAX_TERMS = 8
+# Matches views.search_participants returns.
+SEARCH_RESULTS = 50
+
+
+class SearchDocumentField(models.TextField):
+    """The FTS5 table's hidden column of the same name, which MATCH is applied to."""
+
+
+@SearchDocumentField.register_lookup
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+def match_expression(query):
+    """Return an FTS5 query matching every word of ``query`` as a prefix, or '' if it has none.
+
+    Each term is quoted, so FTS5 operators and column filters typed by the user
+    are searched for as words instead of being interpreted.
+    """
+    return ' '.join(f'"{term}"*' for term in TERM_RE.findall(query)[:MAX_TERMS])
+
+
+def search_users(users, query):
+    """Narrow the User queryset ``users`` to those matching ``query``, best match first."""
+    if connections[users.db].vendor != 'sqlite':
+        return users.filter(Q(first_name__icontains=query) | Q(last_name__icontains=query) | Q(email__icontains=query))
+    expression = match_expression(query)
+    if not expression:
+        return users.none()
+    return users.filter(search_entry__document__match=expression).order_by('search_entry__rank', 'pk')
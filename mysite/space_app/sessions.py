@@ -0,0 +1,60 @@
+"""
+Session engine: cached_db with write-behind.
+
+Reads come from the cache, falling back to the database (Django's cached_db
+already does this). For the session of a request, saving an existing session
+updates the cache straight away but leaves the database write until the response
+has been sent, so it is off the critical path. New sessions are still inserted
+immediately, since the insert is what guarantees the key is unique, and sessions
+saved outside a request (shell, tests) are written through.
+"""
+from django.contrib.sessions.backends import cached_db, db
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.middleware import SessionMiddleware
+
+
+class SessionStore(cached_db.SessionStore):
+    cache_key_prefix = 'space_app.sessions'
+    # Turned on by WriteBehindSessionMiddleware for the request's session.
+    write_behind = False
+    db_write_pending = False
+
+    def save(self, must_create=False):
+        if not self.write_behind or must_create or self.session_key is None:
+            return super().save(must_create=must_create)
+        self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        self.db_write_pending = True
+
+    def delete(self, session_key=None):
+        if session_key is None or session_key == self.session_key:
+            self.db_write_pending = False
+        super().delete(session_key)
+
+    def write_pending(self):
+        """Make the database write that save() put off, if there is one."""
+        if not self.db_write_pending:
+            return
+        self.db_write_pending = False
+        try:
+            db.SessionStore.save(self)
+        except UpdateError:
+            pass  # deleted since (e.g. logged out in another tab); nothing to keep
+
+
+class WriteBehindSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware that writes the session to the database after the response.
+
+    The deferred write runs when the response is closed, i.e. once the server
+    has sent it, like the other resources Django closes at the end of a request.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.session.write_behind = getattr(request.session, 'write_pending', None) is not None
+
+    def process_response(self, request, response):
+        response = super().process_response(request, response)
+        session = getattr(request, 'session', None)
+        if getattr(session, 'db_write_pending', False):
+            response._resource_closers.append(session.write_pending)
+        return response
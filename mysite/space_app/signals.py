@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import User
+from .caching import bump_team_versions, invalidate_cached_user, invalidate_challenges
+from .events import publish, publish_join_request, team_channel, user_channel
+from .tasks import enqueue
+from .models import User, Team, Challenge, JoinRequest, RequestProfile
 
 @receiver(post_save, sender=User)
 def ensure_superadmin(sender, instance, created, **kwargs):
@@ -14,3 +17,102 @@ def ensure_superadmin(sender, instance, created, **kwargs):
             instance.is_staff = True
             instance.is_admin = True
             instance.save()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+@receiver(m2m_changed, sender=Team.members.through)
+@receiver(m2m_changed, sender=Team.mentors.through)
+def update_team_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeps Team.member_count and Team.mentor_count in step with the M2M tables,
+    whichever side of the relation (team.members or user.teams) was changed,
+    marks the affected teams' cached cards as stale and tells their live
+    update streams.
+    """
+    if action == 'pre_clear' and reverse:
+        # The affected teams are gone from the relation once the clear has run.
+        instance._cleared_team_ids = set(
+            sender.objects.filter(user_id=instance.pk).values_list('team_id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        team_ids = [instance.pk]
+        Team.objects.filter(pk=instance.pk).refresh_counts()
+        instance.refresh_from_db(fields=['member_count', 'mentor_count'])
+    elif action == 'post_clear':
+        team_ids = instance.__dict__.pop('_cleared_team_ids', ())
+        Team.objects.filter(pk__in=team_ids).refresh_counts()
+    else:
+        team_ids = pk_set or ()
+        if team_ids:
+            Team.objects.filter(pk__in=team_ids).refresh_counts()
+    # The counts are written with UPDATE, which sends no post_save.
+    bump_team_versions(team_ids)
+    user_ids = list(pk_set or ()) if not reverse else [instance.pk]
+    if team_ids:
+        publish(
+            [*map(team_channel, team_ids), *map(user_channel, user_ids)],
+            'membership', teams=list(team_ids), users=user_ids,
+        )
+
+@receiver(pre_delete, sender=User)
+def note_user_teams(sender, instance, **kwargs):
+    # The user's membership rows are deleted by cascade, which sends no
+    # m2m_changed; note the teams so their counts can be redone afterwards.
+    instance._team_ids = set(
+        Team.members.through.objects.filter(user_id=instance.pk).values_list('team_id', flat=True).union(
+            Team.mentors.through.objects.filter(user_id=instance.pk).values_list('team_id', flat=True)
+        )
+    )
+
+@receiver(post_delete, sender=User)
+def refresh_user_team_counts(sender, instance, **kwargs):
+    team_ids = instance.__dict__.pop('_team_ids', ())
+    if team_ids:
+        Team.objects.filter(pk__in=team_ids).refresh_counts()
+        bump_team_versions(team_ids)
+
+@receiver(post_save, sender=Team)
+def team_saved(sender, instance, **kwargs):
+    bump_team_versions([instance.pk])
+
+# No post_delete receiver: it would stop Django fast-deleting join requests, and
+# the accepted request that matters has already changed the team's members.
+@receiver(post_save, sender=JoinRequest)
+def join_request_changed(sender, instance, **kwargs):
+    bump_team_versions([instance.team_id])
+    publish_join_request(instance.pk, instance.team_id, instance.team.leader_id, instance.user_id, instance.status)
+
+@receiver(post_save, sender=Challenge)
+@receiver(post_delete, sender=Challenge)
+def challenges_changed(sender, **kwargs):
+    invalidate_challenges()
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_files(sender, instance, **kwargs):
+    instance.stats_file.delete(save=False)
+    instance.report_file.delete(save=False)
+
+IMAGE_FIELDS = {User: 'avatar', Team: 'team_photo'}
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Team)
+def note_image_upload(sender, instance, **kwargs):
+    """
+    Flags a newly assigned upload; the file is only written to storage after
+    this signal, so the renditions are queued from post_save.
+    """
+    field_file = getattr(instance, IMAGE_FIELDS[sender])
+    instance._image_uploaded = bool(field_file) and not field_file._committed
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Team)
+def queue_image_renditions(sender, instance, **kwargs):
+    if instance.__dict__.pop('_image_uploaded', False):
+        enqueue('generate_image_renditions', model=sender._meta.label, pk=instance.pk, field=IMAGE_FIELDS[sender])
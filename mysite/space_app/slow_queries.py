@@ -0,0 +1,177 @@
+"""
+A log of slow SQL queries, written by an execute wrapper on every database
+connection.
+
+Queries taking SLOW_QUERY_THRESHOLD_MS or longer are appended to SLOW_QUERY_LOG,
+one JSON object per line, with:
+- the SQL with literals and placeholders replaced by ? and IN lists collapsed,
+  and a fingerprint of it, so repeats of a query group together
+- the types of the parameters; the values are not logged
+- the EXPLAIN plan, for SELECTs
+- the URL name and path of the request
+- the innermost space_app frame and template line the query was run from
+
+``manage.py slow_queries`` groups the log by fingerprint. As with Django's own
+query log, the time is that of cursor.execute(); rows fetched later are not
+included.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .metrics import current_request, view_label
+
+logger = logging.getLogger(__name__)
+
+# None turns the log off; 0 logs every query.
+SLOW_QUERY_THRESHOLD_MS = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+SLOW_QUERY_LOG = getattr(settings, 'SLOW_QUERY_LOG', settings.BASE_DIR / 'slow_queries.jsonl')
+
+APP_DIR = str(Path(__file__).resolve().parent)
+# Frames under these paths are the instrumentation and the database backend
+# (whose BEGIN IMMEDIATE waits for the write lock), not the code that ran the query.
+INSTRUMENTATION_PATHS = (
+    os.path.join(APP_DIR, 'slow_queries.py'),
+    os.path.join(APP_DIR, 'metrics.py'),
+    os.path.join(APP_DIR, 'sqlite_backend', ''),
+)
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_RE = re.compile(r'%s|\?')
+IN_LIST_RE = re.compile(r'\bIN \((?:\?, )*\?\)')
+WHITESPACE_RE = re.compile(r'\s+')
+
+_explaining = ContextVar('space_app_explaining', default=False)
+_write_lock = threading.Lock()
+
+
+def normalize(sql):
+    """Return ``sql`` with every literal and placeholder as ?, so repeats of a query compare equal."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = PLACEHOLDER_RE.sub('?', sql)
+    sql = WHITESPACE_RE.sub(' ', sql).strip()
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode()).hexdigest()[:12]
+
+
+def params_shape(params, many):
+    if many:
+        return 'executemany'  # an iterator, which the query itself has to consume
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {name: type(value).__name__ for name, value in params.items()}
+    names = [type(value).__name__ for value in params]
+    if len(names) > 10:
+        return f'{len(names)} x {"/".join(sorted(set(names)))}'
+    return names
+
+
+def query_source():
+    """Return the innermost space_app frame and template line on the stack, as strings or None."""
+    source = template = None
+    frame = sys._getframe(1)
+    while frame is not None and (source is None or template is None):
+        code = frame.f_code
+        filename = os.path.abspath(code.co_filename)
+        if source is None and filename.startswith(APP_DIR) and not filename.startswith(INSTRUMENTATION_PATHS):
+            source = f'{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno} in {code.co_name}'
+        if template is None and code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token, origin = getattr(node, 'token', None), getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                template = f'{origin.template_name or origin.name}:{token.lineno}'
+        frame = frame.f_back
+    return source, template
+
+
+def explain(connection, sql, params):
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            # SQLite's rows end with the step's detail; other databases return one column.
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError as exc:
+        return [f'EXPLAIN failed: {exc}']
+    finally:
+        _explaining.reset(token)
+
+
+def log_slow_query(execute, sql, params, many, context):
+    if _explaining.get() or SLOW_QUERY_THRESHOLD_MS is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        if duration * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+            record(context['connection'], sql, params, many, duration)
+
+
+def record(connection, sql, params, many, duration):
+    normalized = normalize(sql)
+    source, template = query_source()
+    request = current_request()
+    is_select = sql.lstrip()[:6].upper() == 'SELECT'
+    entry = {
+        'time': timezone.now().isoformat(timespec='seconds'),
+        'duration_ms': round(duration * 1000, 2),
+        'fingerprint': fingerprint(normalized),
+        'sql': normalized,
+        'params': params_shape(params, many),
+        'plan': explain(connection, sql, params) if is_select and not many else [],
+        'database': connection.alias,
+        'view': view_label(request.resolver_match) if request is not None and request.resolver_match else None,
+        'path': request.path if request is not None else None,
+        'source': source,
+        'template': template,
+    }
+    logger.warning(
+        'Slow query (%.1f ms, %s) from %s: %s',
+        entry['duration_ms'], entry['fingerprint'], source or entry['view'] or 'outside a request', normalized[:200],
+    )
+    try:
+        with _write_lock, open(SLOW_QUERY_LOG, 'a') as log:
+            log.write(json.dumps(entry) + '\n')
+    except OSError:
+        logger.exception('Could not write to the slow query log %s', SLOW_QUERY_LOG)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Sent again whenever the same connection object reconnects.
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_query)
+
+
+def read_log(path=None):
+    """Yield the entries of the slow query log, skipping lines that don't parse."""
+    try:
+        with open(path or SLOW_QUERY_LOG) as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+    except FileNotFoundError:
+        return
@@ -0,0 +1,40 @@
+"""
+django.db.backends.sqlite3 plus the ``transaction_mode`` and ``init_command``
+OPTIONS that Django 5.1 adds to it. Once the project is on 5.1 the ENGINE can go
+back to the stock backend with the same OPTIONS.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    VALID_TRANSACTION_MODES = {'DEFERRED', 'EXCLUSIVE', 'IMMEDIATE'}
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in self.VALID_TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'settings.DATABASES is improperly configured. Invalid transaction_mode {transaction_mode!r}. '
+                f'Use one of {", ".join(sorted(self.VALID_TRANSACTION_MODES))}, or None.'
+            )
+        self.transaction_mode = transaction_mode.upper() if transaction_mode else None
+        self.init_commands = kwargs.pop('init_command', '').split(';')
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for init_command in self.init_commands:
+            if init_command := init_command.strip():
+                conn.execute(init_command)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # A deferred BEGIN takes the write lock at the first write, and a
+        # transaction that read first then gets SQLITE_BUSY straight away if
+        # another connection wrote in between; the busy timeout does not apply.
+        # BEGIN IMMEDIATE takes the lock up front, so writers queue instead.
+        if self.transaction_mode is None:
+            self.cursor().execute('BEGIN')
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,111 @@
+import gzip
+import posixpath
+import re
+from io import BytesIO
+
+import brotli
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image
+
+# Text assets worth compressing ahead of time; images are already compressed.
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.map'}
+# Only keep a compressed variant that saves at least this much.
+MIN_COMPRESSION_RATIO = 0.95
+
+IMAGE_DIR = 'space_app/images/'
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+# WebP widths generated for srcset; widths at or above the original's are skipped
+# in favour of one full-size WebP, capped at MAX_IMAGE_WIDTH.
+IMAGE_WIDTHS = (320, 640, 960)
+MAX_IMAGE_WIDTH = 1600
+WEBP_QUALITY = 80
+
+VARIANT_RE = re.compile(r'^(?P<root>.+)-(?P<width>\d+)w\.webp$')
+
+
+def profile_storage():
+    """Where request profiles are kept: outside MEDIA_ROOT, so only the admin can download them."""
+    return FileSystemStorage(location=settings.PROFILES_ROOT)
+
+
+def variant_name(name, width):
+    """Source name of the ``width`` WebP variant: images/logo.jpg -> images/logo-320w.webp"""
+    root, _ = posixpath.splitext(name)
+    return f'{root}-{width}w.webp'
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes resized WebP images and .gz/.br files.
+
+    ``collectstatic`` gives every file a content-hashed name, then adds WebP
+    variants of the images under ``space_app/images`` (recorded in the manifest
+    like any other file, so ``{% static %}`` resolves them) and gzip and brotli
+    copies of the hashed text assets, which StaticAssetMiddleware serves to
+    clients that accept them.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        self.__dict__.pop('_variant_index', None)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for name in sorted(paths):
+            if name.startswith(IMAGE_DIR) and posixpath.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                for variant, hashed_variant in self.write_image_variants(name):
+                    yield variant, hashed_variant, True
+        self.save_manifest()
+
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            if posixpath.splitext(hashed_name)[1] in COMPRESSIBLE_EXTENSIONS:
+                self.write_compressed(hashed_name)
+
+    def write_image_variants(self, name):
+        with self.open(name) as original, Image.open(original) as image:
+            image.load()
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        full_width = min(image.width, MAX_IMAGE_WIDTH)
+        widths = [width for width in IMAGE_WIDTHS if width < full_width] + [full_width]
+
+        for width in widths:
+            height = round(image.height * width / image.width)
+            buffer = BytesIO()
+            image.resize((width, height), Image.LANCZOS).save(buffer, 'WEBP', quality=WEBP_QUALITY, method=6)
+            content = ContentFile(buffer.getvalue())
+
+            variant = variant_name(name, width)
+            hashed_variant = self.hashed_name(variant, content)
+            if self.exists(hashed_variant):
+                self.delete(hashed_variant)
+            self._save(hashed_variant, content)
+            self.hashed_files[self.hash_key(variant)] = hashed_variant
+            yield variant, hashed_variant
+
+    def write_compressed(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        variants = {
+            '.gz': gzip.compress(data, compresslevel=9, mtime=0),
+            '.br': brotli.compress(data, quality=11),
+        }
+        for suffix, compressed in variants.items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(compressed) < len(data) * MIN_COMPRESSION_RATIO:
+                self._save(name + suffix, ContentFile(compressed))
+
+    def image_variants(self, name):
+        """Return [(width, source name), ...] of the WebP variants of ``name``, narrowest first."""
+        if not hasattr(self, '_variant_index'):
+            index = {}
+            for key in self.hashed_files:
+                match = VARIANT_RE.match(key)
+                if match:
+                    index.setdefault(match['root'], []).append((int(match['width']), key))
+            for variants in index.values():
+                variants.sort()
+            self._variant_index = index
+        return self._variant_index.get(posixpath.splitext(name)[0], [])
@@ -0,0 +1,128 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.mail import send_mail
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Contact, Task
+from .renditions import CACHE_PREFIX, RENDITIONS, generate_renditions, rendition_name
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = 30  # seconds before the first retry, doubled on each further attempt
+RETRY_MAX_DELAY = 3600
+# A task left 'running' this long is assumed to belong to a dead worker and is handed out again.
+STALE_AFTER = timedelta(minutes=15)
+
+registry = {}
+
+
+def task(func):
+    """Register ``func`` so it can be enqueued by name and run by ``manage.py run_worker``."""
+    registry[func.__name__] = func
+    return func
+
+
+def enqueue(name, run_at=None, max_attempts=5, **payload):
+    """Store a task for the worker and return it. ``payload`` must be JSON-serialisable."""
+    if name not in registry:
+        raise ValueError(f'No task registered as {name!r}')
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def claim_next_task(names=None):
+    """Mark the next due task as running and return it, or None if nothing is due.
+
+    ``names`` limits the claim to tasks of those names.
+
+    The claim is a conditional UPDATE on the status we just read, so when several
+    workers race for the same row exactly one of them gets it and the others move
+    on to the next candidate.
+    """
+    while True:
+        now = timezone.now()
+        due = Task.objects.filter(
+            Q(status='pending', run_at__lte=now) | Q(status='running', locked_at__lt=now - STALE_AFTER)
+        )
+        if names is not None:
+            due = due.filter(name__in=names)
+        candidate = due.order_by('run_at').values_list('pk', 'status', 'locked_at').first()
+        if candidate is None:
+            return None
+        pk, status, locked_at = candidate
+        claimed = Task.objects.filter(pk=pk, status=status, locked_at=locked_at).update(
+            status='running', locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+
+
+def run_task(task):
+    """Run a claimed task, then mark it done, schedule a retry with backoff, or give up."""
+    func = registry.get(task.name)
+    try:
+        if func is None:
+            raise LookupError(f'No task registered as {task.name!r}')
+        func(**task.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            logger.error('Task %s (%s) failed after %d attempts:\n%s', task.pk, task.name, task.attempts, error)
+            Task.objects.filter(pk=task.pk).update(status='failed', locked_at=None, last_error=error)
+        else:
+            logger.warning('Task %s (%s) failed on attempt %d, will retry', task.pk, task.name, task.attempts)
+            Task.objects.filter(pk=task.pk).update(
+                status='pending',
+                locked_at=None,
+                last_error=error,
+                run_at=timezone.now() + retry_delay(task.attempts),
+            )
+        return False
+
+    Task.objects.filter(pk=task.pk).update(status='done', locked_at=None)
+    return True
+
+
+def run_due_tasks():
+    """Run tasks until none are due and return how many were run."""
+    count = 0
+    while (task := claim_next_task()) is not None:
+        run_task(task)
+        count += 1
+    return count
+
+
+@task
+def send_contact_notification(contact_id):
+    contact = Contact.objects.get(pk=contact_id)
+    send_mail(
+        'New Contact Message',
+        f'You have a new message from the contact form.\n\nFrom: {contact.name} <{contact.email}>\n\n{contact.message}',
+        'from@example.com',
+        ['admin@example.com'],
+        fail_silently=False,
+    )
+
+
+@task
+def generate_image_renditions(model, pk, field):
+    """Make every rendition of a freshly uploaded image, e.g. ('space_app.User', 3, 'avatar')."""
+    instance = apps.get_model(model).objects.filter(pk=pk).only(field).first()
+    field_file = getattr(instance, field, None)
+    if not field_file:
+        return
+    generate_renditions(field_file)
+    cache.delete_many([CACHE_PREFIX + rendition_name(field_file.name, rendition) for rendition in RENDITIONS])
@@ -0,0 +1,11 @@
+from django import template
+
+from ..renditions import rendition_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def rendition(field_file, name):
+    """URL of a resized copy of an uploaded image, e.g. {% rendition team.team_photo 'thumbnail' %}."""
+    return rendition_url(field_file, name)
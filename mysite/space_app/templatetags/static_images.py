@@ -0,0 +1,53 @@
+from urllib.parse import quote, urljoin
+
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.forms.utils import flatatt
+from django.templatetags.static import PrefixNode, static
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+def static_url(path):
+    """{% static %} that doesn't fail on a file collectstatic has not seen.
+
+    Challenge images come from imported data, so one can be missing from the
+    manifest; the manifest storage then raises ValueError. Link the unhashed
+    path instead, as the page did before the manifest storage.
+    """
+    try:
+        return static(path)
+    except ValueError:
+        return urljoin(PrefixNode.handle_simple('STATIC_URL'), quote(path))
+
+
+def image_variants(path):
+    # Only the collectstatic storage knows about WebP variants; in development
+    # the plain storage serves the originals.
+    variants = getattr(staticfiles_storage, 'image_variants', None)
+    return variants(path) if variants is not None else []
+
+
+@register.simple_tag
+def picture(path, alt='', sizes='100vw', **attrs):
+    """<img> of a static image, wrapped in a <picture> offering its resized WebP variants.
+
+    e.g. {% picture 'space_app/images/person1.jpg' alt='...' sizes='160px' class='w-40 h-40' %}
+    """
+    img = format_html('<img src="{}" alt="{}"{}>', static_url(path), alt, flatatt(attrs))
+    variants = image_variants(path)
+    if not variants:
+        return img
+    srcset = ', '.join(f'{static(name)} {width}w' for width, name in variants)
+    return format_html('<picture><source type="image/webp" srcset="{}" sizes="{}">{}</picture>', srcset, sizes, img)
+
+
+@register.simple_tag
+def static_image(path, width):
+    """URL of the narrowest WebP variant of a static image at least ``width`` pixels wide."""
+    variants = image_variants(path)
+    for variant_width, name in variants:
+        if variant_width >= width:
+            return static(name)
+    return static(variants[-1][1]) if variants else static_url(path)
@@ -0,0 +1,33 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test.runner import DiscoverRunner
+
+from . import slow_queries
+
+
+class TestRunner(DiscoverRunner):
+    """Keeps the suite's queries out of the real slow query log.
+
+    Test database setup and TransactionTestCase flushes run slow queries of
+    their own, so the log goes to a temporary file with the threshold off;
+    SlowQueryLogTests turns it back on for itself.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.log_dir = tempfile.mkdtemp()
+        self.patchers = [
+            mock.patch.object(slow_queries, 'SLOW_QUERY_LOG', Path(self.log_dir) / 'slow_queries.jsonl'),
+            mock.patch.object(slow_queries, 'SLOW_QUERY_THRESHOLD_MS', None),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def teardown_test_environment(self, **kwargs):
+        for patcher in self.patchers:
+            patcher.stop()
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,1263 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import pstats
+import shutil
+import sqlite3
+import tempfile
+from contextlib import closing
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management.base import CommandError
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, F
+from django.template import Context, Template
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from PIL import Image
+
+from . import data_files, events, metrics, profiling, slow_queries, urls
+from .models import User, Team, Contact, Challenge, JoinRequest, Project, RequestProfile, Skill, Task
+from .bulk import bulk_upsert
+from .caching import get_cached_user, get_page_cache_stats, invalidate_challenges
+from .pagination import keyset_paginate
+from .search import search_users
+from .routers import STICKY_COOKIE_NAME, PrimaryReplicaRouter, ReplicaRoutingMiddleware, read_replica, replica_enabled
+from .renditions import RENDITIONS, rendition_name, rendition_url
+from .sqlite_backend.base import DatabaseWrapper
+from .management.commands import sync_replica
+from .query_budget import get_query_budget
+from . import tasks
+
+
+def make_user(index, **extra_fields):
+    fields = {
+        'first_name': f'First{index}',
+        'last_name': f'Last{index}',
+        'national_id': f'{index:014d}',
+        'phone_number': f'010{index:08d}',
+        'gender': 'male',
+        'age': 20,
+        'university': 'Port Said University',
+        'study_field': 'Engineering',
+        **extra_fields,
+    }
+    return User.objects.create_user(email=f'user{index}@example.com', password=None, **fields)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        for index in range(5):
+            Contact.objects.create(name=f'Contact {index}', email='c@example.com', message='Hi')
+
+    def test_pages_follow_cursor_without_overlap(self):
+        first = keyset_paginate(Contact.objects.all(), per_page=2)
+        second = keyset_paginate(Contact.objects.all(), first.next_cursor, per_page=2)
+        third = keyset_paginate(Contact.objects.all(), second.next_cursor, per_page=2)
+
+        seen = [c.pk for page in (first, second, third) for c in page]
+        self.assertEqual(seen, sorted(Contact.objects.values_list('pk', flat=True)))
+        self.assertFalse(third.has_next)
+
+    def test_descending_and_malformed_cursor(self):
+        page = keyset_paginate(Contact.objects.all(), 'not-a-number', per_page=10, descending=True)
+        self.assertEqual([c.pk for c in page], sorted((c.pk for c in page), reverse=True))
+        self.assertEqual(len(page), 5)
+
+
+class AdminDashboardTests(TestCase):
+    def setUp(self):
+        self.admin = make_user(0, is_admin=True)
+        self.client.force_login(self.admin)
+
+    def test_dashboard_renders_only_the_users_tab(self):
+        Team.objects.create(name='Hidden Team', leader=self.admin)
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertContains(response, self.admin.email)
+        self.assertNotContains(response, 'Hidden Team')
+
+    def test_partial_honours_filters_and_paginates(self):
+        for index in range(1, 60):
+            make_user(index, is_Mentor=index % 2 == 0)
+        url = reverse('admin_dashboard_partial', args=['users'])
+
+        response = self.client.get(url, {'role': 'mentor'})
+        self.assertEqual(len(response.context['users']), 29)
+        self.assertFalse(response.context['users'].has_next)
+
+        response = self.client.get(url)
+        page = response.context['users']
+        self.assertTrue(page.has_next)
+        self.assertContains(response, 'data-next-url')
+        response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual(len(response.context['users']), 10)
+
+    def test_unknown_tab_is_404(self):
+        response = self.client.get(reverse('admin_dashboard_partial', args=['nope']))
+        self.assertEqual(response.status_code, 404)
+
+
+class UserSearchTests(TestCase):
+    def search(self, query):
+        return list(search_users(User.objects.all(), query).values_list('email', flat=True))
+
+    def test_index_follows_users_and_skills(self):
+        user = make_user(1, first_name='Ahmed', last_name='Eladham', university='Cairo University')
+        self.assertEqual(self.search('ahm cai'), [user.email])
+        self.assertEqual(self.search('user1@example'), [user.email])
+
+        skill = Skill.objects.create(name='Astrophotography')
+        user.skills.add(skill)
+        self.assertEqual(self.search('astro'), [user.email])
+        skill.name = 'Spectroscopy'
+        skill.save()
+        self.assertEqual(self.search('astro'), [])
+        self.assertEqual(self.search('spectro'), [user.email])
+        user.skills.clear()
+        self.assertEqual(self.search('spectro'), [])
+
+        user.first_name = 'Omar'
+        user.save()
+        self.assertEqual(self.search('ahmed'), [])
+        User.objects.bulk_create([User(
+            email='bulk@example.com', first_name='Ahmed', last_name='Bulk', national_id='9' * 14,
+            phone_number='0100', gender='male', age=20, university='N/A', study_field='N/A',
+        )])
+        self.assertEqual(self.search('ahmed'), ['bulk@example.com'])
+        user.delete()
+        self.assertEqual(self.search('omar'), [])
+
+    def test_name_matches_rank_first_and_operators_are_words(self):
+        by_field = make_user(1, study_field='Nour studies')
+        by_name = make_user(2, first_name='Nour')
+        self.assertEqual(self.search('nour'), [by_name.email, by_field.email])
+        self.assertEqual(self.search('"nour" OR NEAR('), [])
+        self.assertEqual(self.search('@@'), [])
+
+    def test_search_endpoint_returns_ranked_rows(self):
+        admin = make_user(0, is_admin=True)
+        make_user(1, study_field='Nour studies')
+        make_user(2, first_name='Nour')
+        url = reverse('search_participants')
+        self.assertEqual(self.client.get(url, {'q': 'nour'}).status_code, 302)
+
+        self.client.force_login(admin)
+        response = self.client.get(url, {'q': 'nou', 'role': 'user'})
+        self.assertEqual([user.email for user in response.context['users']], ['user2@example.com', 'user1@example.com'])
+        self.assertContains(response, '<tr>', count=2)
+
+
+class TeamCountTests(TestCase):
+    def setUp(self):
+        self.leader = make_user(1)
+        self.team = Team.objects.create(name='Counted', leader=self.leader)
+
+    def test_counts_follow_both_sides_of_the_relation(self):
+        members = [make_user(index) for index in range(2, 5)]
+        self.team.members.add(self.leader, *members)
+        self.assertEqual(self.team.member_count, 4)
+
+        members[0].teams.remove(self.team)
+        members[1].teams.clear()
+        mentor = make_user(10, is_Mentor=True)
+        mentor.mentored_teams.add(self.team)
+
+        self.team.refresh_from_db()
+        self.assertEqual((self.team.member_count, self.team.mentor_count), (2, 1))
+        self.assertEqual(list(Team.objects.with_members()), [self.team])
+
+        self.team.members.clear()
+        self.assertEqual(self.team.member_count, 0)
+        self.assertFalse(Team.objects.with_members().exists())
+
+    def test_deleting_a_user_recounts_their_teams(self):
+        member, mentor = make_user(2), make_user(3, is_Mentor=True)
+        self.team.members.add(self.leader, member)
+        self.team.mentors.add(mentor)
+
+        self.client.force_login(make_user(4, is_admin=True))
+        self.client.get(reverse('delete_user', args=[member.pk]))
+        mentor.delete()
+
+        self.team.refresh_from_db()
+        self.assertEqual((self.team.member_count, self.team.mentor_count), (1, 0))
+
+    def test_reconcile_command_repairs_drift(self):
+        self.team.members.add(self.leader)
+        Team.objects.filter(pk=self.team.pk).update(member_count=5, mentor_count=3)
+
+        out = StringIO()
+        call_command('reconcile_team_counts', stdout=out)
+
+        self.team.refresh_from_db()
+        self.assertEqual((self.team.member_count, self.team.mentor_count), (1, 0))
+        self.assertIn('1 had drifted', out.getvalue())
+
+
+class ConcurrentJoinTests(TransactionTestCase):
+    def test_add_member_rejects_the_seventh_member(self):
+        team = Team.objects.create(name='Full')
+        for index in range(Team.MAX_MEMBERS):
+            team.add_member(make_user(index))
+        with self.assertRaises(ValidationError):
+            team.add_member(make_user(99))
+        team.refresh_from_db()
+        self.assertEqual(team.member_count, Team.MAX_MEMBERS)
+
+    def test_concurrent_joins_never_exceed_capacity(self):
+        out = StringIO()
+        call_command('stress_team_joins', teams=3, users=60, threads=12, seed=1, stdout=out)
+        self.assertIn(f'No team exceeded {Team.MAX_MEMBERS} members', out.getvalue())
+        self.assertIn('0 database errors', out.getvalue())
+        self.assertFalse(Team.objects.exists())
+
+
+class DataFileCacheTests(TestCase):
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        patcher = mock.patch.object(data_files, 'DATA_DIR', self.data_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(data_files._cache.clear)
+
+    def write_data(self, title, mtime):
+        path = self.data_dir / 'sample.json'
+        path.write_text(json.dumps([{'title': title}]))
+        os.utime(path, ns=(mtime, mtime))
+
+    def test_parsed_once_until_the_file_changes(self):
+        transform = mock.Mock(side_effect=lambda data: data)
+        self.write_data('First', 1_000_000_000)
+        first = data_files.load_data_file('sample.json', transform)
+        self.assertIs(data_files.load_data_file('sample.json', transform), first)
+        self.assertEqual(transform.call_count, 1)
+
+        self.write_data('Second', 2_000_000_000)
+        self.assertEqual(data_files.load_data_file('sample.json', transform)[0]['title'], 'Second')
+        self.assertEqual(transform.call_count, 2)
+
+
+class ChallengeCacheTests(TestCase):
+    def setUp(self):
+        invalidate_challenges()
+
+    def test_page_renders_from_the_cached_table(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('challenges'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('challenges'))
+        self.assertContains(response, Challenge.objects.first().title)
+
+    def test_saving_a_challenge_refreshes_the_page(self):
+        self.client.get(reverse('challenges'))
+        challenge = Challenge.objects.first()
+        challenge.description = '■ Renamed Section\n- point'
+        challenge.save()
+        self.assertEqual(challenge.parsed_description[0]['title'], 'Renamed Section')
+        self.assertContains(self.client.get(reverse('challenges')), 'Renamed Section')
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_requests_are_served_from_the_cache(self):
+        self.assertEqual(self.client.get(reverse('rules'))['X-Page-Cache'], 'miss')
+        response = self.client.get(reverse('rules'))
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Rules')
+
+        self.client.force_login(make_user(1))
+        self.assertNotIn('X-Page-Cache', self.client.get(reverse('rules')))
+        self.assertEqual(get_page_cache_stats()['rules'], {'hit': 1, 'miss': 1})
+
+    def test_challenge_changes_bump_the_version(self):
+        self.client.get(reverse('challenges'))
+        challenge = Challenge.objects.first()
+        challenge.description = '■ Renamed Section\n- point'
+        challenge.save()
+        response = self.client.get(reverse('challenges'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Renamed Section')
+
+    def test_data_file_changes_bump_the_version(self):
+        path = data_files.DATA_DIR / 'committees.json'
+        stat = path.stat()
+        self.addCleanup(os.utime, path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.client.get(reverse('about_us'))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertEqual(self.client.get(reverse('about_us'))['X-Page-Cache'], 'miss')
+
+    def test_stats_are_admin_only(self):
+        self.client.get(reverse('landing_page'))
+        self.client.force_login(make_user(1))
+        self.assertEqual(self.client.get(reverse('page_cache_stats')).status_code, 302)
+        self.client.force_login(make_user(2, is_admin=True))
+        self.assertEqual(self.client.get(reverse('page_cache_stats')).json()['landing_page'], {'hit': 0, 'miss': 1})
+
+
+class TeamCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.leader = make_user(1)
+        self.team = Team.objects.create(name='Rovers', leader=self.leader, looking_for_members=True)
+        self.team.members.add(self.leader)
+
+    def test_cards_are_shared_but_actions_are_per_viewer(self):
+        self.client.force_login(self.leader)
+        self.assertContains(self.client.get(reverse('teams')), 'Delete')
+
+        outsider = make_user(2)
+        self.client.force_login(outsider)
+        with mock.patch('space_app.templatetags.renditions.rendition_url') as rendition_url:
+            response = self.client.get(reverse('teams'))
+        rendition_url.assert_not_called()
+        self.assertContains(response, '1 / 6 members')
+        self.assertContains(response, 'Join Team')
+        self.assertNotContains(response, 'Delete')
+
+        JoinRequest.objects.create(user=outsider, team=self.team)
+        self.assertContains(self.client.get(reverse('teams')), 'Join request sent.')
+
+    def test_membership_and_team_changes_refresh_the_card(self):
+        self.client.get(reverse('teams'))
+        self.team.members.add(make_user(2))
+        self.assertContains(self.client.get(reverse('teams')), '2 / 6 members')
+
+        self.team.name = 'Europa Landers'
+        self.team.save()
+        self.assertContains(self.client.get(reverse('teams')), 'Europa Landers')
+
+        make_user(3).teams.clear()
+        self.team.members.first().teams.clear()
+        self.assertContains(self.client.get(reverse('teams')), '1 / 6 members')
+
+
+class LookupIndexTests(TestCase):
+    def test_one_pending_request_per_user_and_team(self):
+        user = make_user(1)
+        team = Team.objects.create(name='Rovers', leader=make_user(2))
+        self.client.force_login(user)
+        self.client.get(reverse('join_team', args=[team.id]))
+        response = self.client.get(reverse('join_team', args=[team.id]), follow=True)
+        self.assertContains(response, 'You have already sent a request to join this team.')
+        self.assertEqual(JoinRequest.objects.filter(user=user, team=team).count(), 1)
+
+        JoinRequest.objects.filter(user=user, team=team).update(status='rejected')
+        JoinRequest.objects.create(user=user, team=team)  # a new request after a rejection is fine
+
+    def test_hot_queries_avoid_full_table_scans(self):
+        out = StringIO()
+        call_command('index_advisor', stdout=out)
+        self.assertIn(', 0 with a full table scan.', out.getvalue())
+
+
+class SQLiteProfileTests(TestCase):
+    def test_tuned_connections_use_the_pragmas(self):
+        scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(scratch, 'tuned.sqlite3'),
+            'OPTIONS': {**connection.settings_dict['OPTIONS'], 'init_command': settings.SQLITE_PRAGMAS},
+        })
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+
+    def test_invalid_transaction_mode_is_rejected(self):
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'OPTIONS': {'transaction_mode': 'LAZY'}})
+        with self.assertRaises(ImproperlyConfigured):
+            wrapper.get_connection_params()
+
+
+class ReplicaRoutingTests(TestCase):
+    router = PrimaryReplicaRouter()
+
+    def run_view(self, view, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_read_replica_views_read_from_the_replica_until_the_user_writes(self):
+        routed = []
+
+        @read_replica
+        def reader(request):
+            routed.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        @read_replica
+        def writer(request):
+            self.router.db_for_write(User)
+            routed.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        with mock.patch('space_app.routers.replica_enabled', return_value=True):
+            self.assertNotIn(STICKY_COOKIE_NAME, self.run_view(reader).cookies)
+            response = self.run_view(writer)
+            self.run_view(reader, cookies={STICKY_COOKIE_NAME: response.cookies[STICKY_COOKIE_NAME].value})
+            self.assertIsNone(self.router.db_for_read(User))  # outside a request
+        self.assertEqual(routed, ['replica', None, None])
+
+    def test_test_mirror_is_not_treated_as_a_replica(self):
+        self.assertFalse(replica_enabled())
+        self.assertEqual(self.router.db_for_write(User), 'default')
+
+    def test_sync_replica_copies_the_primary(self):
+        target = Path(tempfile.mkdtemp()) / 'replica.sqlite3'
+        self.addCleanup(shutil.rmtree, target.parent)
+        call_command('sync_replica', target=str(target), stdout=StringIO())
+        copy = sqlite3.connect(target)
+        self.addCleanup(copy.close)
+        self.assertGreater(copy.execute("SELECT COUNT(*) FROM django_migrations").fetchone()[0], 0)
+
+    def test_sync_replica_keeps_the_primary_journal_mode(self):
+        target = Path(tempfile.mkdtemp()) / 'replica.sqlite3'
+        self.addCleanup(shutil.rmtree, target.parent)
+        for journal_mode in ('wal', 'delete'):
+            primary = target.parent / f'{journal_mode}.sqlite3'
+            with closing(sqlite3.connect(primary)) as source:
+                source.execute(f'PRAGMA journal_mode={journal_mode}')
+                source.execute('CREATE TABLE IF NOT EXISTS t (x)')
+            sync_replica.Command().copy(str(primary), str(target))
+            with closing(sqlite3.connect(target)) as copy:
+                self.assertEqual(copy.execute('PRAGMA journal_mode').fetchone()[0], journal_mode)
+
+
+class AuthCacheTests(TestCase):
+    def setUp(self):
+        self.user = make_user(1)
+
+    def test_authenticated_requests_make_no_auth_queries_once_cached(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('rules'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('rules'))
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_impersonated_user_is_cached_too(self):
+        admin = make_user(2, is_superuser=True, is_staff=True)
+        self.client.force_login(admin)
+        self.client.get(reverse('impersonate-start', args=[self.user.pk]))
+        self.client.get(reverse('rules'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('rules'))
+        self.assertEqual(response.wsgi_request.user, self.user)
+        self.assertEqual(response.wsgi_request.impersonator, admin)
+
+    def test_saving_a_user_drops_the_cached_copy(self):
+        get_cached_user(self.user.pk)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_cached_user(self.user.pk).first_name, 'Renamed')
+
+    def test_session_changes_reach_the_database_after_the_request(self):
+        admin = make_user(2, is_superuser=True, is_staff=True)
+        self.client.force_login(admin)
+        self.client.get(reverse('impersonate-start', args=[self.user.pk]))
+        session = Session.objects.get(session_key=self.client.session.session_key)
+        self.assertEqual(session.get_decoded()['_impersonate'], self.user.pk)
+
+        self.client.get(reverse('logout'))
+        self.assertFalse(Session.objects.filter(session_key=session.session_key).exists())
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.leader = make_user(1)
+        self.teams = [Team.objects.create(name=f'Team {n}', leader=self.leader) for n in range(3)]
+        self.teams[0].members.add(self.leader)
+
+    def test_teams_are_paginated_by_cursor_with_the_selected_fields(self):
+        response = self.client.get(reverse('api_teams'), {'fields': 'id,open_seats', 'limit': 2})
+        data = response.json()
+        self.assertEqual(data['results'], [
+            {'id': self.teams[0].id, 'open_seats': Team.MAX_MEMBERS - 1},
+            {'id': self.teams[1].id, 'open_seats': Team.MAX_MEMBERS},
+        ])
+        data = self.client.get(data['next']).json()
+        self.assertEqual(data, {'results': [{'id': self.teams[2].id, 'open_seats': Team.MAX_MEMBERS}], 'next': None})
+
+    def test_unchanged_listing_is_a_304_until_a_row_changes(self):
+        url = reverse('api_teams')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.teams[1].members.add(make_user(2))  # count UPDATE, not save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.teams[2].delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(reverse('api_projects')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('api_teams'), {'fields': 'id,password'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_teams'), {'limit': 'all'}).status_code, 400)
+        self.client.force_login(self.leader)
+        self.assertEqual(self.client.get(reverse('api_projects'), {'team': 'x'}).status_code, 400)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_server_timing_only_for_admins(self):
+        self.client.force_login(make_user(1, is_admin=True))
+        response = self.client.get(reverse('teams'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, sql;dur=[\d.]+;desc="\d+ queries", template;dur=[\d.]+, cache;desc="\d+ hits, \d+ misses"$')
+        self.assertNotIn('total;dur=0.0,', timing)
+
+        for user in (make_user(2), make_user(3, is_Mentor=True)):
+            self.client.force_login(user)
+            self.assertNotIn('Server-Timing', self.client.get(reverse('teams')))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        for _ in range(2):
+            self.client.get(reverse('rules'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(make_user(1, is_Mentor=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        body = response.content.decode()
+        self.assertIn('space_app_request_duration_seconds_count{view="rules"} 2', body)
+        self.assertIn('space_app_request_duration_seconds_bucket{view="rules",le="+Inf"} 2', body)
+        self.assertIn('space_app_page_cache_requests_total{page="rules",result="hit"} 1', body)
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        log_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, log_dir)
+        self.log = log_dir / 'slow.jsonl'
+        for name, value in (('SLOW_QUERY_LOG', self.log), ('SLOW_QUERY_THRESHOLD_MS', 0)):
+            patcher = mock.patch.object(slow_queries, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_literals_and_in_lists_share_a_fingerprint(self):
+        first = slow_queries.normalize("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a' LIMIT 21")
+        second = slow_queries.normalize("SELECT *\n  FROM t WHERE id IN (%s) AND name = 'it''s' LIMIT 5")
+        self.assertEqual(first, 'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?')
+        self.assertEqual(slow_queries.fingerprint(first), slow_queries.fingerprint(second))
+
+    def test_logs_plan_and_template_line(self):
+        template = Template('{% for team in teams %}\n{{ team.name }}{% endfor %}')
+        with self.assertLogs('space_app.slow_queries', 'WARNING'):
+            template.render(Context({'teams': Team.objects.filter(name='Nobody')}))
+
+        entry, = slow_queries.read_log(self.log)
+        self.assertEqual(entry['params'], ['str'])
+        self.assertTrue(entry['sql'].endswith('WHERE "space_app_team"."name" = ?'))
+        self.assertEqual(entry['template'], '<unknown source>:1')
+        self.assertTrue(entry['source'].startswith('space_app/tests.py:'))
+        self.assertTrue(entry['plan'])
+
+        out = StringIO()
+        with mock.patch('space_app.management.commands.slow_queries.SLOW_QUERY_LOG', self.log):
+            call_command('slow_queries', '--clear', stdout=out)
+        self.assertIn(f'{entry["fingerprint"]}  1 x', out.getvalue())
+        self.assertEqual(self.log.read_text(), '')
+
+    def test_source_skips_the_database_backend(self):
+        # As if the query were the backend's BEGIN IMMEDIATE, waiting for the write lock.
+        backend_file = os.path.join(slow_queries.APP_DIR, 'sqlite_backend', 'base.py')
+        namespace = {'query_source': slow_queries.query_source}
+        exec(compile('source, _ = query_source()', backend_file, 'exec'), namespace)
+        self.assertTrue(namespace['source'].startswith('space_app/tests.py:'))
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_dir)
+        for name in ('stats_file', 'report_file'):
+            patcher = mock.patch.object(
+                RequestProfile._meta.get_field(name), 'storage', FileSystemStorage(location=profile_dir),
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_only_superusers_can_ask_for_a_profile(self):
+        # Not an admin either: they could not open the profile in the admin.
+        for user in (make_user(1), make_user(3, is_Mentor=True), make_user(4, is_admin=True)):
+            self.client.force_login(user)
+            self.assertNotIn('X-Profile', self.client.get(reverse('teams'), {'profile': '1'}))
+        self.assertFalse(RequestProfile.objects.exists())
+
+        admin = make_user(2, is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('teams'), headers={'X-Profile': '1'})
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile'], reverse('admin:space_app_requestprofile_change', args=[profile.pk]))
+        self.assertEqual((profile.view, profile.user, profile.trigger), ('teams', admin, 'requested'))
+        report = profile.report_file.read().decode()
+        self.assertIn('Top allocations', report)
+        self.assertIn('views.py', report)
+
+        download = self.client.get(reverse('admin:space_app_requestprofile_download', args=[profile.pk, 'stats']))
+        stats = pstats.Stats(profile.stats_file.path)
+        self.assertTrue(stats.total_calls)
+        self.assertEqual(download['Content-Disposition'], f'attachment; filename="{os.path.basename(profile.stats_file.name)}"')
+
+        stats_path = profile.stats_file.path
+        profile.delete()
+        self.assertFalse(os.path.exists(stats_path))
+
+    def test_sampling(self):
+        with mock.patch.object(profiling, 'PROFILE_SAMPLE_EVERY', 1):
+            response = self.client.get(reverse('rules'))
+        self.assertEqual(RequestProfile.objects.get().trigger, 'sampled')
+        self.assertNotIn('X-Profile', response)  # no link to the admin for anonymous visitors
+
+
+class BulkUpsertTests(TestCase):
+    def test_reports_a_diff_and_writes_in_one_batch(self):
+        Skill.objects.create(name='Rocketry')
+        Challenge.objects.create(title='Existing', category='Old', description='■ A', difficulty='Easy')
+        rows = [
+            {'title': 'Existing', 'category': 'New', 'description': '■ A', 'difficulty': 'Easy'},
+            {'title': 'Fresh', 'category': 'New', 'description': '■ B', 'difficulty': 'Hard'},
+        ]
+
+        with self.assertNumQueries(2):
+            result = bulk_upsert(Challenge, rows, key='title', fields=['category', 'description', 'difficulty'])
+
+        self.assertEqual(result.created, ['Fresh'])
+        self.assertEqual(result.updated, {'Existing': {'category': ('Old', 'New')}})
+        self.assertEqual(Challenge.objects.get(title='Existing').category, 'New')
+        self.assertEqual(bulk_upsert(Skill, [{'name': 'Rocketry'}], key='name').unchanged, ['Rocketry'])
+
+    def test_import_challenges_from_a_path(self):
+        path = Path(tempfile.mkdtemp()) / 'edition.json'
+        self.addCleanup(shutil.rmtree, path.parent)
+        path.write_text(json.dumps([{
+            'title': 'New Edition Challenge', 'category': 'Space', 'description': '■ Goal\n- Win',
+            'difficulty': 'Medium', 'image': 'new.jpg',
+        }]))
+
+        out = StringIO()
+        call_command('import_challenges', str(path), dry_run=True, stdout=out)
+        self.assertIn('1 created', out.getvalue())
+        self.assertFalse(Challenge.objects.filter(title='New Edition Challenge').exists())
+
+        call_command('import_challenges', str(path), stdout=StringIO())
+        challenge = Challenge.objects.get(title='New Edition Challenge')
+        self.assertEqual(challenge.parsed_description[0]['title'], 'Goal')
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = make_user(0, is_admin=True)
+        self.mentor = make_user(1, is_Mentor=True)
+        team = Team.objects.create(name='Exported', leader=self.admin)
+        team.members.add(self.admin)
+        team.mentors.add(self.mentor)
+        self.client.force_login(self.admin)
+
+    def test_csv_export_honours_dashboard_filters(self):
+        response = self.client.get(reverse('export_data', args=['users', 'csv']), {'role': 'mentor'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn(self.mentor.email, lines[1])
+
+    def test_csv_cells_cannot_start_a_formula(self):
+        Team.objects.filter(name='Exported').update(name='=HYPERLINK("http://evil.invalid")')
+        response = self.client.get(reverse('export_data', args=['teams', 'csv']))
+        header, row = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(row[header.index('name')], '\'=HYPERLINK("http://evil.invalid")')
+
+    def test_empty_csv_export_still_has_a_header(self):
+        response = self.client.get(reverse('export_data', args=['projects', 'csv']))
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            'id,name,team,submission_status,video_url,has_project_file,has_powerpoint,has_resources',
+        ])
+
+    def test_jsonl_export_of_teams(self):
+        response = self.client.get(reverse('export_data', args=['teams', 'jsonl']))
+        row = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(row['members'], [self.admin.email])
+        self.assertEqual(row['mentors'], [self.mentor.email])
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command('export_data', 'users', fmt='jsonl', in_team='yes', stdout=out)
+        self.assertEqual([json.loads(line)['email'] for line in out.getvalue().splitlines()], [self.admin.email])
+
+    def test_unknown_dataset_is_404(self):
+        self.assertEqual(self.client.get(reverse('export_data', args=['contacts', 'csv'])).status_code, 404)
+
+
+class TaskQueueTests(TestCase):
+    def test_contact_form_only_enqueues_the_email(self):
+        response = self.client.post(reverse('contact'), {'name': 'Ada', 'email': 'ada@example.com', 'message': 'Hello'})
+        self.assertRedirects(response, reverse('contact_success'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Task.objects.get().name, 'send_contact_notification')
+
+        out = StringIO()
+        call_command('run_worker', threads=1, once=True, stdout=out)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Ada <ada@example.com>', mail.outbox[0].body)
+        self.assertEqual(Task.objects.get().status, 'done')
+
+    def test_contact_is_not_saved_when_the_enqueue_fails(self):
+        with mock.patch('space_app.views.enqueue', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse('contact'), {'name': 'Ada', 'email': 'ada@example.com', 'message': 'Hello'})
+        self.assertFalse(Contact.objects.exists())
+
+    def test_benchmark_leaves_other_tasks_queued(self):
+        tasks.enqueue('send_contact_notification', contact_id=0)
+        call_command('benchmark_worker', tasks=5, threads=[1], stdout=StringIO())
+        self.assertEqual(list(Task.objects.values_list('name', 'status')), [('send_contact_notification', 'pending')])
+
+    def test_failures_back_off_then_give_up(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            raise RuntimeError('mail server down')
+
+        with mock.patch.dict(tasks.registry, {'flaky': flaky}), self.assertLogs('space_app.tasks', 'WARNING'):
+            task = tasks.enqueue('flaky', max_attempts=2)
+            self.assertEqual(tasks.run_due_tasks(), 1)
+            task.refresh_from_db()
+            self.assertEqual((task.status, task.attempts), ('pending', 1))
+            self.assertIn('mail server down', task.last_error)
+            self.assertEqual(tasks.run_due_tasks(), 0)  # retry is not due yet
+
+            Task.objects.filter(pk=task.pk).update(run_at=task.created_at)
+            tasks.run_due_tasks()
+            task.refresh_from_db()
+            self.assertEqual((task.status, task.attempts), ('failed', 2))
+        self.assertEqual(len(calls), 2)
+
+    def test_retry_delay_is_exponential_and_capped(self):
+        self.assertEqual(tasks.retry_delay(1).total_seconds(), tasks.RETRY_BASE_DELAY)
+        self.assertEqual(tasks.retry_delay(2).total_seconds(), tasks.RETRY_BASE_DELAY * 2)
+        self.assertEqual(tasks.retry_delay(20).total_seconds(), tasks.RETRY_MAX_DELAY)
+
+
+class RenditionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def upload(self, name='photo.jpg', content=None):
+        if content is None:
+            buffer = BytesIO()
+            Image.new('RGB', (900, 600), 'navy').save(buffer, 'JPEG')
+            content = buffer.getvalue()
+        return SimpleUploadedFile(name, content)
+
+    def test_upload_queues_renditions(self):
+        user = make_user(1, avatar=self.upload())
+        self.assertEqual(Task.objects.get().name, 'generate_image_renditions')
+        tasks.run_due_tasks()
+        for rendition, size in RENDITIONS.items():
+            name = rendition_name(user.avatar.name, rendition)
+            with user.avatar.storage.open(name) as f, Image.open(f) as image:
+                self.assertEqual(image.size, (size, size))
+
+        user.first_name = 'Renamed'
+        user.save()
+        self.assertEqual(Task.objects.count(), 1)  # no new upload, nothing queued
+
+    def test_url_is_generated_lazily_and_cached(self):
+        team = Team.objects.create(name='Rovers', team_photo=self.upload())
+        Task.objects.all().delete()
+        url = rendition_url(team.team_photo, 'card')
+        self.assertTrue(url.endswith('.card.webp'))
+        with mock.patch('space_app.renditions.generate_rendition') as generate:
+            self.assertEqual(rendition_url(team.team_photo, 'card'), url)
+        generate.assert_not_called()
+
+    def test_originals_differing_by_extension_keep_their_own_renditions(self):
+        jpeg = Team.objects.create(name='Rovers', team_photo=self.upload('photo.jpg'))
+        buffer = BytesIO()
+        Image.new('RGB', (300, 300), 'orange').save(buffer, 'PNG')
+        png = Team.objects.create(name='Landers', team_photo=self.upload('photo.png', buffer.getvalue()))
+        self.assertEqual(rendition_name(jpeg.team_photo.name, 'card'), 'team_photos/photo.jpg.card.webp')
+
+        urls = {rendition_url(team.team_photo, 'card') for team in (jpeg, png)}
+        self.assertEqual(len(urls), 2)
+        with png.team_photo.storage.open(rendition_name(png.team_photo.name, 'card')) as f, Image.open(f) as image:
+            self.assertEqual(image.getpixel((0, 0)), (255, 165, 0))
+
+    def test_unreadable_image_falls_back_to_original(self):
+        team = Team.objects.create(name='Rovers', team_photo=self.upload('photo.png', b'not an image'))
+        with self.assertLogs('space_app.renditions', 'WARNING'):
+            self.assertEqual(rendition_url(team.team_photo, 'thumbnail'), team.team_photo.url)
+
+
+class StaticPipelineTests(TestCase):
+    def setUp(self):
+        self.source = source = tempfile.mkdtemp()
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, static_root)
+        os.makedirs(os.path.join(source, 'space_app', 'images'))
+        with open(os.path.join(source, 'space_app', 'site.css'), 'w') as f:
+            f.write('body { color: white; }\n' * 200)
+        Image.new('RGB', (700, 400), 'navy').save(os.path.join(source, 'space_app', 'images', 'logo.jpg'))
+
+        settings_override = override_settings(
+            DEBUG=False,
+            STATIC_ROOT=static_root,
+            STATICFILES_DIRS=[source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'space_app.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_collectstatic_writes_variants(self):
+        self.assertEqual(
+            [width for width, name in staticfiles_storage.image_variants('space_app/images/logo.jpg')],
+            [320, 640, 700],
+        )
+        css = staticfiles_storage.stored_name('space_app/site.css')
+        self.assertTrue(staticfiles_storage.exists(css + '.gz'))
+        self.assertTrue(staticfiles_storage.exists(css + '.br'))
+
+        html = Template("{% load static_images %}{% picture 'space_app/images/logo.jpg' alt='Logo' %}").render(Context())
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('logo-640w.', html)
+
+    def test_challenge_image_missing_from_the_manifest_falls_back_to_its_path(self):
+        # Stand-ins for the other files base.html links, so only the challenge image is missing.
+        for name in ('css/google-fonts.css', 'css/tailwind.min.css', 'js/alpine.min.js'):
+            os.makedirs(os.path.join(self.source, 'space_app', os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(self.source, 'space_app', name), 'w') as f:
+                f.write('/* stand-in */\n')
+        Image.new('RGB', (64, 64), 'navy').save(
+            os.path.join(self.source, 'space_app', 'images', 'nasa_space_apps_port_said_logo.jpg')
+        )
+        call_command('collectstatic', interactive=False, verbosity=0)
+        Challenge.objects.create(title='Imported', category='New', description='■ Goal', difficulty='Easy', image='imported.jpg')
+        cache.clear()
+        response = self.client.get(reverse('challenges'))
+        self.assertContains(response, 'src="/static/space_app/images/imported.jpg"')
+
+    def test_hashed_assets_are_immutable_and_precompressed(self):
+        url = staticfiles_storage.url('space_app/site.css')
+        response = Client().get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        response = Client().get(url)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content).count(b'color'), 200)
+
+        response = Client().get('/static/space_app/site.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0, must-revalidate')
+
+
+class QueryBudgetTests(TestCase):
+    """Replays every space_app URL against seeded data and checks the view's declared query budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        skills = list(Skill.objects.all()[:3])
+        challenge = Challenge.objects.first()
+        cls.admin = make_user(0, is_admin=True)
+        cls.mentor = make_user(1, is_Mentor=True)
+        cls.outsider = make_user(2)
+        cls.teams = []
+        index = 10
+        for team_number in range(3):
+            members = [make_user(index + offset) for offset in range(4)]
+            index += 4
+            for member in members:
+                member.skills.set(skills)
+            team = Team.objects.create(name=f'Team {team_number}', challenge=challenge, leader=members[0])
+            team.members.set(members)
+            team.mentors.add(cls.mentor)
+            Project.objects.create(team=team, name=f'Project {team_number}', description='A project')
+            JoinRequest.objects.create(user=make_user(index), team=team)
+            index += 1
+            cls.teams.append(team)
+        for number in range(3):
+            Contact.objects.create(name=f'Contact {number}', email='c@example.com', message='Hi')
+
+        cls.spare_user = make_user(100)
+        cls.spare_team = Team.objects.create(name='Spare', leader=cls.admin)
+        cls.spare_team.members.add(cls.admin)
+        cls.spare_project = Project.objects.create(team=cls.spare_team, name='Spare project', description='Spare')
+        cls.projectless_team = Team.objects.create(name='No project yet', challenge=challenge, leader=make_user(101))
+        cls.projectless_team.members.add(cls.projectless_team.leader)
+        cls.outsider.set_password('launch-window-42')
+        cls.outsider.save()
+
+    def grow(self):
+        """Add more of every row the pages list, without changing which branch a case takes."""
+        skills = list(Skill.objects.all()[:8])
+        challenge = Challenge.objects.first()
+        mentors = [make_user(200 + number, is_Mentor=True) for number in range(3)]
+        for number, team in enumerate(self.teams):
+            team.members.add(make_user(210 + number))
+            team.mentors.add(*mentors)
+            for offset in range(4):
+                JoinRequest.objects.create(user=make_user(220 + 10 * number + offset), team=team)
+        for team_number in range(10):
+            members = [make_user(300 + 10 * team_number + offset) for offset in range(5)]
+            team = Team.objects.create(name=f'Extra {team_number}', challenge=challenge, leader=members[0])
+            team.members.set(members)
+            team.mentors.add(*mentors)
+            Project.objects.create(team=team, name=f'Extra project {team_number}', description='More')
+        for user in User.objects.all():
+            user.skills.set(skills)
+        for number in range(20):
+            Contact.objects.create(name=f'Extra contact {number}', email='c@example.com', message='Hi')
+
+    def url_cases(self):
+        team = self.teams[0]
+        leader = team.leader
+        project = team.project
+        join_request = team.join_requests.first()
+        return [
+            ('landing_page', [], None),
+            ('dashboard_redirect', [], self.admin),
+            ('register', [], None),
+            ('login', [], None),
+            ('profile', [], leader),
+            ('admin_dashboard', [], self.admin),
+            ('admin_dashboard_partial', ['users'], self.admin),
+            ('admin_dashboard_partial', ['teams'], self.admin),
+            ('admin_dashboard_partial', ['projects'], self.admin),
+            ('admin_dashboard_partial', ['contacts'], self.admin),
+            ('participant_dashboard', [], self.admin),
+            ('search_participants', [], self.admin),
+            ('export_data', ['users', 'csv'], self.admin),
+            ('export_data', ['teams', 'jsonl'], self.admin),
+            ('export_data', ['projects', 'csv'], self.admin),
+            ('edit_profile', [], leader),
+            ('edit_user', [leader.id], self.admin),
+            ('user_detail', [leader.id], self.admin),
+            ('create_team', [], self.outsider),
+            ('edit_team', [team.id], leader),
+            ('create_project', [self.projectless_team.id], self.projectless_team.leader),
+            ('project_detail', [project.id], leader),
+            ('edit_project', [project.id], leader),
+            ('contact', [], None),
+            ('contact_success', [], None),
+            ('about_us', [], None),
+            ('privacy_policy', [], None),
+            ('rules', [], None),
+            ('challenges', [], None),
+            ('page_cache_stats', [], self.admin),
+            ('metrics', [], self.admin),
+            ('events', [], leader),
+            ('teams', [], self.outsider),
+            ('team_detail', [team.id], leader),
+            ('join_team', [team.id], self.outsider),
+            ('join_team', [team.id], self.mentor),
+            ('cancel_join_request', [team.id], join_request.user),
+            ('invite_member', [team.id], leader),
+            ('manage_join_requests', [team.id], leader),
+            ('handle_join_request', [self.teams[1].join_requests.first().id, 'accept'], self.teams[1].leader),
+            ('leave_team', [self.teams[2].id], self.teams[2].members.last()),
+            ('delete_project', [self.spare_project.id], self.admin),
+            ('delete_team', [self.spare_team.id], self.admin),
+            ('delete_user', [self.spare_user.id], self.admin),
+            ('logout', [], leader),
+        ]
+
+    def test_every_view_declares_a_budget(self):
+        for pattern in urls.urlpatterns:
+            with self.subTest(pattern.name):
+                self.assertIsNotNone(get_query_budget(pattern.callback), f'{pattern.name} has no query budget')
+
+    def post_cases(self):
+        """(name, args, user, data) for the views that save a form on POST, with valid data."""
+        team = self.teams[0]
+        leader = team.leader
+        challenge = Challenge.objects.first()
+        # The leader's own skills, so saving them leaves the skill rows as they are.
+        skills = list(leader.skills.values_list('pk', flat=True))
+        profile = {
+            'first_name': 'Nadia', 'last_name': 'Fawzy', 'national_id': '29901011234567', 'phone_number': '01098765432',
+            'gender': 'female', 'age': 22, 'language': 'en', 'skills': skills, 'status': 'active',
+            'university': 'Port Said University', 'study_field': 'Engineering',
+        }
+        return [
+            ('register', [], None, {
+                **profile, 'email': 'nadia@example.com', 'password': 'launch-window-42',
+                'confirm_password': 'launch-window-42', 'terms_and_conditions': 'on',
+            }),
+            ('login', [], None, {'email': self.outsider.email, 'password': 'launch-window-42'}),
+            ('edit_profile', [], leader, {**profile, 'email': leader.email}),
+            ('edit_user', [leader.id], self.admin, {
+                'first_name': 'Renamed', 'last_name': 'Leader', 'email': leader.email,
+                'phone_number': leader.phone_number, 'skills': skills, 'role': 'none',
+            }),
+            ('create_team', [], self.outsider, {'name': 'Fresh', 'challenge': challenge.pk, 'looking_for_members': 'on'}),
+            ('edit_team', [team.id], leader, {'name': 'Renamed', 'challenge': challenge.pk}),
+            ('create_project', [self.projectless_team.id], self.projectless_team.leader, {
+                'name': 'Lander', 'description': 'A lander',
+            }),
+            ('edit_project', [team.project.id], leader, {'name': 'Renamed project'}),
+            ('contact', [], None, {'name': 'Visitor', 'email': 'visitor@example.com', 'message': 'When is judging?'}),
+        ]
+
+    def cases(self):
+        """Every case as (method, name, args, user, data)."""
+        return [('get', *case, None) for case in self.url_cases()] + [('post', *case) for case in self.post_cases()]
+
+    def run_case(self, method, name, args, user, data):
+        """Request one case with cold caches and undo its writes; return (url, response, queries)."""
+        url = reverse(name, args=args)
+        client = Client()
+        with transaction.atomic():
+            if user is not None:
+                client.force_login(user)
+            cache.clear()  # sessions too, which are read from the cache
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, method)(url, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            transaction.set_rollback(True)
+        return url, response, queries
+
+    def test_views_stay_within_budget(self):
+        covered = set()
+        for method, name, args, user, data in self.cases():
+            url, response, queries = self.run_case(method, name, args, user, data)
+            covered.add(name)
+            with self.subTest(f'{method.upper()} {url}'):
+                self.assertLess(response.status_code, 500)
+                if method == 'post':
+                    # A redirect: the form was valid and saved.
+                    self.assertEqual(response.status_code, 302, response.content[:2000])
+                budget = get_query_budget(resolve(url).func)
+                self.assertLessEqual(
+                    len(queries), budget,
+                    f'{url} ran {len(queries)} queries:\n' + '\n'.join(q['sql'] for q in queries.captured_queries),
+                )
+        self.assertEqual(covered, {pattern.name for pattern in urls.urlpatterns})
+
+    def test_query_counts_do_not_grow_with_the_data(self):
+        def query_counts():
+            return [(case[0], case[1], len(self.run_case(*case)[2])) for case in self.cases()]
+
+        before = query_counts()
+        self.grow()
+        self.assertEqual(query_counts(), before)
+
+
+class LoadBenchmarkTests(TransactionTestCase):
+    """seed_scale and benchmark_urls, on a small data set. A TransactionTestCase: the clients run in threads."""
+
+    def test_seed_and_benchmark_every_url(self):
+        call_command('seed_scale', '--users', '80', '--seed', '1', stdout=StringIO())
+        self.assertFalse(Team.objects.filter(member_count__gt=Team.MAX_MEMBERS).exists())
+        self.assertFalse(Team.objects.annotate(actual=Count('members')).exclude(member_count=F('actual')).exists())
+        with self.assertRaises(CommandError):
+            call_command('seed_scale', '--users', '10', stdout=StringIO())
+
+        pending = JoinRequest.objects.filter(status='pending').count()
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        output = os.path.join(output_dir, 'report.json')
+        with override_settings(ALLOWED_HOSTS=['*']):
+            call_command('benchmark_urls', '--requests', '4', '--concurrency', '2', '--output', output, stdout=StringIO())
+            call_command(
+                'benchmark_urls', '--requests', '4', '--concurrency', '2', '--only', 'teams', 'join_team',
+                '--output', os.path.join(output_dir, 'again.json'), '--compare', output, stdout=StringIO(),
+            )
+        with open(output) as report_file:
+            report = json.load(report_file)
+        benchmarked = {label.split('/')[0] for label in report['urls']} | set(report['skipped'])
+        self.assertEqual(benchmarked, {pattern.name for pattern in urls.urlpatterns})
+        for label, result in report['urls'].items():
+            with self.subTest(label):
+                self.assertEqual(result['requests'], 4)
+                self.assertFalse([status for status in result['statuses'] if status.startswith(('4', '5'))])
+        self.assertGreater(report['urls']['teams']['queries_per_request'], 0)
+        # Every join_team was followed by the cancel_join_request undoing it.
+        self.assertEqual(JoinRequest.objects.filter(status='pending').count(), pending)
+
+
+@override_settings(ROOT_URLCONF='mysite.asgi_urls')
+class AsyncQueryBudgetTests(QueryBudgetTests):
+    """The same replay against the URLconf served under ASGI, with the async views."""
+
+
+@override_settings(ROOT_URLCONF='mysite.asgi_urls')
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.leader = make_user(1)
+        self.user = make_user(2)
+        self.team = Team.objects.create(name='Async', leader=self.leader, looking_for_members=True)
+        self.team.members.add(self.leader)
+
+    def test_asgi_urls_route_the_hot_paths_to_async_views(self):
+        for name, args in [('teams', []), ('team_detail', [self.team.id]), ('challenges', []),
+                           ('profile', []), ('join_team', [self.team.id]), ('rules', [])]:
+            with self.subTest(name):
+                self.assertEqual(iscoroutinefunction(resolve(reverse(name, args=args)).func), name != 'rules')
+
+    async def test_join_team_through_the_async_handler(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('join_team', args=[self.team.id]))
+        self.assertRedirects(response, reverse('teams'), fetch_redirect_response=False)
+        self.assertTrue(await JoinRequest.objects.filter(user=self.user, team=self.team, status='pending').aexists())
+
+        response = await self.async_client.get(reverse('teams'))
+        self.assertContains(response, 'Join request sent.')
+
+    async def test_async_views_see_the_impersonated_user(self):
+        admin = await sync_to_async(make_user)(3, is_superuser=True, is_staff=True)
+        await self.async_client.aforce_login(admin)
+        session = await self.async_client.asession()
+        session['_impersonate'] = self.leader.pk  # what impersonate-start stores
+        await sync_to_async(session.save)()
+        response = await self.async_client.get(reverse('profile'))
+        self.assertEqual(response.context['team'], self.team)
+
+
+class EventStreamTests(TransactionTestCase):
+    """The stream application reads the session and the user's teams on its own connections, hence committed data."""
+
+    def setUp(self):
+        self.leader = make_user(1)
+        self.applicant = make_user(2)
+        self.team = Team.objects.create(name='Live', leader=self.leader, looking_for_members=True)
+        self.team.members.add(self.leader)
+        self.application = events.EventStreamApplication(None)
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return f'sessionid={client.cookies["sessionid"].value}'.encode()
+
+    async def open_stream(self, cookie=b''):
+        """Start a stream request and return (messages received, task, disconnect)."""
+        messages = asyncio.Queue()
+        disconnect = asyncio.Event()
+        request = iter([{'type': 'http.request', 'body': b'', 'more_body': False}])
+
+        async def receive():
+            message = next(request, None)
+            if message is None:
+                await disconnect.wait()
+                message = {'type': 'http.disconnect'}
+            return message
+
+        scope = {'type': 'http', 'method': 'GET', 'path': reverse('events'), 'headers': [(b'cookie', cookie)]}
+        task = asyncio.create_task(self.application(scope, receive, messages.put))
+        return messages, task, disconnect
+
+    async def test_anonymous_users_are_refused(self):
+        messages, task, _ = await self.open_stream()
+        await task
+        self.assertEqual((await messages.get())['status'], 401)
+
+    async def test_join_request_reaches_the_leader_and_the_applicant(self):
+        streams = []
+        for user in (self.leader, self.applicant):
+            messages, task, disconnect = await self.open_stream(await sync_to_async(self.session_cookie)(user))
+            self.assertEqual((await messages.get())['status'], 200)
+            self.assertEqual((await messages.get())['body'], b'retry: 5000\n\n')
+            streams.append((messages, task, disconnect))
+
+        join_request = await JoinRequest.objects.acreate(user=self.applicant, team=self.team)
+        for messages, task, disconnect in streams:
+            body = (await asyncio.wait_for(messages.get(), 5))['body'].decode()
+            self.assertTrue(body.startswith('event: join_request\n'))
+            self.assertEqual(
+                json.loads(body.split('data: ')[1]),
+                {'id': join_request.pk, 'team': self.team.pk, 'user': self.applicant.pk, 'status': 'pending'},
+            )
+            disconnect.set()
+            await task
+        self.assertFalse(events.broker.subscriptions)
+
+    async def test_streams_follow_membership_changes(self):
+        member = await sync_to_async(make_user)(3)
+        await sync_to_async(self.team.members.add)(member)
+        streams = {}
+        for user in (member, self.applicant):
+            messages, task, disconnect = await self.open_stream(await sync_to_async(self.session_cookie)(user))
+            self.assertEqual((await messages.get())['status'], 200)
+            await messages.get()
+            streams[user] = messages, task, disconnect
+
+        async def next_event(user):
+            return (await asyncio.wait_for(streams[user][0].get(), 5))['body'].split(b'\n')[0]
+
+        await JoinRequest.objects.acreate(user=self.applicant, team=self.team)
+        self.assertEqual(await next_event(self.applicant), b'event: join_request')
+        await sync_to_async(self.team.members.add)(self.applicant)
+        # The member's first event is the membership change: the join request was not theirs to see.
+        self.assertEqual(await next_event(member), b'event: membership')
+        self.assertEqual(await next_event(self.applicant), b'event: membership')
+
+        channel = events.team_channel(self.team.pk)
+        for _ in range(500):
+            if any(events.user_channel(self.applicant.pk) in subscription.channels
+                   for subscription in events.broker.subscriptions.get(channel, ())):
+                break
+            await asyncio.sleep(0.01)
+        newcomer = await sync_to_async(make_user)(4)
+        await sync_to_async(self.team.members.add)(newcomer)
+        self.assertEqual(await next_event(self.applicant), b'event: membership')
+
+        for _, task, disconnect in streams.values():
+            disconnect.set()
+            await task
+        self.assertFalse(events.broker.subscriptions)
+
+    def test_wsgi_view_tells_eventsource_to_stop(self):
+        self.client.force_login(self.leader)
+        self.assertEqual(self.client.get(reverse('events')).status_code, 204)
+
+    def test_database_backend_delivers_other_processes_events(self):
+        broker = mock.Mock()
+        backend = events.DatabaseBackend(broker)
+        last_id = backend.deliver_new_events(None)
+        backend.publish(['team:1'], b'event: membership\ndata: {}\n\n')
+        backend.deliver_new_events(last_id)
+        broker.deliver.assert_called_once_with(['team:1'], b'event: membership\ndata: {}\n\n')
@@ -9,7 +9,10 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
     path('admin_dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin_dashboard/<str:tab>/', views.admin_dashboard_partial, name='admin_dashboard_partial'),
+    path('export/<slug:dataset>.<slug:fmt>', views.export_data, name='export_data'),
     path('participant_dashboard/', views.participant_dashboard, name='participant_dashboard'),
+    path('participants/search/', views.search_participants, name='search_participants'),
     path('profile/edit/', views.edit_profile, name='edit_profile'),
     path('edit_user/<int:user_id>/', views.edit_user, name='edit_user'),
     path('delete_user/<int:user_id>/', views.delete_user, name='delete_user'),
@@ -26,7 +29,10 @@ urlpatterns = [
     path('privacy/', views.privacy_policy, name='privacy_policy'),
     path('rules/', views.rules, name='rules'),
     path('challenges/', views.challenges, name='challenges'),
+    path('page_cache_stats/', views.page_cache_stats, name='page_cache_stats'),
+    path('metrics/', views.metrics, name='metrics'),
     path('team/delete/<int:team_id>/', views.delete_team, name='delete_team'),
+    path('events/', views.events, name='events'),
     path('teams/', views.teams, name='teams'),
     path('team/<int:team_id>/', views.team_detail, name='team_detail'),
     path('team/join/<int:team_id>/', views.join_team, name='join_team'),
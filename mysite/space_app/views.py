@@ -1,11 +1,28 @@
-import json
+import hmac
+import time
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.core.mail import send_mail
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.core.exceptions import ValidationError
+from django.urls import reverse
 from django.contrib.auth import login, logout, authenticate
 from .forms import RegistrationForm, LoginForm, ProjectForm, ContactForm, ProfileEditForm, UserEditForm, TeamForm
 from .models import User, Team, Project, Contact, JoinRequest, Skill
+from .caching import cache_public_page, get_cached_challenges, get_page_cache_stats, page_version, team_versions
+from .data_files import load_data_file
+from .events import publish_join_request
+from .exports import DATASETS, FORMATS, iter_export
+from .filters import filter_users
+from .metrics import render_prometheus
+from .pagination import keyset_paginate
+from .query_budget import query_budget
+from .routers import REPLICA_LAG_SECONDS, read_replica, reading_from_replica
+from .search import SEARCH_RESULTS, search_users
+from .tasks import enqueue
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Q, Count
+from django.db import IntegrityError, transaction
+from django.db.models import Q, CharField, Exists, OuterRef, Value
 from django.contrib import messages
 
 def is_GPE(user):
@@ -23,6 +40,7 @@ def is_admin(user):
 def is_moderator(user):
     return user.is_authenticated and user.is_moderator
 
+@query_budget(2)
 @login_required
 def dashboard_redirect_view(request):
     user = request.user
@@ -30,9 +48,12 @@ def dashboard_redirect_view(request):
         return redirect('admin_dashboard')
     return redirect('profile')
 
+@query_budget(0)
+@cache_public_page('landing_page')
 def landing_page(request):
     return render(request, 'space_app/landing_page.html')
 
+@query_budget(15)
 def register(request):
     if request.method == 'POST':
         form = RegistrationForm(request.POST, request.FILES)
@@ -47,6 +68,7 @@ def register(request):
         form = RegistrationForm()
     return render(request, 'space_app/register.html', {'form': form})
 
+@query_budget(9)
 def login_view(request):
     if request.method == 'POST':
         form = LoginForm(request.POST)
@@ -63,13 +85,15 @@ def login_view(request):
         form = LoginForm()
     return render(request, 'space_app/login.html', {'form': form})
 
+@query_budget(4)
 def logout_view(request):
     logout(request)
     return redirect('landing_page')
 
+@query_budget(3)
 @login_required
 def profile_view(request):
-    team = request.user.teams.first()
+    team = request.user.teams.select_related('challenge', 'project').first()
     project = None
     if team:
         try:
@@ -79,59 +103,92 @@ def profile_view(request):
 
     return render(request, 'space_app/profile.html', {'project': project, 'team': team})
 
+@query_budget(3)
 @user_passes_test(lambda u: u.is_authenticated and (u.is_admin or u.is_moderator or u.is_GPE or u.is_Mentor or u.is_Registration))
+@read_replica
 def participant_dashboard(request):
     users = User.objects.all()
     query = request.GET.get('q')
     if query:
-        users = users.filter(Q(first_name__icontains=query) | Q(last_name__icontains=query) | Q(email__icontains=query))
+        users = search_users(users, query)
     return render(request, 'space_app/participant_dashboard.html', {'users': users})
 
+def dashboard_users(request):
+    """The users the dashboard's ``q``, ``role`` and ``in_team`` filters select, for user_table_body.html."""
+    return filter_users(
+        User.objects.annotate(in_team=Exists(Team.members.through.objects.filter(user_id=OuterRef('pk')))),
+        request.GET.get('q'),
+        request.GET.get('role'),
+        request.GET.get('in_team'),
+    )
+
+# Each admin dashboard tab: (row template, queryset factory, newest first?)
+ADMIN_DASHBOARD_TABS = {
+    'users': ('space_app/partials/user_table_body.html', dashboard_users, False),
+    'teams': ('space_app/partials/team_table_body.html', lambda request: Team.objects.select_related('challenge', 'leader'), False),
+    'projects': ('space_app/partials/project_table_body.html', lambda request: Project.objects.select_related('team'), False),
+    'contacts': ('space_app/partials/contact_table_body.html', lambda request: Contact.objects.all(), True),
+}
+
+def admin_dashboard_page(request, tab):
+    """Return the row template and the requested keyset page of an admin dashboard tab."""
+    template_name, get_queryset, descending = ADMIN_DASHBOARD_TABS[tab]
+    page = keyset_paginate(get_queryset(request), request.GET.get('cursor'), descending=descending)
+    if page.has_next:
+        params = request.GET.copy()
+        params['cursor'] = page.next_cursor
+        page.next_url = f"{reverse('admin_dashboard_partial', args=[tab])}?{params.urlencode()}"
+    return template_name, page
+
+@query_budget(3)
 @user_passes_test(lambda u: u.is_authenticated and (u.is_admin or u.is_moderator or u.is_GPE or u.is_Mentor))
+@read_replica
 def admin_dashboard(request):
-    users = User.objects.prefetch_related('teams').all()
-    teams = Team.objects.all()
-    projects = Project.objects.all()
-    contacts = Contact.objects.all()
-
-    query = request.GET.get('q')
-    role_filter = request.GET.get('role')
-    in_team_filter = request.GET.get('in_team')
-
-    if query:
-        users = users.filter(Q(first_name__icontains=query) | Q(last_name__icontains=query) | Q(email__icontains=query))
-
-    if role_filter:
-        if role_filter == 'admin':
-            users = users.filter(is_admin=True)
-        elif role_filter == 'gpe':
-            users = users.filter(is_GPE=True)
-        elif role_filter == 'mentor':
-            users = users.filter(is_Mentor=True)
-        elif role_filter == 'registration':
-            users = users.filter(is_Registration=True)
-        elif role_filter == 'moderator':
-            users = users.filter(is_moderator=True)
-        elif role_filter == 'user':
-            users = users.filter(is_admin=False, is_GPE=False, is_Mentor=False, is_Registration=False, is_moderator=False)
-
-    if in_team_filter:
-        if in_team_filter == 'yes':
-            users = users.filter(teams__isnull=False).distinct()
-        elif in_team_filter == 'no':
-            users = users.filter(teams__isnull=True).distinct()
+    # Only the first page of the users tab is rendered here; the other tabs
+    # and further pages are fetched on demand from admin_dashboard_partial.
+    _, users_page = admin_dashboard_page(request, 'users')
+    filter_params = request.GET.copy()
+    filter_params.pop('cursor', None)
 
     context = {
-        'users': users,
-        'teams': teams,
-        'projects': projects,
-        'contacts': contacts,
-        'query': query,
-        'role_filter': role_filter,
-        'in_team_filter': in_team_filter,
+        'users': users_page,
+        'filter_params': filter_params.urlencode(),
+        'query': request.GET.get('q'),
+        'role_filter': request.GET.get('role'),
+        'in_team_filter': request.GET.get('in_team'),
     }
     return render(request, 'space_app/admin_dashboard.html', context)
 
+@query_budget(3)
+@user_passes_test(lambda u: u.is_authenticated and (u.is_admin or u.is_moderator or u.is_GPE or u.is_Mentor))
+@read_replica
+def admin_dashboard_partial(request, tab):
+    if tab not in ADMIN_DASHBOARD_TABS:
+        raise Http404('Unknown dashboard tab.')
+    template_name, page = admin_dashboard_page(request, tab)
+    return render(request, template_name, {tab: page})
+
+@query_budget(3)
+@user_passes_test(lambda u: u.is_authenticated and (u.is_admin or u.is_moderator or u.is_GPE or u.is_Mentor))
+@read_replica
+def search_participants(request):
+    # The best SEARCH_RESULTS matches, as rows for the dashboard's users table
+    # while a search is typed; the users tab pages through all of them by id.
+    users = dashboard_users(request)
+    if not request.GET.get('q'):
+        users = users.order_by('pk')
+    return render(request, 'space_app/partials/user_table_body.html', {'users': users[:SEARCH_RESULTS]})
+
+@query_budget(5)
+@user_passes_test(lambda u: u.is_authenticated and (u.is_admin or u.is_moderator or u.is_GPE or u.is_Mentor))
+def export_data(request, dataset, fmt):
+    if dataset not in DATASETS or fmt not in FORMATS:
+        raise Http404('Unknown export.')
+    response = StreamingHttpResponse(iter_export(dataset, fmt, request.GET), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+    return response
+
+@query_budget(9)
 @login_required
 def edit_profile(request):
     if request.method == 'POST':
@@ -144,6 +201,7 @@ def edit_profile(request):
         form = ProfileEditForm(instance=request.user)
     return render(request, 'space_app/edit_profile.html', {'form': form})
 
+@query_budget(9)
 @user_passes_test(is_admin)
 def edit_user(request, user_id):
     user_to_edit = get_object_or_404(User, pk=user_id)
@@ -157,6 +215,7 @@ def edit_user(request, user_id):
         form = UserEditForm(instance=user_to_edit)
     return render(request, 'space_app/edit_user.html', {'form': form, 'user_to_edit': user_to_edit})
 
+@query_budget(15)
 @user_passes_test(is_admin)
 def delete_user(request, user_id):
     user_to_delete = get_object_or_404(User, pk=user_id)
@@ -164,6 +223,7 @@ def delete_user(request, user_id):
     messages.success(request, 'User deleted successfully.')
     return redirect('admin_dashboard')
 
+@query_budget(10)
 @login_required
 def create_team(request):
     if request.user.teams.exists():
@@ -185,6 +245,7 @@ def create_team(request):
         form = TeamForm()
     return render(request, 'space_app/create_team.html', {'form': form})
 
+@query_budget(7)
 @login_required
 def edit_team(request, team_id):
     team = get_object_or_404(Team, pk=team_id)
@@ -202,6 +263,7 @@ def edit_team(request, team_id):
         form = TeamForm(instance=team)
     return render(request, 'space_app/edit_team.html', {'form': form, 'team': team})
 
+@query_budget(5)
 @login_required
 def create_project(request, team_id):
     team = get_object_or_404(Team, pk=team_id, members=request.user)
@@ -220,12 +282,13 @@ def create_project(request, team_id):
     return render(request, 'space_app/create_project.html', {'form': form, 'team': team})
 
 
+@query_budget(5)
 @login_required
 def edit_project(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
-    team_members = project.team.members.all()
+    project = get_object_or_404(Project.objects.select_related('team'), pk=project_id)
+    is_member = project.team.members.filter(pk=request.user.pk).exists()
 
-    if not (request.user.is_admin or request.user in team_members):
+    if not (request.user.is_admin or is_member):
         messages.error(request, 'You are not authorized to perform this action.')
         return redirect('project_detail', project_id=project.id)
 
@@ -240,11 +303,12 @@ def edit_project(request, project_id):
     
     return render(request, 'space_app/edit_project.html', {'form': form, 'project': project})
 
+@query_budget(4)
 @login_required
 def delete_project(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
-    team_.id = project.team.id
-    if not (request.user.is_admin or request.user in project.team.members.all()):
+    project = get_object_or_404(Project.objects.select_related('team'), pk=project_id)
+    team_id = project.team_id
+    if not (request.user.is_admin or project.team.members.filter(pk=request.user.pk).exists()):
         messages.error(request, 'You are not authorized to perform this action.')
         return redirect('project_detail', project_id=project.id)
     project.delete()
@@ -253,71 +317,71 @@ def delete_project(request, project_id):
         return redirect('admin_dashboard')
     return redirect('team_detail', team_id=team_id)
 
+@query_budget(4)
 @login_required
 def project_detail(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_object_or_404(Project.objects.select_related('team').prefetch_related('team__members'), pk=project_id)
     return render(request, 'space_app/project_detail.html', {'project': project})
 
+@query_budget(4)
 def contact(request):
     if request.method == 'POST':
         form = ContactForm(request.POST)
         if form.is_valid():
-            form.save()
-            send_mail(
-                'New Contact Message',
-                'You have a new message from the contact form.',
-                'from@example.com',
-                ['admin@example.com'],
-                fail_silently=False,
-            )
+            # Together, so a contact is never saved without its notification.
+            with transaction.atomic():
+                contact = form.save()
+                # Sent by `manage.py run_worker` so a slow mail server never blocks the request.
+                enqueue('send_contact_notification', contact_id=contact.pk)
             return redirect('contact_success')
     else:
         form = ContactForm()
     return render(request, 'space_app/contact.html', {'form': form})
 
+@query_budget(0)
 def contact_success(request):
     return render(request, 'space_app/contact_success.html')
 
+@query_budget(0)
+@cache_public_page('about_us', data_files=['committees.json'])
 def about_us(request):
-    with open('mysite/space_app/data/committees.json', 'r') as f:
-        committees_data = json.load(f)
-    return render(request, 'space_app/about_us.html', committees_data)
+    return render(request, 'space_app/about_us.html', load_data_file('committees.json'))
 
+@query_budget(0)
+@cache_public_page('privacy_policy')
 def privacy_policy(request):
     return render(request, 'space_app/privacy_policy.html')
 
+@query_budget(0)
+@cache_public_page('rules')
 def rules(request):
     return render(request, 'space_app/rules.html')
 
-def parse_description(description):
-    sections = []
-    current_section = None
-    for line in description.splitlines():
-        line = line.strip()
-        if line.startswith('■'):
-            if current_section:
-                sections.append(current_section)
-            current_section = {'title': line.strip('■ '), 'content': []}
-        elif line.startswith(('-', '*')):
-            if current_section:
-                current_section['content'].append({'type': 'list', 'text': line.strip('-* ')})
-        elif '(Display inside a styled card/box for emphasis)' in line:
-            if current_section:
-                current_section['is_card'] = True
-        elif line:
-            if current_section:
-                current_section['content'].append({'type': 'paragraph', 'text': line})
-    if current_section:
-        sections.append(current_section)
-    return sections
-
+@query_budget(1)
+@cache_public_page('challenges')
 def challenges(request):
-    with open('mysite/space_app/data/challenges.json', 'r') as f:
-        challenges_data = json.load(f)
-    for challenge in challenges_data:
-        challenge['parsed_description'] = parse_description(challenge['description'])
-    return render(request, 'space_app/challenges.html', {'challenges': challenges_data})
+    return render(request, 'space_app/challenges.html', {'challenges': get_cached_challenges()})
 
+@query_budget(2)
+@user_passes_test(is_admin)
+def page_cache_stats(request):
+    return JsonResponse(get_page_cache_stats())
+
+@query_budget(2)
+def metrics(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    scraper = token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not scraper and not (request.user.is_superuser or is_admin(request.user)):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(get_page_cache_stats()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@query_budget(1)
+def events(request):
+    # The live update stream is served by events.EventStreamApplication, in
+    # front of Django under ASGI. Under WSGI, 204 tells EventSource to stop.
+    return HttpResponse(status=204)
+
+@query_budget(9)
 @login_required
 def delete_team(request, team_id):
     team = get_object_or_404(Team, pk=team_id)
@@ -328,26 +392,82 @@ def delete_team(request, team_id):
     messages.success(request, 'Team deleted successfully.')
     return redirect('teams')
 
-def teams(request):
-    teams = Team.objects.annotate(num_members=Count('members')).filter(num_members__gt=0)
-    query = request.GET.get('q')
+def viewer_team_rows(user):
+    """(team id, 'member' or 'pending') rows for the user's teams and pending join requests, as one query."""
+    memberships = Team.members.through.objects.filter(user_id=user.pk).annotate(
+        kind=Value('member', output_field=CharField())
+    ).values_list('team_id', 'kind')
+    pending = JoinRequest.objects.filter(user_id=user.pk, status='pending').annotate(
+        kind=Value('pending', output_field=CharField())
+    ).values_list('team_id', 'kind')
+    return memberships.union(pending)
+
+def viewer_team_ids(rows):
+    """Split viewer_team_rows() into (ids of the user's teams, ids of teams they have a pending request to)."""
+    member_ids, pending_ids = set(), set()
+    for team_id, kind in rows:
+        (member_ids if kind == 'member' else pending_ids).add(team_id)
+    return member_ids, pending_ids
+
+def team_card_action(team, user, member_ids, pending_ids):
+    """Which join/leave control the viewer sees on a team card."""
+    if not user.is_authenticated:
+        return 'login'
+    if team.leader_id == user.id:
+        return 'manage'
+    if team.id in member_ids:
+        return 'member'
+    if member_ids:
+        return 'other_team'
+    if not team.looking_for_members:
+        return 'closed'
+    if team.id in pending_ids:
+        return 'pending'
+    return 'join'
+
+def search_teams(query):
+    teams = Team.objects.with_members().select_related('challenge')
     if query:
         teams = teams.filter(
-            Q(name__icontains=query) | Q(challenge__icontains=query)
+            Q(name__icontains=query) | Q(challenge__title__icontains=query)
         )
-    
-    pending_request_team_ids = []
-    if request.user.is_authenticated:
-        pending_request_team_ids = list(JoinRequest.objects.filter(user=request.user, status='pending').values_list('team__id', flat=True))
-
-    context = {
+    return teams
+
+def teams_context(teams, user, member_ids, pending_ids):
+    """Context for teams.html; member_ids and pending_ids come from viewer_team_ids().
+
+    The shared part of each card is a cached fragment keyed on the team's
+    version; only the viewer's action is worked out per request.
+    """
+    versions = team_versions([team.id for team in teams])
+    # A card rendered from the replica soon after its version was bumped may
+    # show the old data, so it is only stored once the replica has caught up.
+    stale_before = time.time_ns() - REPLICA_LAG_SECONDS * 10 ** 9 if reading_from_replica() else None
+    for team in teams:
+        team.card_version = versions[team.id]
+        team.card_cache_timeout = 0 if stale_before is not None and versions[team.id] > stale_before else None
+        team.viewer_action = team_card_action(team, user, member_ids, pending_ids)
+    return {
         'teams': teams,
-        'pending_request_team_ids': pending_request_team_ids
+        'challenges_version': page_version('challenges'),
+        'max_members': Team.MAX_MEMBERS,
     }
-    return render(request, 'space_app/teams.html', context)
 
+@query_budget(4)
+@read_replica
+def teams(request):
+    teams = list(search_teams(request.GET.get('q')))
+    member_ids, pending_ids = set(), set()
+    if request.user.is_authenticated:
+        member_ids, pending_ids = viewer_team_ids(viewer_team_rows(request.user))
+    return render(request, 'space_app/teams.html', teams_context(teams, request.user, member_ids, pending_ids))
+
+def team_detail_queryset():
+    return Team.objects.select_related('challenge', 'leader', 'project').prefetch_related('members')
+
+@query_budget(5)
 def team_detail(request, team_id):
-    team = get_object_or_404(Team, pk=team_id)
+    team = get_object_or_404(team_detail_queryset(), pk=team_id)
     has_pending_request = False
     if request.user.is_authenticated:
         has_pending_request = JoinRequest.objects.filter(user=request.user, team=team, status='pending').exists()
@@ -358,13 +478,19 @@ def team_detail(request, team_id):
     }
     return render(request, 'space_app/team_detail.html', context)
 
+def create_join_request(user, team):
+    # In a savepoint, so a duplicate pending request leaves the transaction usable.
+    with transaction.atomic():
+        return JoinRequest.objects.create(user=user, team=team)
+
+@query_budget(7)
 @login_required
 def join_team(request, team_id):
     team = get_object_or_404(Team, pk=team_id)
     user = request.user
 
     if user.is_admin or user.is_Mentor:
-        if user in team.mentors.all():
+        if team.mentors.filter(pk=user.pk).exists():
             messages.info(request, 'You are already a mentor for this team.')
         else:
             team.mentors.add(user)
@@ -375,37 +501,43 @@ def join_team(request, team_id):
         messages.error(request, 'You must leave your current team before joining a new one.')
         return redirect('teams')
 
-    if team.members.count() >= 6:
+    if team.member_count >= Team.MAX_MEMBERS:
         messages.error(request, 'This team is full and cannot accept new members.')
         return redirect('teams')
 
-    if JoinRequest.objects.filter(user=user, team=team, status='pending').exists():
-        messages.error(request, 'You have already sent a request to join this team.')
-        return redirect('teams')
-
     if team.looking_for_members:
-        JoinRequest.objects.create(user=user, team=team)
-        messages.success(request, 'Your request to join the team has been sent.')
+        try:
+            create_join_request(user, team)
+        except IntegrityError:
+            # joinrequest_one_pending_per_team allows one pending request per (user, team).
+            messages.error(request, 'You have already sent a request to join this team.')
+        else:
+            messages.success(request, 'Your request to join the team has been sent.')
     else:
         messages.error(request, 'This team is not looking for members.')
     
     return redirect('teams')
 
+@query_budget(5)
 @login_required
 def cancel_join_request(request, team_id):
     team = get_object_or_404(Team, pk=team_id)
     join_request = get_object_or_404(JoinRequest, user=request.user, team=team, status='pending')
+    join_request_id = join_request.pk
     join_request.delete()
+    # Sent from here: a post_delete receiver would stop Django fast-deleting join requests.
+    publish_join_request(join_request_id, team.pk, team.leader_id, request.user.pk, 'canceled')
     messages.success(request, 'Your join request has been canceled.')
     return redirect('teams')
 
+@query_budget(8)
 @login_required
 def leave_team(request, team_id):
     team = get_object_or_404(Team, pk=team_id)
-    if request.user in team.members.all():
+    if team.members.filter(pk=request.user.pk).exists():
         team.members.remove(request.user)
         if team.leader == request.user:
-            if team.members.count() > 0:
+            if team.member_count > 0:
                 team.leader = team.members.first()
                 team.save()
             else:
@@ -417,31 +549,35 @@ def leave_team(request, team_id):
         messages.error(request, 'You are not a member of this team.')
     return redirect('profile')
 
+@query_budget(2)
 @login_required
 def invite_member(request, team_id):
     return redirect('profile')
 
+@query_budget(4)
 @login_required
 def manage_join_requests(request, team_id):
     team = get_object_or_404(Team, pk=team_id, leader=request.user)
-    join_requests = JoinRequest.objects.filter(team=team, status='pending')
+    join_requests = JoinRequest.objects.filter(team=team, status='pending').select_related('user')
     return render(request, 'space_app/manage_join_requests.html', {'team': team, 'requests': join_requests})
 
+@query_budget(14)
 @login_required
 def handle_join_request(request, request_id, action):
-    join_request = get_object_or_404(JoinRequest, pk=request_id)
+    join_request = get_object_or_404(JoinRequest.objects.select_related('team', 'user'), pk=request_id)
     team = join_request.team
     if request.user != team.leader:
         messages.error(request, 'You are not authorized to perform this action.')
         return redirect('profile')
 
     if action == 'accept':
-        if team.members.count() >= 6:
+        try:
+            team.add_member(join_request.user)
+        except ValidationError:
             messages.error(request, 'The team is full and cannot accept new members.')
             return redirect('manage_join_requests', team_id=team.id)
 
         join_request.status = 'accepted'
-        team.members.add(join_request.user)
         messages.success(request, f'{join_request.user.first_name} {join_request.user.last_name} has been added to the team.')
         JoinRequest.objects.filter(user=join_request.user, status='pending').delete()
     elif action == 'reject':
@@ -451,7 +587,9 @@ def handle_join_request(request, request_id, action):
     join_request.save()
     return redirect('manage_join_requests', team_id=team.id)
 
+@query_budget(4)
 @user_passes_test(lambda u: u.is_authenticated and (u.is_admin or u.is_moderator or u.is_GPE or u.is_Mentor))
+@read_replica
 def user_detail(request, user_id):
-    user = get_object_or_404(User, pk=user_id)
+    user = get_object_or_404(User.objects.prefetch_related('skills'), pk=user_id)
     return render(request, 'space_app/user_detail.html', {'user': user})
\ No newline at end of file